@@ -39,6 +39,16 @@ describe('LlmApiService', () => {
     expect(result).toEqual({ category: 'Doces', price_max: 50 });
   });
 
+  it('should capture the Server-Timing header when requested', async () => {
+    http.post.mockReturnValue(
+      of({ data: { category: 'Doces' }, headers: { 'server-timing': 'cache;dur=1.20, llm;dur=350.00' } } as any),
+    );
+
+    const timing: { serverTiming?: string } = {};
+    await service.getFilters('doces', timing);
+    expect(timing.serverTiming).toBe('cache;dur=1.20, llm;dur=350.00');
+  });
+
   it('should return null on error/timeout', async () => {
     http.post.mockReturnValue(throwError(() => new Error('timeout')) as any);
 
@@ -1,7 +1,7 @@
 import { Injectable, Logger } from '@nestjs/common';
 import { HttpService } from '@nestjs/axios';
 import { firstValueFrom, of, timeout, catchError } from 'rxjs';
-import { IAIFilters } from './searchTypes';
+import { IAIFilters, ILlmTiming } from './searchTypes';
 
 @Injectable()
 export class LlmApiService {
@@ -15,7 +15,7 @@ export class LlmApiService {
     }
   }
 
-  async getFilters(query: string): Promise<IAIFilters | null> {
+  async getFilters(query: string, timing?: ILlmTiming): Promise<IAIFilters | null> {
     try {
       this.logger.log(`Chamando LLM API para: "${query.substring(0, 50)}..."`);
       const response$ = this.httpService
@@ -31,6 +31,7 @@ export class LlmApiService {
 
       const response: any = await firstValueFrom(response$);
       if (!response || !response.data) return null;
+      if (timing) timing.serverTiming = response.headers?.['server-timing'];
       this.logger.log(`LLM retornou filtros: ${JSON.stringify(response.data)}`);
       return response.data as IAIFilters;
     } catch (e: any) {
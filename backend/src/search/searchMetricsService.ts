@@ -7,6 +7,7 @@ export interface TrackSearchDto {
   fallbackApplied?: boolean;
   resultsCount: number;
   latencyMs: number;
+  llmServerTiming?: string;
   userId?: string;
 }
 
@@ -24,6 +25,7 @@ export interface SearchMetric {
   resultsCount: number;
   zeroResults: boolean;
   latencyMs: number;
+  llmServerTiming?: string;
   userId?: string;
   createdAt: Date;
 }
@@ -43,11 +45,12 @@ export class SearchMetricsService {
   async trackSearch(data: TrackSearchDto): Promise<SearchMetric> {
     const query = `
       INSERT INTO search_metrics 
-        (query, ai_used, fallback_applied, results_count, zero_results, latency_ms, user_id, created_at)
-      VALUES ($1, $2, $3, $4, $5, $6, $7, NOW())
+        (query, ai_used, fallback_applied, results_count, zero_results, latency_ms, llm_server_timing, user_id, created_at)
+      VALUES ($1, $2, $3, $4, $5, $6, $7, $8, NOW())
       RETURNING id, query, ai_used as "aiUsed", fallback_applied as "fallbackApplied", 
                 results_count as "resultsCount", zero_results as "zeroResults", 
-                latency_ms as "latencyMs", user_id as "userId", created_at as "createdAt"
+                latency_ms as "latencyMs", llm_server_timing as "llmServerTiming",
+                user_id as "userId", created_at as "createdAt"
     `;
 
     const zeroResults = data.resultsCount === 0;
@@ -58,6 +61,7 @@ export class SearchMetricsService {
       data.resultsCount,
       zeroResults,
       data.latencyMs,
+      data.llmServerTiming || null,
       data.userId || null,
     ]);
 
@@ -68,6 +72,8 @@ export class SearchMetricsService {
         aiUsed: data.aiUsed,
         resultsCount: data.resultsCount,
         zeroResults,
+        latencyMs: data.latencyMs,
+        llmServerTiming: data.llmServerTiming,
       })
     );
 
@@ -1,5 +1,5 @@
 import { Injectable, Logger } from '@nestjs/common';
-import { IAIFilters, ISearchResponse } from './searchTypes';
+import { IAIFilters, ILlmTiming, ISearchResponse } from './searchTypes';
 import { SearchRepository } from './searchRepository';
 import { LlmApiService } from './llmApiService';
 import { SearchMetricsService } from './searchMetricsService';
@@ -16,7 +16,8 @@ export class SearchService {
 
   async searchProducts(query: string, userId?: string): Promise<ISearchResponse> {
     const startTime = Date.now();
-    const aiFilters = await this.llmApi.getFilters(query);
+    const llmTiming: ILlmTiming = {};
+    const aiFilters = await this.llmApi.getFilters(query, llmTiming);
     const aiSuccess = !!aiFilters;
 
     if (!aiSuccess || this.areFiltersInsufficient(aiFilters)) {
@@ -58,6 +59,7 @@ export class SearchService {
         fallbackApplied: true,
         resultsCount: products.length,
         latencyMs,
+        llmServerTiming: llmTiming.serverTiming,
         userId,
       });
 
@@ -102,6 +104,7 @@ export class SearchService {
       fallbackApplied,
       resultsCount: products.length,
       latencyMs,
+      llmServerTiming: llmTiming.serverTiming,
       userId,
     });
 
@@ -8,6 +8,11 @@ export interface IAIFilters {
   price_max?: number;
 }
 
+// Timings por etapa reportados pelo llm-api (header Server-Timing)
+export interface ILlmTiming {
+  serverTiming?: string;
+}
+
 // Resposta padronizada da busca inteligente
 export interface ISearchResponse {
   interpretation: string;
@@ -0,0 +1,4 @@
+-- Timings por etapa do llm-api (header Server-Timing) ao lado da latência total
+ALTER TABLE search_metrics ADD COLUMN IF NOT EXISTS llm_server_timing TEXT;
+
+COMMENT ON COLUMN search_metrics.llm_server_timing IS 'Header Server-Timing do llm-api (cache, llm, validation, persistence, total)';
@@ -0,0 +1,20 @@
+#!/usr/bin/env bash
+# Sobe uma réplica de streaming do serviço `db`: na primeira execução copia o
+# primário com pg_basebackup (-R grava standby.signal + primary_conninfo).
+set -e
+
+PGDATA="${PGDATA:-/var/lib/postgresql/data}"
+export PGPASSWORD="$POSTGRES_PASSWORD"
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    mkdir -p "$PGDATA"
+    chown postgres:postgres "$PGDATA"
+    chmod 700 "$PGDATA"
+    until gosu postgres pg_basebackup -h "${PRIMARY_HOST:-db}" -U "$POSTGRES_USER" \
+        -D "$PGDATA" -R -X stream -c fast; do
+        echo "Aguardando o primário para o pg_basebackup..."
+        sleep 2
+    done
+fi
+
+exec gosu postgres postgres -c hot_standby=on
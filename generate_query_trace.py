@@ -0,0 +1,248 @@
+"""
+Gerador de traces de queries para benchmark de cache
+
+Produz um NDJSON (uma busca por linha) com popularidade Zipf sobre um universo
+de "intenções" montado a partir do vocabulário de `generate_seed.py`
+(produtos por categoria, categorias e frases de preço). Cada linha traz o texto
+com ruído (caixa, acentos removidos, typos, variações de preço) e os filtros
+esperados (ground truth), para que replay, simuladores de cache e avaliação
+de parsers usem o mesmo arquivo.
+
+Linha de saída:
+    {"ts": "2026-10-19T12:00:00.120000", "offset_s": 0.12, "intent": 17,
+     "query": "arroz 5kg ate 20 reais", "expected": {"search_term": "arroz 5kg",
+     "category": "Alimentos", "price_min": null, "price_max": 20.0}}
+
+Uso:
+    python generate_query_trace.py --count 1000000 --zipf-s 1.1 -o trace.ndjson
+    python generate_query_trace.py --count 1000 --rate 50 --typo-rate 0.1
+"""
+import argparse
+import bisect
+import json
+import math
+import random
+import sys
+import unicodedata
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO
+
+from generate_seed import categories, products_by_category
+
+# Preços "redondos" que as pessoas digitam
+PRICE_POINTS = [5, 10, 15, 20, 25, 30, 40, 50, 60, 80, 100, 150, 200]
+
+# Variações de escrita do mesmo preço
+PRICE_FORMATS = ["{v}", "{v} reais", "R$ {v}", "r${v}", "{v},00", "{v},00 reais"]
+PRICE_MAX_PHRASES = ["até {p}", "menos de {p}", "abaixo de {p}", "no máximo {p}"]
+PRICE_MIN_PHRASES = ["a partir de {p}", "mais de {p}", "acima de {p}"]
+
+# Perfil de chegada por hora do dia (multiplicador sobre --rate)
+HOURLY_PROFILE = [
+    0.15, 0.08, 0.05, 0.05, 0.06, 0.12, 0.3, 0.6, 0.9, 1.1, 1.2, 1.35,
+    1.5, 1.4, 1.2, 1.1, 1.1, 1.2, 1.4, 1.7, 1.8, 1.5, 0.9, 0.4,
+]
+
+_KEYBOARD_NEIGHBOURS = {
+    "a": "sq", "e": "wr", "i": "uo", "o": "ip", "u": "yi", "s": "ad", "r": "et",
+    "t": "ry", "n": "bm", "m": "n", "c": "xv", "l": "k", "d": "sf", "p": "o",
+}
+
+
+class Intent:
+    """Intenção de busca (o que a pessoa quer) e seus filtros esperados"""
+
+    def __init__(self, intent_id: int, term: Optional[str], category: Optional[str],
+                 price_min: Optional[float] = None, price_max: Optional[float] = None):
+        self.id = intent_id
+        self.term = term
+        self.category = category
+        self.price_min = price_min
+        self.price_max = price_max
+
+    def expected(self) -> Dict[str, Any]:
+        return {
+            "search_term": self.term,
+            "category": self.category,
+            "price_min": self.price_min,
+            "price_max": self.price_max,
+        }
+
+
+def build_universe(size: int, rng: random.Random) -> List[Intent]:
+    """Universo de intenções, do mais ao menos popular (índice = rank Zipf)"""
+    products = [(cat, prod) for cat in categories for prod in products_by_category[cat]]
+    universe = []
+    for i in range(size):
+        kind = rng.random()
+        if kind < 0.35:
+            cat, prod = rng.choice(products)
+            intent = Intent(i, prod.lower(), None)
+        elif kind < 0.55:
+            intent = Intent(i, None, rng.choice(categories))
+        elif kind < 0.75:
+            cat, prod = rng.choice(products)
+            intent = Intent(i, prod.lower(), None, price_max=float(rng.choice(PRICE_POINTS)))
+        elif kind < 0.9:
+            intent = Intent(i, None, rng.choice(categories), price_max=float(rng.choice(PRICE_POINTS)))
+        else:
+            low, high = sorted(rng.sample(PRICE_POINTS, 2))
+            intent = Intent(i, None, rng.choice(categories), price_min=float(low), price_max=float(high))
+        universe.append(intent)
+    return universe
+
+
+class ZipfSampler:
+    """Amostragem Zipf(s) sobre ranks 0..n-1 via CDF + busca binária"""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self._cdf = list(accumulate(1.0 / math.pow(rank, s) for rank in range(1, n + 1)))
+        self._total = self._cdf[-1]
+        self._rng = rng
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self._cdf, self._rng.random() * self._total)
+
+
+def _strip_accents(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def _typo(text: str, rng: random.Random) -> str:
+    """Um erro de digitação: troca, omissão, duplicação ou tecla vizinha"""
+    positions = [i for i, ch in enumerate(text) if ch.isalpha()]
+    if len(positions) < 3:
+        return text
+    i = rng.choice(positions[1:-1])
+    op = rng.random()
+    if op < 0.3:
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    if op < 0.55:
+        return text[:i] + text[i + 1:]
+    if op < 0.75:
+        return text[:i] + text[i] + text[i:]
+    neighbours = _KEYBOARD_NEIGHBOURS.get(text[i].lower())
+    return text[:i] + rng.choice(neighbours) + text[i + 1:] if neighbours else text
+
+
+def _price(value: float, rng: random.Random) -> str:
+    return rng.choice(PRICE_FORMATS).format(v=int(value))
+
+
+def render(intent: Intent, rng: random.Random, typo_rate: float, accent_rate: float) -> str:
+    """Texto da busca para a intenção, com variação de escrita e ruído"""
+    subject = intent.term or intent.category.lower()
+    if intent.term is None and not subject.startswith("produtos") and rng.random() < 0.3:
+        subject = f"produtos de {subject}"
+    parts = [subject]
+    if intent.price_min is not None and intent.price_max is not None:
+        parts.append(f"entre {_price(intent.price_min, rng)} e {_price(intent.price_max, rng)}")
+    elif intent.price_max is not None:
+        parts.append(rng.choice(PRICE_MAX_PHRASES).format(p=_price(intent.price_max, rng)))
+    elif intent.price_min is not None:
+        parts.append(rng.choice(PRICE_MIN_PHRASES).format(p=_price(intent.price_min, rng)))
+    text = " ".join(parts)
+
+    if rng.random() < 0.2:
+        text = text.capitalize()
+    if rng.random() < accent_rate:
+        text = _strip_accents(text)
+    if rng.random() < typo_rate:
+        text = _typo(text, rng)
+    if rng.random() < 0.05:
+        text = f"  {text} "
+    return text
+
+
+def arrivals(start: datetime, rate: float, rng: random.Random) -> Iterator[float]:
+    """Offsets (s) de um processo de Poisson não-homogêneo com perfil diário"""
+    offset = 0.0
+    while True:
+        hour = (start + timedelta(seconds=offset)).hour
+        offset += rng.expovariate(rate * HOURLY_PROFILE[hour])
+        yield offset
+
+
+def generate_trace(
+    count: int,
+    universe_size: int = 5000,
+    zipf_s: float = 1.1,
+    typo_rate: float = 0.03,
+    accent_rate: float = 0.3,
+    rate: float = 20.0,
+    start: Optional[datetime] = None,
+    seed: int = 42,
+) -> Iterator[Dict[str, Any]]:
+    """Gera `count` eventos de busca (memória limitada ao tamanho do universo)"""
+    start = start or datetime(2026, 1, 1)
+    universe = build_universe(universe_size, random.Random(f"{seed}:universe"))
+    sampler = ZipfSampler(universe_size, zipf_s, random.Random(f"{seed}:zipf"))
+    noise = random.Random(f"{seed}:noise")
+    clock = arrivals(start, rate, random.Random(f"{seed}:arrivals"))
+
+    for _ in range(count):
+        intent = universe[sampler.sample()]
+        offset = next(clock)
+        yield {
+            "ts": (start + timedelta(seconds=offset)).isoformat(),
+            "offset_s": round(offset, 6),
+            "intent": intent.id,
+            "query": render(intent, noise, typo_rate, accent_rate),
+            "expected": intent.expected(),
+        }
+
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    """Lê um trace NDJSON linha a linha ("-" para stdin)"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def write_trace(events: Iterator[Dict[str, Any]], out: TextIO) -> None:
+    for event in events:
+        out.write(json.dumps(event, ensure_ascii=False))
+        out.write("\n")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Gera trace NDJSON de buscas com popularidade Zipf")
+    parser.add_argument("--count", type=int, default=10000, help="número de eventos")
+    parser.add_argument("--universe", type=int, default=5000, help="intenções distintas")
+    parser.add_argument("--zipf-s", type=float, default=1.1, help="expoente Zipf (maior = mais concentrado)")
+    parser.add_argument("--typo-rate", type=float, default=0.03, help="fração de buscas com typo")
+    parser.add_argument("--accent-rate", type=float, default=0.3, help="fração de buscas sem acento")
+    parser.add_argument("--rate", type=float, default=20.0, help="buscas/s médias (antes do perfil diário)")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None, help="início (ISO, padrão 2026-01-01)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output", help="arquivo de saída (padrão stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    events = generate_trace(
+        args.count,
+        universe_size=args.universe,
+        zipf_s=args.zipf_s,
+        typo_rate=args.typo_rate,
+        accent_rate=args.accent_rate,
+        rate=args.rate,
+        start=args.start,
+        seed=args.seed,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            write_trace(events, out)
+    else:
+        write_trace(events, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
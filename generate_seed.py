@@ -1,13 +1,27 @@
+"""
+Gerador de seed para o banco da API ONG
+
+Gera dados determinísticos (mesmo --seed + --reference-date => mesma saída) e
+referencialmente consistentes, em streaming: cada tabela é um gerador de
+linhas, e a saída é escrita aos poucos (memória constante para qualquer volume).
+
+Formatos:
+- insert: INSERTs multi-linha em lotes (padrão, compatível com o seed antigo)
+- copy:   COPY ... FROM stdin em formato texto do PostgreSQL (bem mais rápido)
+
+Uso:
+    python generate_seed.py > new_seed.sql
+    python generate_seed.py --products 1000000 --queries 500000 --format copy -o seed.sql
+    psql -U user -d ong_db -f seed.sql
+"""
+import argparse
 import random
-import uuid
-from datetime import datetime, timedelta
+import sys
 import unicodedata
-
-# Função para gerar data aleatória nos últimos 365 dias
-def random_date():
-    start = datetime.now() - timedelta(days=365)
-    end = datetime.now()
-    return start + (end - start) * random.random()
+import uuid
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
 
 # Hash bcrypt para 'password'
 password_hash = '$2b$10$S0BAdjm.thNhR8Zl.01bAegxO7dbFTTmqlCKTRPSN.CvnCQmTChtS'
@@ -56,138 +70,394 @@ products_by_category = {
     "Produtos Eletrônicos": ["Celular", "Computador", "Televisão", "Rádio", "Fone de Ouvido", "Carregador", "Mouse", "Teclado", "Impressora", "Câmera"]
 }
 
-# Gerar SQL
-sql = "-- Truncate all tables in reverse order to avoid foreign key issues\n"
-tables_reverse = ["search_clicks", "search_metrics", "queries", "order_items", "orders", "customers", "products", "users", "categories", "organizations"]
-for table in tables_reverse:
-    sql += f"TRUNCATE TABLE {table} RESTART IDENTITY CASCADE;\n"
-
-sql += "\n-- Insert organizations\n"
-for i, name in enumerate(ong_names[:40]):
-    email = f"{name.lower().replace(' ', '')}@ong.com"
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"INSERT INTO organizations (name, email, password_hash, created_at) VALUES ('{name}', '{email}', '{password_hash}', '{created_at}');\n"
-
-sql += "\n-- Insert categories\n"
-for i, cat in enumerate(categories[:20]):
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"INSERT INTO categories (name, created_at) VALUES ('{cat}', '{created_at}');\n"
-
-sql += "\n-- Insert products\n"
-for i in range(40):
-    cat_id = (i % 20) + 1
-    org_id = (i % 40) + 1
-    cat_name = categories[cat_id-1]
-    prod_list = products_by_category[cat_name]
-    prod = prod_list[i % len(prod_list)]
-    desc = f"Produto {prod} para doação"
-    price = round(random.uniform(5, 100), 2)
-    # create a safe ascii image filename (remove accents and spaces)
-    safe_name = unicodedata.normalize('NFKD', prod).encode('ascii', 'ignore').decode('ascii')
-    safe_name = safe_name.lower().replace(' ', '')
-    image_url = f"http://example.com/{safe_name}.jpg"
-    stock = random.randint(10, 500)
-    weight = random.randint(100, 2000)
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    # escape single quotes for SQL
-    prod_esc = prod.replace("'", "''")
-    desc_esc = desc.replace("'", "''")
-    # include search_vector to populate full-text index
-    sql += f"INSERT INTO products (name, description, price, category_id, image_url, stock_qty, weight_grams, organization_id, created_at, search_vector) VALUES ('{prod_esc}', '{desc_esc}', {price}, {cat_id}, '{image_url}', {stock}, {weight}, {org_id}, '{created_at}', to_tsvector('portuguese', '{prod_esc} ' || '{desc_esc}'));\n"
-
-# Users: 40
-sql += "\n-- Insert users\n"
-sql += "INSERT INTO users (name, email, password_hash, role, organization_id, created_at) VALUES\n"
-roles = ["admin", "user"]
-for i in range(40):
-    org_id = (i % 40) + 1
-    name = f"Usuário {i+1} da ONG {org_id}"
-    email = f"user{i+1}@ong{org_id}.com"
-    role = random.choice(roles)
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"('{name}', '{email}', '{password_hash}', '{role}', {org_id}, '{created_at}')"
-    sql += "," if i < 39 else ";"
-sql += "\n"
-
-# Customers: 40+
-sql += "\n-- Insert customers\n"
-sql += "INSERT INTO customers (name, email, created_at) VALUES\n"
-for i in range(40):
-    name = f"Cliente {i+1}"
-    email = f"cliente{i+1}@example.com"
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"('{name}', '{email}', '{created_at}')"
-    sql += "," if i < 39 else ";"
-sql += "\n"
-
-# Orders: 40+
-sql += "\n-- Insert orders\n"
-sql += "INSERT INTO orders (customer_id, created_at) VALUES\n"
-for i in range(40):
-    customer_id = random.randint(1, 40)
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"({customer_id}, '{created_at}')"
-    sql += "," if i < 39 else ";"
-sql += "\n"
-
-# Order items: 40
-sql += "\n-- Insert order_items\n"
-sql += "INSERT INTO order_items (order_id, product_id, quantity, price_at_time, organization_id, created_at) VALUES\n"
-for i in range(40):
-    order_id = (i % 40) + 1
-    product_id = (i % 40) + 1
-    quantity = random.randint(1, 10)
-    price = round(random.uniform(5, 100), 2)
-    org_id = (i % 40) + 1
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"({order_id}, {product_id}, {quantity}, {price}, {org_id}, '{created_at}')"
-    sql += "," if i < 39 else ";"
-sql += "\n"
-
-# Queries: 40+
-sql += "\n-- Insert queries\n"
-sql += "INSERT INTO queries (id, query_text, filters, status, created_at, updated_at) VALUES\n"
-for i in range(40):
-    qid = str(uuid.uuid4())
-    query_text = f"Busca por {random.choice(['alimentos', 'roupas', 'brinquedos', 'livros'])}"
-    filters = '{"category": "alimentos"}' if random.random() > 0.5 else '{}'
-    status = random.choice(["pending", "completed", "failed"])
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    updated_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"('{qid}', '{query_text}', '{filters}', '{status}', '{created_at}', '{updated_at}')"
-    sql += "," if i < 39 else ";"
-sql += "\n"
-
-# Search metrics: 40+
-sql += "\n-- Insert search_metrics\n"
-sql += "INSERT INTO search_metrics (id, query, ai_used, fallback_applied, results_count, zero_results, latency_ms, user_id, created_at) VALUES\n"
-metrics_ids = []
-for i in range(40):
-    sid = str(uuid.uuid4())
-    query = f"Busca {i+1}"
-    ai_used = random.choice([True, False])
-    fallback = random.choice([True, False])
-    results = random.randint(0, 50)
-    zero = results == 0
-    latency = random.randint(100, 3000)
-    user_id = f"user{random.randint(1,200)}@ong{random.randint(1,40)}.com"
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"('{sid}', '{query}', {ai_used}, {fallback}, {results}, {zero}, {latency}, '{user_id}', '{created_at}')"
-    sql += "," if i < 39 else ";"
-    metrics_ids.append(sid)
-sql += "\n"
-
-# Search clicks: 40+
-sql += "\n-- Insert search_clicks\n"
-sql += "INSERT INTO search_clicks (id, search_metric_id, product_id, position, created_at) VALUES\n"
-for i in range(40):
-    cid = str(uuid.uuid4())
-    sm_id = random.choice(metrics_ids) if metrics_ids else str(uuid.uuid4())
-    prod_id = random.randint(1, 40)
-    position = random.randint(1, 10)
-    created_at = random_date().strftime('%Y-%m-%d %H:%M:%S')
-    sql += f"('{cid}', '{sm_id}', {prod_id}, {position}, '{created_at}')"
-    sql += "," if i < 39 else ";"
-sql += "\n"
-
-print(sql)
\ No newline at end of file
+# Volumes padrão (mesmos do seed original)
+DEFAULT_COUNTS = {
+    "organizations": 40,
+    "categories": 20,
+    "products": 40,
+    "users": 40,
+    "customers": 40,
+    "orders": 40,
+    "order_items": 40,
+    "queries": 40,
+    "search_metrics": 40,
+    "search_clicks": 40,
+}
+
+# Namespace para UUIDs determinísticos (search_clicks referencia search_metrics sem guardar a lista)
+_SEED_NAMESPACE = uuid.UUID("6f0c6d1e-9d0a-4c7e-8a59-5e2f0b1c7a10")
+
+Row = Tuple[Any, ...]
+
+
+class SeedContext:
+    """Parâmetros compartilhados por todos os geradores de tabela"""
+
+    def __init__(self, counts: Dict[str, int], seed: int = 42, reference_date: Optional[date] = None):
+        self.counts = {**DEFAULT_COUNTS, **counts}
+        self.seed = seed
+        reference_date = reference_date or date.today()
+        self.end = datetime(reference_date.year, reference_date.month, reference_date.day)
+        self.start = self.end - timedelta(days=365)
+        self._span = (self.end - self.start).total_seconds()
+
+    def rng(self, table: str) -> random.Random:
+        """RNG independente por tabela (permite gerar/carregar tabelas em paralelo)"""
+        return random.Random(f"{self.seed}:{table}")
+
+    def random_date(self, rng: random.Random) -> datetime:
+        """Data aleatória nos últimos 365 dias antes da data de referência"""
+        return self.start + timedelta(seconds=int(rng.random() * self._span))
+
+    def uuid_for(self, table: str, index: int) -> uuid.UUID:
+        """UUID determinístico da linha `index` da tabela"""
+        return uuid.uuid5(_SEED_NAMESPACE, f"{self.seed}:{table}:{index}")
+
+    def uuid_random(self, rng: random.Random) -> uuid.UUID:
+        return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _numbered(names: Sequence[str], i: int) -> str:
+    """Nome único: repete o vocabulário com sufixo numérico após esgotá-lo"""
+    base = names[i % len(names)]
+    return base if i < len(names) else f"{base} {i // len(names) + 1}"
+
+
+@lru_cache(maxsize=4096)
+def _ascii_slug(text: str) -> str:
+    """Remove acentos e espaços (para e-mails e nomes de arquivo)"""
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower().replace(" ", "")
+
+
+# ============================================================================
+# Geradores por tabela: cada um produz tuplas com valores Python nativos
+# ============================================================================
+
+
+def organizations_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("organizations")
+    for i in range(ctx.counts["organizations"]):
+        name = _numbered(ong_names, i)
+        yield (name, f"{_ascii_slug(name)}@ong.com", password_hash, ctx.random_date(rng))
+
+
+def categories_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("categories")
+    for i in range(ctx.counts["categories"]):
+        yield (_numbered(categories, i), ctx.random_date(rng))
+
+
+def products_rows(ctx: SeedContext) -> Iterator[Row]:
+    # search_vector é preenchido pelo trigger products_search_vector_trigger (003)
+    rng = ctx.rng("products")
+    n_categories, n_orgs = ctx.counts["categories"], ctx.counts["organizations"]
+    for i in range(ctx.counts["products"]):
+        cat_id = (i % n_categories) + 1
+        org_id = (i % n_orgs) + 1
+        prod_list = products_by_category[categories[(cat_id - 1) % len(categories)]]
+        prod = prod_list[(i // n_categories) % len(prod_list)]
+        image_url = f"http://example.com/{_ascii_slug(prod)}.jpg"
+        yield (
+            prod,
+            f"Produto {prod} para doação",
+            round(rng.uniform(5, 100), 2),
+            cat_id,
+            image_url,
+            rng.randint(10, 500),
+            rng.randint(100, 2000),
+            org_id,
+            ctx.random_date(rng),
+        )
+
+
+def users_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("users")
+    roles = ["admin", "user"]
+    n_orgs = ctx.counts["organizations"]
+    for i in range(ctx.counts["users"]):
+        org_id = (i % n_orgs) + 1
+        yield (
+            f"Usuário {i+1} da ONG {org_id}",
+            f"user{i+1}@ong{org_id}.com",
+            password_hash,
+            rng.choice(roles),
+            org_id,
+            ctx.random_date(rng),
+        )
+
+
+def customers_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("customers")
+    for i in range(ctx.counts["customers"]):
+        yield (f"Cliente {i+1}", f"cliente{i+1}@example.com", ctx.random_date(rng))
+
+
+def orders_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("orders")
+    n_customers = ctx.counts["customers"]
+    for _ in range(ctx.counts["orders"]):
+        yield (rng.randint(1, n_customers), ctx.random_date(rng))
+
+
+def order_items_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("order_items")
+    n_orders, n_products, n_orgs = ctx.counts["orders"], ctx.counts["products"], ctx.counts["organizations"]
+    for i in range(ctx.counts["order_items"]):
+        product_id = rng.randint(1, n_products) if i >= n_products else i + 1
+        yield (
+            (i % n_orders) + 1,
+            product_id,
+            rng.randint(1, 10),
+            round(rng.uniform(5, 100), 2),
+            # organização dona do produto (mesma regra de products_rows)
+            ((product_id - 1) % n_orgs) + 1,
+            ctx.random_date(rng),
+        )
+
+
+def queries_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("queries")
+    terms = ["alimentos", "roupas", "brinquedos", "livros"]
+    statuses = ["pending", "completed", "failed"]
+    for _ in range(ctx.counts["queries"]):
+        filters = '{"category": "alimentos"}' if rng.random() > 0.5 else "{}"
+        yield (
+            str(ctx.uuid_random(rng)),
+            f"Busca por {rng.choice(terms)}",
+            filters,
+            rng.choice(statuses),
+            ctx.random_date(rng),
+            ctx.random_date(rng),
+        )
+
+
+def search_metrics_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("search_metrics")
+    for i in range(ctx.counts["search_metrics"]):
+        results = rng.randint(0, 50)
+        yield (
+            ctx.uuid_for("search_metrics", i),
+            f"Busca {i+1}",
+            rng.choice([True, False]),
+            rng.choice([True, False]),
+            results,
+            results == 0,
+            rng.randint(100, 3000),
+            f"user{rng.randint(1, 200)}@ong{rng.randint(1, 40)}.com",
+            ctx.random_date(rng),
+        )
+
+
+def search_clicks_rows(ctx: SeedContext) -> Iterator[Row]:
+    rng = ctx.rng("search_clicks")
+    n_metrics, n_products = ctx.counts["search_metrics"], ctx.counts["products"]
+    if n_metrics == 0:
+        return
+    for _ in range(ctx.counts["search_clicks"]):
+        yield (
+            ctx.uuid_random(rng),
+            ctx.uuid_for("search_metrics", rng.randrange(n_metrics)),
+            rng.randint(1, n_products),
+            rng.randint(1, 10),
+            ctx.random_date(rng),
+        )
+
+
+class TableSpec:
+    """Tabela do seed: colunas, gerador de linhas e dependências (FKs)"""
+
+    def __init__(self, name: str, columns: List[str], rows: Callable[[SeedContext], Iterator[Row]], depends_on=()):
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        self.depends_on = tuple(depends_on)
+
+
+# Em ordem de dependência (pais antes dos filhos)
+TABLES: List[TableSpec] = [
+    TableSpec("organizations", ["name", "email", "password_hash", "created_at"], organizations_rows),
+    TableSpec("categories", ["name", "created_at"], categories_rows),
+    TableSpec(
+        "products",
+        ["name", "description", "price", "category_id", "image_url", "stock_qty", "weight_grams", "organization_id", "created_at"],
+        products_rows,
+        depends_on=("categories", "organizations"),
+    ),
+    TableSpec(
+        "users",
+        ["name", "email", "password_hash", "role", "organization_id", "created_at"],
+        users_rows,
+        depends_on=("organizations",),
+    ),
+    TableSpec("customers", ["name", "email", "created_at"], customers_rows),
+    TableSpec("orders", ["customer_id", "created_at"], orders_rows, depends_on=("customers",)),
+    TableSpec(
+        "order_items",
+        ["order_id", "product_id", "quantity", "price_at_time", "organization_id", "created_at"],
+        order_items_rows,
+        depends_on=("orders", "products", "organizations"),
+    ),
+    TableSpec("queries", ["id", "query_text", "filters", "status", "created_at", "updated_at"], queries_rows),
+    TableSpec(
+        "search_metrics",
+        ["id", "query", "ai_used", "fallback_applied", "results_count", "zero_results", "latency_ms", "user_id", "created_at"],
+        search_metrics_rows,
+    ),
+    TableSpec(
+        "search_clicks",
+        ["id", "search_metric_id", "product_id", "position", "created_at"],
+        search_clicks_rows,
+        depends_on=("search_metrics", "products"),
+    ),
+]
+
+
+# ============================================================================
+# Serialização (INSERT / COPY)
+# ============================================================================
+
+
+def _sql_literal(value: Any) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, datetime):
+        return f"'{value.isoformat(sep=' ', timespec='seconds')}'"
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_field(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    text = str(value)
+    # translate é caro; só escapa quando há caractere especial
+    if "\\" in text or "\t" in text or "\n" in text or "\r" in text:
+        return text.translate(_COPY_ESCAPES)
+    return text
+
+
+def insert_lines(table: TableSpec, rows: Iterable[Row], batch_size: int = 1000) -> Iterator[str]:
+    """INSERTs multi-linha, um a cada `batch_size` linhas"""
+    header = f"INSERT INTO {table.name} ({', '.join(table.columns)}) VALUES\n"
+    batch: List[str] = []
+    for row in rows:
+        batch.append("(" + ", ".join(_sql_literal(v) for v in row) + ")")
+        if len(batch) >= batch_size:
+            yield header + ",\n".join(batch) + ";\n"
+            batch = []
+    if batch:
+        yield header + ",\n".join(batch) + ";\n"
+
+
+def copy_lines(table: TableSpec, rows: Iterable[Row]) -> Iterator[str]:
+    """Bloco COPY ... FROM stdin (formato texto), terminado por `\\.`"""
+    yield f"COPY {table.name} ({', '.join(table.columns)}) FROM stdin;\n"
+    for row in rows:
+        yield "\t".join(_copy_field(v) for v in row) + "\n"
+    yield "\\.\n"
+
+
+def generate_sql(
+    ctx: SeedContext,
+    fmt: str = "insert",
+    truncate: bool = True,
+    batch_size: int = 1000,
+) -> Iterator[str]:
+    """Gera o script de seed completo, pedaço a pedaço"""
+    if truncate:
+        yield "-- Truncate all tables in reverse order to avoid foreign key issues\n"
+        for table in reversed(TABLES):
+            yield f"TRUNCATE TABLE {table.name} RESTART IDENTITY CASCADE;\n"
+
+    for table in TABLES:
+        yield f"\n-- Insert {table.name} ({ctx.counts[table.name]} linhas)\n"
+        rows = table.rows(ctx)
+        if fmt == "copy":
+            yield from copy_lines(table, rows)
+        else:
+            yield from insert_lines(table, rows, batch_size)
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser) -> None:
+    """Argumentos de volume/semente compartilhados com o loader (load_seed.py)"""
+    for table, default in DEFAULT_COUNTS.items():
+        parser.add_argument(
+            f"--{table.replace('_', '-')}", type=int, default=default, metavar="N",
+            help=f"linhas em {table} (padrão {default})",
+        )
+    parser.add_argument("--seed", type=int, default=42, help="semente aleatória (padrão 42)")
+    parser.add_argument(
+        "--reference-date", type=date.fromisoformat, default=None,
+        help="datas geradas no ano anterior a esta data (YYYY-MM-DD, padrão hoje)",
+    )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Gera seed SQL para o banco da API ONG")
+    add_seed_arguments(parser)
+    parser.add_argument("--format", choices=["insert", "copy"], default="insert")
+    parser.add_argument("--batch-size", type=int, default=1000, help="linhas por INSERT")
+    parser.add_argument("--no-truncate", action="store_true", help="não emite TRUNCATE")
+    parser.add_argument("-o", "--output", help="arquivo de saída (padrão stdout)")
+    return check_seed_arguments(parser, parser.parse_args(argv))
+
+
+def counts_from_args(args: argparse.Namespace) -> Dict[str, int]:
+    return {table: getattr(args, table) for table in DEFAULT_COUNTS}
+
+
+def validate_counts(counts: Dict[str, int]) -> None:
+    """Contagem negativa ou tabela filha com linhas e pai vazio (FK sem alvo) -> ValueError"""
+    for table in TABLES:
+        flag = f"--{table.name.replace('_', '-')}"
+        if counts[table.name] < 0:
+            raise ValueError(f"{flag} não pode ser negativo")
+        if counts[table.name] == 0:
+            continue
+        for dependency in table.depends_on:
+            if counts[dependency] == 0:
+                raise ValueError(
+                    f"{flag} {counts[table.name]} exige --{dependency.replace('_', '-')} > 0 "
+                    f"(use {flag} 0 para pular a tabela)"
+                )
+
+
+def check_seed_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> argparse.Namespace:
+    """Valida as contagens de `add_seed_arguments` (erro de uso do argparse, sem traceback)"""
+    try:
+        validate_counts(counts_from_args(args))
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+
+def write_chunks(chunks: Iterable[str], out: TextIO) -> None:
+    for chunk in chunks:
+        out.write(chunk)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    ctx = SeedContext(counts_from_args(args), seed=args.seed, reference_date=args.reference_date)
+    chunks = generate_sql(ctx, fmt=args.format, truncate=not args.no_truncate, batch_size=args.batch_size)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            write_chunks(chunks, out)
+    else:
+        write_chunks(chunks, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
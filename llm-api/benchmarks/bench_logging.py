@@ -0,0 +1,171 @@
+"""
+Benchmark: tempo de event loop gasto com logging por request
+
+Compara o setup antigo (basicConfig + StreamHandler síncrono + f-strings) com
+a pipeline de `llm_api.logging_config` (QueueHandler sem formatação no loop,
+JSON no listener, com e sem amostragem por rota).
+
+O custo que a pipeline remove do loop é sobretudo a escrita bloqueante: em
+produção o stderr vai para um pipe (driver de log do Docker) que pode atrasar
+cada flush. `--sink-latency-us` simula esse atraso por flush. Com sink
+instantâneo (`--sink-latency-us 0`) a formatação JSON na thread do listener
+disputa o GIL com o loop e o ganho vem apenas da amostragem.
+
+Uso:
+    python benchmarks/bench_logging.py [--requests 20000] [--concurrency 200] [--sink-latency-us 50]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llm_api.logging_config import current_route, setup_logging, shutdown_logging  # noqa: E402
+
+ROUTE = "/api/v1/parse-query"
+QUERY = "brownie de chocolate com nozes até 25 reais para festa infantil"
+
+controller_log = logging.getLogger("bench.controller")
+service_log = logging.getLogger("bench.service")
+repository_log = logging.getLogger("bench.repository")
+
+
+async def request_eager(i: int) -> None:
+    """Mesmo volume de logs de um request atual, com f-strings"""
+    controller_log.info(f"[HTTP] POST /parse-query - query: {QUERY}")
+    service_log.info(f"Iniciando parse de query: {QUERY}")
+    repository_log.info(f"Cache MISS para: {QUERY}")
+    service_log.info("LLM retornou resposta com sucesso")
+    repository_log.info(f"Query salva com ID: q-{i} (texto: {QUERY[:50]}...)")
+    controller_log.info(f"[HTTP] Resposta com sucesso - query_id: q-{i}")
+    await asyncio.sleep(0)
+
+
+async def request_silent(i: int) -> None:
+    """Request sem logs (linha de base do próprio loop)"""
+    await asyncio.sleep(0)
+
+
+class SlowSink:
+    """Stream cujo flush bloqueia por `latency` segundos (pipe sob pressão)"""
+
+    def __init__(self, stream, latency: float):
+        self._stream = stream
+        self._latency = latency
+
+    def write(self, data):
+        return self._stream.write(data)
+
+    def flush(self):
+        self._stream.flush()
+        if self._latency:
+            time.sleep(self._latency)
+
+
+async def request_lazy(i: int) -> None:
+    """Mesmo volume de logs com %-style (interpolação adiada)"""
+    token = current_route.set(ROUTE)
+    try:
+        controller_log.info("[HTTP] POST /parse-query - query: %s", QUERY)
+        service_log.info("Iniciando parse de query: %s", QUERY)
+        repository_log.info("Cache MISS para: %s", QUERY)
+        service_log.info("LLM retornou resposta com sucesso")
+        repository_log.info("Query salva com ID: %s (texto: %s...)", f"q-{i}", QUERY[:50])
+        controller_log.info("[HTTP] Resposta com sucesso - query_id: %s", f"q-{i}")
+        await asyncio.sleep(0)
+    finally:
+        current_route.reset(token)
+
+
+async def drive(handler, total: int, concurrency: int) -> float:
+    """Executa `total` requests com `concurrency` simultâneos; retorna segundos de loop"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await handler(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - started
+
+
+def reset_root(stream=None) -> logging.Logger:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    return root
+
+
+def run_case(name: str, configure, handler, total: int, concurrency: int, sink: str, latency: float):
+    with open(sink, "w") as raw:
+        stream = SlowSink(raw, latency)
+        configure(stream)
+        elapsed = asyncio.run(drive(handler, total, concurrency))
+        drained_at = time.perf_counter()
+        shutdown_logging()
+        drain = time.perf_counter() - drained_at
+        reset_root()
+    per_request_us = elapsed / total * 1e6
+    print(
+        f"{name:<32} loop {elapsed * 1000:8.1f} ms | {per_request_us:7.1f} µs/req "
+        f"| ~{total / elapsed:9.0f} req/s de teto | drenagem {drain * 1000:7.1f} ms"
+    )
+    return per_request_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--sink-latency-us", type=float, default=50)
+    args = parser.parse_args()
+    latency = args.sink_latency_us / 1e6
+
+    sink = os.path.join(tempfile.mkdtemp(), "bench.log")
+
+    def sync_text(stream):
+        # Equivalente ao antigo logging.basicConfig(level=logging.INFO)
+        root = reset_root()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+
+    def queued_json(stream):
+        reset_root()
+        setup_logging(level="INFO", stream=stream)
+
+    def queued_sampled(stream):
+        reset_root()
+        setup_logging(level="INFO", stream=stream, sample_rates={ROUTE: args.sample_rate})
+
+    print(
+        f"{args.requests} requests, {args.concurrency} simultâneos, 6 logs INFO/request, "
+        f"flush +{args.sink_latency_us:.0f} µs\n"
+    )
+    cases = [
+        ("sem logs (linha de base)", reset_root, request_silent),
+        ("sync + f-string (atual)", sync_text, request_eager),
+        ("queue + JSON + lazy", queued_json, request_lazy),
+        (f"queue + JSON + sample {args.sample_rate:.0%}", queued_sampled, request_lazy),
+    ]
+    results = [
+        run_case(name, configure, handler, args.requests, args.concurrency, sink, latency)
+        for name, configure, handler in cases
+    ]
+    base, sync_cost, queued, sampled = results
+    print("\nCusto de logging no event loop (µs/request, descontada a linha de base):")
+    print(f"  sync + f-string: {sync_cost - base:7.1f}")
+    print(f"  queue + JSON:    {queued - base:7.1f}")
+    print(f"  queue + sample:  {sampled - base:7.1f}")
+
+if __name__ == "__main__":
+    main()
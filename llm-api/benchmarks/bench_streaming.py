@@ -0,0 +1,112 @@
+"""
+Benchmark: tempo até o primeiro filtro utilizável no parse em streaming
+
+Simula um LLM que demora `--ttft-ms` até o primeiro token e `--token-ms` por
+token (~4 caracteres dos argumentos JSON da tool call) e compara:
+- parse_query_only: espera a resposta estruturada inteira
+- stream_parse_query: primeiro `partial` com category ou preço, e o `final`
+
+Roda no service (sem HTTP): o cliente httpx em ASGITransport junta o corpo
+inteiro antes de devolver e esconderia o ganho.
+
+Uso:
+    python benchmarks/bench_streaming.py [--ttft-ms 300] [--token-ms 15] [--runs 20]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock
+
+from langchain_core.messages import AIMessageChunk
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llm_api.repositories import QueryRepository  # noqa: E402
+from llm_api.schemas import FiltrosBusca  # noqa: E402
+from llm_api.services import QueryService  # noqa: E402
+
+# Argumentos na ordem em que o modelo os emite (o último campo só conta como
+# concluído no fim do stream)
+CASES = {
+    "doces até 25 reais": {"category": "Doces", "price_max": 25.0, "search_term": "doces"},
+    "bolo de chocolate para festa infantil a partir de 40": {
+        "category": "Doces", "price_min": 40.0, "search_term": "bolo de chocolate para festa infantil",
+    },
+    "detergente neutro biodegradável": {
+        "search_term": "detergente neutro biodegradável", "category": "Limpeza",
+    },
+}
+
+
+class SimulatedLLM:
+    """LLM estruturado com include_raw: tokens da tool call chegam em ritmo fixo"""
+
+    def __init__(self, args: dict, ttft: float, per_token: float):
+        text = json.dumps(args, ensure_ascii=False)
+        self._tokens = [text[i:i + 4] for i in range(0, len(text), 4)]
+        self._filtros = FiltrosBusca(**args)
+        self._ttft = ttft
+        self._per_token = per_token
+
+    async def ainvoke(self, _prompt):
+        await asyncio.sleep(self._ttft + self._per_token * len(self._tokens))
+        return {"raw": MagicMock(usage_metadata={}), "parsed": self._filtros, "parsing_error": None}
+
+    async def astream(self, _prompt):
+        await asyncio.sleep(self._ttft)
+        for i, token in enumerate(self._tokens):
+            if i:
+                await asyncio.sleep(self._per_token)
+            yield {"raw": AIMessageChunk(
+                content="", tool_call_chunks=[{"name": "FiltrosBusca", "args": token, "id": "1", "index": 0}]
+            )}
+        yield {"parsed": self._filtros}
+
+
+def usable(filtros: FiltrosBusca) -> bool:
+    """Já dá para começar a busca de produtos (categoria ou faixa de preço)"""
+    return filtros.category is not None or filtros.price_min is not None or filtros.price_max is not None
+
+
+async def measure(query: str, args: dict, ttft: float, per_token: float):
+    llm = SimulatedLLM(args, ttft, per_token)
+    service = QueryService(llm_model=MagicMock(), repository=QueryRepository(), structured_llm_provider=lambda: llm)
+
+    started = time.perf_counter()
+    await service.parse_query_only(query)
+    blocking = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first_usable = None
+    async for event, partial in service.stream_parse_query(query):
+        if first_usable is None and usable(partial):
+            first_usable = time.perf_counter() - started
+        if event == "final":
+            final = time.perf_counter() - started
+    return blocking, first_usable, final
+
+
+async def main_async(ttft: float, per_token: float, runs: int) -> None:
+    print(f"TTFT {ttft * 1000:.0f} ms, {per_token * 1000:.0f} ms/token, mediana de {runs} execuções\n")
+    print(f"{'query':<54} {'bloqueante':>11} {'1º filtro':>10} {'final':>8}")
+    for query, args in CASES.items():
+        samples = [await measure(query, args, ttft, per_token) for _ in range(runs)]
+        blocking, first, final = (statistics.median(column) * 1000 for column in zip(*samples))
+        print(f"{query[:54]:<54} {blocking:9.0f}ms {first:8.0f}ms {final:6.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=15)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.ttft_ms / 1000, args.token_ms / 1000, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: overhead por request do /parse-query em JSON vs MessagePack
+
+Mede só o lado Python (FastAPI + controller + serialização), com o service
+devolvendo filtros prontos: sem LLM, sem banco e sem rede (cliente httpx
+sobre ASGITransport, na mesma thread). A diferença entre as rotas é o que
+o transporte compacto economiza: validação do corpo pelo FastAPI,
+response_model, jsonable_encoder e JSONResponse.
+
+Também mostra o custo isolado de codificar/decodificar e o tamanho dos corpos.
+
+Uso:
+    python benchmarks/bench_transport.py [--requests 5000] [--rounds 3]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import msgpack
+from fastapi import FastAPI
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llm_api.controllers import QueryController, create_router  # noqa: E402
+from llm_api.controllers.transport import MSGPACK_MEDIA_TYPE, decode, encode  # noqa: E402
+from llm_api.schemas import FiltrosBusca  # noqa: E402
+
+PAYLOAD = {"query": "brownie de chocolate com nozes até 25 reais para festa infantil", "organization_id": 1}
+FILTERS = FiltrosBusca(search_term="brownie de chocolate", category="Doces", price_min=None, price_max=25.0)
+
+
+class StubService:
+    """Service sem LLM nem banco: isola o custo do transporte"""
+
+    async def parse_and_save_query(self, query_input, idempotency_key=None):
+        return FILTERS, "bench-id"
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(create_router(QueryController(service=StubService())))
+    return app
+
+
+async def drive(client: httpx.AsyncClient, total: int, request) -> float:
+    """Executa `total` requests em sequência; retorna µs/request"""
+    started = time.perf_counter()
+    for _ in range(total):
+        response = await request(client)
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - started) / total * 1e6
+
+
+def codec_cost(total: int) -> None:
+    body_json = json.dumps(PAYLOAD).encode()
+    body_packed = msgpack.packb(PAYLOAD)
+    out_json = encode(FILTERS.model_dump(), "application/json")
+    out_packed = encode(FILTERS.model_dump(), MSGPACK_MEDIA_TYPE)
+    print(f"Corpo do request: JSON {len(body_json)} B | MessagePack {len(body_packed)} B")
+    print(f"Corpo da resposta: JSON {len(out_json)} B | MessagePack {len(out_packed)} B\n")
+
+    for label, media_type in (("JSON", "application/json"), ("MessagePack", MSGPACK_MEDIA_TYPE)):
+        body = body_json if media_type == "application/json" else body_packed
+        started = time.perf_counter()
+        for _ in range(total):
+            decode(body, media_type)
+            encode(FILTERS.model_dump(), media_type)
+        per_request = (time.perf_counter() - started) / total * 1e6
+        print(f"{label:<12} decode + encode isolados: {per_request:6.2f} µs/req")
+
+
+async def main_async(total: int, rounds: int) -> None:
+    transport = httpx.ASGITransport(app=build_app())
+    body_packed = msgpack.packb(PAYLOAD)
+    cases = {
+        "JSON (/parse-query)": lambda c: c.post("/api/v1/parse-query", json=PAYLOAD),
+        "MessagePack (/parse-query/msgpack)": lambda c: c.post(
+            "/api/v1/parse-query/msgpack", content=body_packed, headers={"Content-Type": MSGPACK_MEDIA_TYPE}
+        ),
+    }
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # aquecimento (rotas, caches do pydantic)
+        for request in cases.values():
+            await drive(client, 200, request)
+        # chamada vazia do cliente httpx + ASGI: linha de base descontada
+        baseline = min([await drive(client, total, lambda c: c.get("/api/v1/health")) for _ in range(rounds)])
+        results = {}
+        for name, request in cases.items():
+            results[name] = min([await drive(client, total, request) for _ in range(rounds)])
+
+    print(f"\n{total} requests sequenciais, melhor de {rounds} rodadas (µs/request)")
+    print(f"{'GET /health (linha de base)':<36} {baseline:8.1f}")
+    for name, per_request in results.items():
+        print(f"{name:<36} {per_request:8.1f}  (+{per_request - baseline:6.1f} sobre a linha de base)")
+    json_cost, packed_cost = (value - baseline for value in results.values())
+    print(f"\nOverhead do MessagePack relativo ao JSON: {packed_cost / json_cost:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    codec_cost(args.requests * 10)
+    asyncio.run(main_async(args.requests, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,473 @@
+"""
+Simulador offline de políticas de cache sobre histórico de queries
+
+Roda um trace gravado (NDJSON de `generate_query_trace.py` ou a tabela
+`queries`) contra políticas candidatas e imprime, por normalizador, a curva de
+hit rate x memória estimada x chamadas LLM evitadas:
+
+- lru      LRU + TTL, igual ao `QueryCache` (TTL contado da inserção, não
+           renovado em hit). Todas as capacidades saem de UMA passada: o
+           trace é empurrado por uma pilha LRU segmentada nos limites de
+           `--sizes`, e o segmento onde a chave estava é a faixa da sua
+           distância de pilha (Mattson). Hit em capacidade C <=> distância < C.
+- lfu      LFU O(1) (buckets de frequência), desempate pelo mais antigo
+- tinylfu  LRU com admissão TinyLFU: count-min sketch de 4 linhas com
+           envelhecimento; um novo item só entra se for mais frequente que a
+           vítima
+- sql      sem limite de tamanho, só TTL: o comportamento de
+           `find_cached_query` (24h hoje) para comparar TTLs e normalizadores
+
+As queries são internadas em inteiros (`array('I')`) uma vez por
+normalizador; as políticas só veem ints e floats. "LLM evitadas" é o número de
+hits da política isolada (ou seja, sem outro nível de cache atrás). A memória
+por entrada é medida com tracemalloc num `QueryCache` real preenchido com
+chaves do próprio trace.
+
+Custo (1M eventos, 64k chaves, 1 core): a passada LRU com 7 capacidades leva
+~4-6s; LFU e TinyLFU ~1.5-2s por capacidade. As simulações independentes
+rodam em paralelo (`--jobs`, padrão = núcleos da máquina).
+
+Uso:
+    python benchmarks/simulate_cache_policy.py --trace trace.ndjson
+    python benchmarks/simulate_cache_policy.py --trace trace.ndjson \\
+        --policies lru,tinylfu,sql --ttls 1h,24h,inf --normalizers raw,default,unaccent,tokens
+    python benchmarks/simulate_cache_policy.py --from-db --since-hours 168 --csv curves.csv
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import re
+import sys
+import time
+import tracemalloc
+import unicodedata
+import uuid
+from array import array
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llm_api.cache import QueryCache  # noqa: E402
+from llm_api.normalization import normalize_query, normalize_query_v1  # noqa: E402
+
+DEFAULT_SIZES = "100,250,500,1000,2500,5000,10000"
+STOPWORDS = frozenset({"de", "da", "do", "das", "dos", "e", "para", "com", "a", "o", "em"})
+_SPACES = re.compile(r"\s+")
+
+
+# ---------------------------------------------------------------------------
+# Normalizadores
+# ---------------------------------------------------------------------------
+
+def _strip_accents(text: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c)
+    )
+
+
+def _unaccent(text: str) -> str:
+    """Regra v1 + remoção de acentos (e dos espaços duplos que ela deixa)"""
+    return _SPACES.sub(" ", _strip_accents(normalize_query_v1(text)))
+
+
+def _tokens(text: str) -> str:
+    words = set(_unaccent(text).split()) - STOPWORDS
+    return " ".join(sorted(words))
+
+
+NORMALIZERS: Dict[str, Callable[[str], str]] = {
+    "raw": lambda text: text,
+    "v1": normalize_query_v1,
+    "default": normalize_query,
+    "unaccent": _unaccent,
+    "tokens": _tokens,
+}
+
+
+# ---------------------------------------------------------------------------
+# Trace
+# ---------------------------------------------------------------------------
+
+def read_trace(path: str, limit: Optional[int]) -> Tuple[List[str], array]:
+    """Lê (queries, offsets em segundos) de um NDJSON ("-" para stdin)"""
+    queries: List[str] = []
+    times = array("d")
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            queries.append(event["query"])
+            times.append(float(event.get("offset_s", 0.0)))
+            if limit and len(queries) >= limit:
+                break
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return queries, times
+
+
+async def read_queries_table(since_hours: int, limit: Optional[int]) -> Tuple[List[str], array]:
+    """Lê (queries, offsets) da tabela `queries` (variáveis DB_*)"""
+    import asyncpg
+
+    conn = await asyncpg.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", 5432)),
+        database=os.getenv("DB_NAME", "ong_db"),
+        user=os.getenv("DB_USER", "user"),
+        password=os.getenv("DB_PASSWORD", "password"),
+    )
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT query_text, EXTRACT(EPOCH FROM created_at)::float8 AS ts
+            FROM queries
+            WHERE created_at > NOW() - make_interval(hours => $1)
+            ORDER BY created_at
+            LIMIT $2
+            """,
+            since_hours,
+            limit,
+        )
+    finally:
+        await conn.close()
+    start = rows[0]["ts"] if rows else 0.0
+    return [r["query_text"] for r in rows], array("d", (r["ts"] - start for r in rows))
+
+
+def intern_keys(queries: Sequence[str], normalizer: Callable[[str], str]) -> Tuple[array, List[str]]:
+    """Mapeia cada query para o id inteiro da sua chave normalizada"""
+    by_text: Dict[str, int] = {}
+    by_key: Dict[str, int] = {}
+    keys: List[str] = []
+    ids = array("I")
+    for text in queries:
+        key_id = by_text.get(text)
+        if key_id is None:
+            key = normalizer(text)
+            key_id = by_key.get(key)
+            if key_id is None:
+                key_id = by_key[key] = len(keys)
+                keys.append(key)
+            by_text[text] = key_id
+        ids.append(key_id)
+    return ids, keys
+
+
+# ---------------------------------------------------------------------------
+# Políticas
+# ---------------------------------------------------------------------------
+
+def simulate_lru(ids: array, times: array, sizes: Sequence[int], ttl: float) -> List[int]:
+    """
+    Hits do LRU+TTL para todas as capacidades de `sizes` (crescente) numa
+    passada. `segments[j]` guarda as chaves com distância de pilha em
+    [sizes[j-1], sizes[j]); o que cai do último segmento sai do cache maior.
+    """
+    bounds = [sizes[0]] + [b - a for a, b in zip(sizes, sizes[1:])]
+    segments = [OrderedDict() for _ in sizes]
+    where: Dict[int, int] = {}
+    last = len(sizes) - 1
+    hits = [0] * len(sizes)
+    finite = not math.isinf(ttl)
+    # inserted[chave][j]: último miss da chave no cache de capacidade sizes[j]
+    inserted: Dict[int, List[float]] = {}
+    resident_from = [0] * len(sizes)
+
+    for key, now in zip(ids, times):
+        seg = where.get(key, len(sizes))
+        if seg <= last:
+            del segments[seg][key]
+        segments[0][key] = None
+        where[key] = 0
+        # cascata: cada segmento acima de `seg` empurra seu LRU para o próximo
+        for j in range(min(seg, last + 1)):
+            if len(segments[j]) <= bounds[j]:
+                break
+            moved, _ = segments[j].popitem(last=False)
+            if j < last:
+                segments[j + 1][moved] = None
+                where[moved] = j + 1
+            else:
+                del where[moved]
+
+        if seg > last:
+            # fora até do maior cache: miss em todas as capacidades
+            born = inserted.get(key) if finite else None
+            if born is not None:
+                born[:] = [now] * len(sizes)
+            elif finite:
+                inserted[key] = [now] * len(sizes)
+            continue
+        if not finite:
+            resident_from[seg] += 1
+            continue
+        born = inserted[key]
+        if seg:
+            born[:seg] = [now] * seg
+        if now - min(born[seg:]) < ttl:
+            resident_from[seg] += 1
+            continue
+        for j in range(seg, len(sizes)):
+            if now - born[j] < ttl:
+                hits[j] += 1
+            else:
+                born[j] = now
+
+    # hit "residente e válido" em `seg` vale para todas as capacidades >= seg
+    running = 0
+    for j in range(len(sizes)):
+        running += resident_from[j]
+        hits[j] += running
+    return hits
+
+
+def simulate_lfu(ids: array, times: array, size: int, ttl: float) -> int:
+    """LFU com buckets de frequência (O(1) por acesso) e TTL na inserção"""
+    freq: Dict[int, int] = {}
+    born: Dict[int, float] = {}
+    buckets: Dict[int, OrderedDict] = defaultdict(OrderedDict)
+    min_freq = 0
+    hits = 0
+    for key, now in zip(ids, times):
+        f = freq.get(key)
+        if f is not None and now - born[key] < ttl:
+            hits += 1
+            del buckets[f][key]
+            if not buckets[f] and min_freq == f:
+                min_freq = f + 1
+            freq[key] = f + 1
+            buckets[f + 1][key] = None
+            continue
+        if f is not None:
+            # expirada: sai e volta como inserção nova
+            del buckets[f][key]
+            del freq[key]
+        elif len(freq) >= size:
+            while not buckets[min_freq]:
+                min_freq += 1
+            victim, _ = buckets[min_freq].popitem(last=False)
+            del freq[victim], born[victim]
+        freq[key] = 1
+        born[key] = now
+        buckets[1][key] = None
+        min_freq = 1
+    return hits
+
+
+SKETCH_SEEDS = (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F)
+_HALVE = bytes(c >> 1 for c in range(256))
+
+
+def simulate_tinylfu(ids: array, times: array, size: int, ttl: float) -> int:
+    """
+    LRU+TTL com admissão TinyLFU: count-min de 4 linhas (contadores de 8 bits
+    saturando em 15, largura ~4x a capacidade) que é reduzido pela metade a
+    cada 10x `size` acessos. Um miss com cache cheio só entra se a frequência
+    estimada do candidato superar a da vítima LRU.
+    """
+    width = 1 << max(4, (size * 4 - 1).bit_length())
+    mask = width - 1
+    n_keys = max(ids, default=-1) + 1
+    # posições de cada chave em cada linha, calculadas uma vez (chaves são ints densos)
+    s0, s1, s2, s3 = (
+        array("I", (((k + 1) * seed) >> 7 & mask for k in range(n_keys))) for seed in SKETCH_SEEDS
+    )
+    r0, r1, r2, r3 = (bytearray(width) for _ in SKETCH_SEEDS)
+    sample = 10 * size
+    additions = 0
+
+    entries: "OrderedDict[int, float]" = OrderedDict()
+    hits = 0
+    for key, now in zip(ids, times):
+        a, b, c, d = s0[key], s1[key], s2[key], s3[key]
+        if r0[a] < 15:
+            r0[a] += 1
+        if r1[b] < 15:
+            r1[b] += 1
+        if r2[c] < 15:
+            r2[c] += 1
+        if r3[d] < 15:
+            r3[d] += 1
+        additions += 1
+        if additions >= sample:
+            r0, r1, r2, r3 = (row.translate(_HALVE) for row in (r0, r1, r2, r3))
+            additions //= 2
+
+        born = entries.get(key)
+        if born is not None:
+            if now - born < ttl:
+                hits += 1
+                entries.move_to_end(key)
+                continue
+            del entries[key]
+        if len(entries) >= size:
+            victim = next(iter(entries))
+            v0, v1, v2, v3 = s0[victim], s1[victim], s2[victim], s3[victim]
+            if min(r0[a], r1[b], r2[c], r3[d]) <= min(r0[v0], r1[v1], r2[v2], r3[v3]):
+                continue
+            del entries[victim]
+        entries[key] = now
+    return hits
+
+
+def simulate_unbounded(ids: array, times: array, ttl: float) -> int:
+    """Sem limite de tamanho, TTL desde o último miss (cache SQL)"""
+    born: Dict[int, float] = {}
+    hits = 0
+    for key, now in zip(ids, times):
+        inserted = born.get(key)
+        if inserted is not None and now - inserted < ttl:
+            hits += 1
+        else:
+            born[key] = now
+    return hits
+
+
+# ---------------------------------------------------------------------------
+# Memória
+# ---------------------------------------------------------------------------
+
+def measure_entry_bytes(sample_keys: Sequence[str]) -> float:
+    """Bytes por entrada de um `QueryCache` real com chaves do trace"""
+    sample_keys = list(sample_keys)[:2000]
+    if not sample_keys:
+        return 0.0
+    value = {"search_term": "termo", "category": "Alimentos", "price_min": None, "price_max": 20.0}
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cache = QueryCache(max_entries=len(sample_keys), normalizer=lambda text: text)
+    for key in sample_keys:
+        cache.set(
+            key.encode().decode(),  # cópia: a chave já internada não entraria na conta
+            {"id": str(uuid.uuid4()), "filters": dict(value)},
+        )
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / len(sample_keys)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def parse_duration(value: str) -> float:
+    """`30m`, `1h`, `24h`, `7d`, `3600` ou `inf` -> segundos"""
+    value = value.strip().lower()
+    if value in ("inf", "none"):
+        return math.inf
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def _csv_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulador offline de políticas de cache")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="NDJSON com `query` e `offset_s` (\"-\" para stdin)")
+    source.add_argument("--from-db", action="store_true", help="lê a tabela queries (variáveis DB_*)")
+    parser.add_argument("--since-hours", type=int, default=24 * 7, help="janela lida do banco")
+    parser.add_argument("--limit", type=int, default=None, help="máximo de eventos")
+    parser.add_argument("--policies", type=_csv_list, default=["lru", "lfu", "tinylfu", "sql"])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="capacidades (entradas), separadas por vírgula")
+    parser.add_argument("--ttls", type=_csv_list, default=["24h"], help="ex.: 1h,24h,inf")
+    parser.add_argument("--normalizers", type=_csv_list, default=["default"], help=",".join(NORMALIZERS))
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="processos de simulação")
+    parser.add_argument("--csv", help="salva as curvas em CSV")
+    return parser.parse_args(argv)
+
+
+def _simulate(job: Tuple[str, array, array, Sequence[int], float]) -> List[Tuple[Optional[int], int]]:
+    """Executa uma simulação e devolve [(capacidade, hits)] (worker do pool)"""
+    policy, ids, times, sizes, ttl = job
+    if policy == "lru":
+        return list(zip(sizes, simulate_lru(ids, times, sizes, ttl)))
+    if policy == "sql":
+        return [(None, simulate_unbounded(ids, times, ttl))]
+    simulate = simulate_lfu if policy == "lfu" else simulate_tinylfu
+    return [(size, simulate(ids, times, size, ttl)) for size in sizes]
+
+
+def run(args: argparse.Namespace) -> List[Dict[str, object]]:
+    if args.from_db:
+        queries, times = asyncio.run(read_queries_table(args.since_hours, args.limit))
+    else:
+        queries, times = read_trace(args.trace, args.limit)
+    sizes = sorted({int(s) for s in _csv_list(args.sizes)})
+    ttls = [(label, parse_duration(label)) for label in args.ttls]
+    total = len(queries)
+    print(f"{total} queries, {len(set(queries))} textos distintos", file=sys.stderr)
+
+    rows: List[Dict[str, object]] = []
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for name in args.normalizers:
+            started = time.perf_counter()
+            ids, keys = intern_keys(queries, NORMALIZERS[name])
+            entry_bytes = measure_entry_bytes(keys[:: max(1, len(keys) // 2000)])
+
+            # LRU cobre todas as capacidades numa passada; LFU/TinyLFU rodam uma por capacidade
+            jobs, labels = [], []
+            for ttl_label, ttl in ttls:
+                for policy in args.policies:
+                    batches = [sizes] if policy in ("lru", "sql") else [[size] for size in sizes]
+                    for batch in batches:
+                        jobs.append((policy, ids, times, batch, ttl))
+                        labels.append((policy, ttl_label))
+
+            for (policy, ttl_label), results in zip(labels, pool.map(_simulate, jobs)):
+                for size, hits in results:
+                    entries = len(keys) if size is None else min(size, len(keys))
+                    rows.append({
+                        "normalizer": name,
+                        "policy": policy,
+                        "size": "unbounded" if size is None else size,
+                        "ttl": ttl_label,
+                        "hit_rate": round(hits / total, 4) if total else 0.0,
+                        "memory_mb": round(entries * entry_bytes / 2**20, 2),
+                        "llm_calls": total - hits,
+                        "llm_calls_saved": hits,
+                    })
+            print(
+                f"normalizador {name}: {len(keys)} chaves, {entry_bytes:.0f} B/entrada, "
+                f"{time.perf_counter() - started:.1f}s",
+                file=sys.stderr,
+            )
+    return rows
+
+
+def print_table(rows: Iterable[Dict[str, object]]) -> None:
+    columns = ("normalizer", "policy", "size", "ttl", "hit_rate", "memory_mb", "llm_calls", "llm_calls_saved")
+    print(" ".join(f"{c:>15}" for c in columns))
+    for row in rows:
+        print(" ".join(f"{row[c]!s:>15}" for c in columns))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    unknown = set(args.normalizers) - set(NORMALIZERS)
+    if unknown:
+        raise SystemExit(f"normalizador desconhecido: {', '.join(sorted(unknown))}")
+    rows = run(args)
+    print_table(rows)
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as out:
+            writer = csv.DictWriter(out, fieldnames=list(rows[0]) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Treino offline do classificador local de categoria e relatório de qualidade
+
+Lê pares (query, filtros do LLM) de um trace NDJSON (`generate_query_trace.py`:
+`query` + `expected`) ou da tabela `queries` (só o que o LLM rotulou, via
+`QueryRepository.get_training_examples`), separa um conjunto de validação pela
+chave normalizada, treina o `CategoryClassifier` e imprime:
+
+- acurácia de categoria e de "tem preço" contra os rótulos do LLM
+- cobertura x acurácia por limiar de probabilidade (quanto a regra pode
+  responder sozinha com `CATEGORY_CLASSIFIER_THRESHOLD`)
+- acurácia só do léxico do `RuleParser` no mesmo conjunto (linha de base)
+- latência de inferência (µs por query, unitária e em lote) e tamanho do artefato
+
+Uso:
+    python benchmarks/train_classifier.py --trace trace.ndjson -o classifier.json.gz
+    python benchmarks/train_classifier.py --from-db --since-hours 720 -o classifier.json.gz --report-json report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llm_api.repositories import QueryRepository  # noqa: E402
+from llm_api.services import RuleParser  # noqa: E402
+from llm_api.services.category_classifier import Example, split_examples, train_with_holdout  # noqa: E402
+
+
+def read_trace_examples(path: str, limit: Optional[int]) -> List[Example]:
+    """Pares do trace: `query`/`expected` (gerador) ou `query_text`/`filters` (export da tabela)"""
+    examples: List[Example] = []
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            examples.append((event.get("query_text", event.get("query")), event.get("filters", event.get("expected"))))
+            if limit and len(examples) >= limit:
+                break
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return examples
+
+
+async def read_db_examples(since_hours: Optional[int], limit: int) -> List[Example]:
+    """Pares rotulados pelo LLM na tabela `queries` (variáveis DB_*)"""
+    import asyncpg
+
+    conn = await asyncpg.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", 5432)),
+        database=os.getenv("DB_NAME", "ong_db"),
+        user=os.getenv("DB_USER", "user"),
+        password=os.getenv("DB_PASSWORD", "password"),
+    )
+    try:
+        rows = await QueryRepository(connection=conn).get_training_examples(limit=limit, window_hours=since_hours)
+    finally:
+        await conn.close()
+    return [(row["query_text"], row["filters"]) for row in rows]
+
+
+def lexicon_accuracy(examples: Sequence[Example]) -> Optional[float]:
+    """Acurácia de categoria só com o léxico do RuleParser (sem classificador)"""
+    if not examples:
+        return None
+    parser = RuleParser()
+    hits = sum(parser.parse(text)[0].category == filters.get("category") for text, filters in examples)
+    return round(hits / len(examples), 4)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Treina o classificador local de categoria")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="NDJSON com query e filtros (\"-\" para stdin)")
+    source.add_argument("--from-db", action="store_true", help="lê a tabela queries (variáveis DB_*)")
+    parser.add_argument("--since-hours", type=int, default=None, help="janela lida do banco (padrão: tudo)")
+    parser.add_argument("--limit", type=int, default=50000, help="máximo de exemplos")
+    parser.add_argument("--holdout", type=float, default=0.2, help="fração separada para validação")
+    parser.add_argument("--buckets", type=int, default=1 << 18, help="buckets do hashing de features")
+    parser.add_argument("-o", "--output", help="grava o artefato (JSON gzip)")
+    parser.add_argument("--report-json", help="salva o relatório em JSON")
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.trace:
+        examples = read_trace_examples(args.trace, args.limit)
+    else:
+        examples = asyncio.run(read_db_examples(args.since_hours, args.limit))
+    if not examples:
+        raise SystemExit("nenhum exemplo de treino")
+
+    started = time.perf_counter()
+    classifier, report = train_with_holdout(examples, args.holdout, buckets=args.buckets)
+    report["train_seconds"] = round(time.perf_counter() - started, 2)
+    report["train_examples"] = classifier.metadata["examples"]
+    report["lexicon_category_accuracy"] = lexicon_accuracy(split_examples(examples, args.holdout)[1])
+    if args.output:
+        classifier.save(args.output)
+        report["artifact_bytes"] = os.path.getsize(args.output)
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"treino: {report['train_examples']} exemplos em {report['train_seconds']}s")
+    print(f"validação: {report['examples']} exemplos")
+    print(f"  categoria: {report.get('category_accuracy')} (só léxico: {report['lexicon_category_accuracy']})")
+    print(f"  tem preço: {report.get('price_accuracy')}")
+    for threshold, row in report.get("coverage", {}).items():
+        print(f"  p >= {threshold}: cobertura {row['coverage']:.1%}, acurácia {row['accuracy']}")
+    latency = report.get("latency_us", {})
+    print(f"latência (µs): p50 {latency.get('p50')}, p95 {latency.get('p95')}, lote {latency.get('batch_per_query')}/query")
+    if "artifact_bytes" in report:
+        print(f"artefato: {report['artifact_bytes'] / 1024:.1f} KB")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+    if args.report_json:
+        with open(args.report_json, "w", encoding="utf-8") as out:
+            json.dump(report, out, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
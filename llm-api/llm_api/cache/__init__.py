@@ -0,0 +1,15 @@
+"""
+Cache layer - Cache em memória (L1) na frente do cache em PostgreSQL
+"""
+from llm_api.cache.query_cache import QueryCache
+from llm_api.cache.warmup import CacheWarmup
+from llm_api.cache.analytics import CacheAnalytics, SpaceSaving
+from llm_api.cache.template_cache import TemplateCache
+
+__all__ = [
+    "QueryCache",
+    "CacheWarmup",
+    "CacheAnalytics",
+    "SpaceSaving",
+    "TemplateCache",
+]
@@ -0,0 +1,217 @@
+"""
+Cache analytics - Hit rate por camada, economia de LLM e queries mais quentes
+
+Tudo em memória e com custo constante por request:
+- janela deslizante em buckets (hits/misses por camada nos últimos N segundos)
+- totais desde o start (chamadas LLM e tokens economizados, estimados)
+- top-K de queries normalizadas via Space-Saving (Metwally et al.), que
+  mantém no máximo `capacity` contadores independente da cardinalidade
+- uso por tenant em LRU de no máximo `max_tenants` entradas
+"""
+import heapq
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from llm_api.normalization import normalize_query
+
+# Camadas consultadas em ordem; "miss" = nenhuma respondeu (chamada ao LLM).
+# "negative" = fallback recente reaproveitado em vez de chamar o LLM de novo;
+# "template" = estrutura de outra query com os mesmos termos e outro preço
+TIERS = ("l1", "sql", "negative", "template")
+
+
+class SpaceSaving:
+    """
+    Heavy hitters em memória limitada.
+
+    Cada chave monitorada tem (contagem, erro). Quando uma chave nova chega
+    com a tabela cheia, ela herda a contagem da menos frequente (que sai) e
+    esse valor vira o seu erro máximo. Chaves com frequência real acima de
+    N/capacity nunca saem da tabela.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = max(1, capacity)
+        self._counts: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        # min-heap (contagem, chave) com entradas possivelmente defasadas
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, key: str, weight: int = 1) -> None:
+        if key in self._counts:
+            self._counts[key] += weight
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[key] = weight
+            self._errors[key] = 0
+            heapq.heappush(self._heap, (weight, key))
+            return
+
+        # contagens só crescem: entrada defasada é reinserida com o valor atual
+        while True:
+            count, victim = heapq.heappop(self._heap)
+            current = self._counts[victim]
+            if current == count:
+                break
+            heapq.heappush(self._heap, (current, victim))
+        del self._counts[victim], self._errors[victim]
+        self._counts[key] = count + weight
+        self._errors[key] = count
+        heapq.heappush(self._heap, (count + weight, key))
+
+    def top(self, k: int = 10) -> List[Dict[str, Any]]:
+        """As k chaves mais frequentes, com a contagem estimada e o erro máximo"""
+        ranked = heapq.nlargest(k, self._counts.items(), key=lambda item: item[1])
+        return [
+            {"query": key, "count": count, "error": self._errors[key]}
+            for key, count in ranked
+        ]
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
+class RollingCounter:
+    """
+    Contadores por evento numa janela deslizante de `window_seconds`,
+    dividida em `buckets` fatias (resolução = janela / buckets).
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 300,
+        buckets: int = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window_seconds = window_seconds
+        self._buckets = max(1, buckets)
+        self._width = window_seconds / self._buckets
+        self._clock = clock
+        # slot -> (época do bucket, {evento: contagem})
+        self._slots: List[Tuple[int, Dict[str, int]]] = [(-1, {}) for _ in range(self._buckets)]
+
+    def add(self, event: str, amount: int = 1) -> None:
+        epoch = int(self._clock() // self._width)
+        index = epoch % self._buckets
+        slot_epoch, counts = self._slots[index]
+        if slot_epoch != epoch:
+            counts = {}
+            self._slots[index] = (epoch, counts)
+        counts[event] = counts.get(event, 0) + amount
+
+    def totals(self) -> Dict[str, int]:
+        """Soma dos eventos dentro da janela"""
+        oldest = int(self._clock() // self._width) - self._buckets + 1
+        totals: Dict[str, int] = {}
+        for epoch, counts in self._slots:
+            if epoch >= oldest:
+                for event, amount in counts.items():
+                    totals[event] = totals.get(event, 0) + amount
+        return totals
+
+
+class CacheAnalytics:
+    """
+    Agrega o resultado de cada consulta ao cache.
+
+    Attributes:
+        window_seconds: Janela das taxas "rolling"
+        top_k_capacity: Contadores mantidos pelo Space-Saving
+        max_tenants: Tenants com uso acompanhado; o menos recente sai primeiro
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = 300,
+        top_k_capacity: int = 200,
+        max_tenants: int = 1000,
+        normalizer: Optional[Callable[[str], str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._normalize = normalizer or normalize_query
+        self._window = RollingCounter(window_seconds, clock=clock)
+        self._hot = SpaceSaving(top_k_capacity)
+        self._totals = {"requests": 0, "l1": 0, "sql": 0, "negative": 0, "template": 0, "miss": 0, "tokens_saved": 0}
+        # tenant -> {requests, hits, llm_calls, tokens_saved} desde o start,
+        # do menos ao mais recente (organization_id vem do request)
+        self._tenants: "OrderedDict[Hashable, Dict[str, int]]" = OrderedDict()
+        self._max_tenants = max(1, max_tenants)
+        self.evicted_tenants = 0
+
+    def record(
+        self, query_text: str, tier: str, estimated_tokens: int = 0, tenant: Hashable = None
+    ) -> None:
+        """
+        Registra uma consulta: `tier` é a camada que respondeu ("l1", "sql",
+        "negative", "template") ou "miss". Em hits, `estimated_tokens` entra como economia.
+        `tenant` (organização) separa hit rate e uso de LLM por tenant.
+        """
+        self._totals["requests"] += 1
+        self._totals[tier] += 1
+        usage = self._tenants.get(tenant)
+        if usage is None:
+            if len(self._tenants) >= self._max_tenants:
+                self._tenants.popitem(last=False)
+                self.evicted_tenants += 1
+            usage = self._tenants[tenant] = {"requests": 0, "hits": 0, "llm_calls": 0, "tokens_saved": 0}
+        else:
+            self._tenants.move_to_end(tenant)
+        usage["requests"] += 1
+        if tier != "miss":
+            self._totals["tokens_saved"] += estimated_tokens
+            usage["hits"] += 1
+            usage["tokens_saved"] += estimated_tokens
+        else:
+            usage["llm_calls"] += 1
+        self._window.add(tier)
+        self._hot.add(self._normalize(query_text))
+
+    def snapshot(self, top_k: int = 10) -> Dict[str, Any]:
+        """Taxas da janela, totais desde o start e top-K de queries"""
+        window = self._window.totals()
+        requests = sum(window.get(name, 0) for name in (*TIERS, "miss"))
+        tiers = {}
+        lookups = requests
+        for name in TIERS:
+            hits = window.get(name, 0)
+            tiers[name] = {
+                "lookups": lookups,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+            # só o que passou desta camada chega na próxima
+            lookups -= hits
+        hits = requests - window.get("miss", 0)
+
+        totals = self._totals
+        saved = totals["l1"] + totals["sql"] + totals["negative"] + totals["template"]
+        return {
+            "window": {
+                "seconds": self._window.window_seconds,
+                "requests": requests,
+                "hit_rate": round(hits / requests, 4) if requests else 0.0,
+                "miss_rate": round(window.get("miss", 0) / requests, 4) if requests else 0.0,
+                "tiers": tiers,
+            },
+            "totals": {
+                "requests": totals["requests"],
+                "l1_hits": totals["l1"],
+                "sql_hits": totals["sql"],
+                "negative_hits": totals["negative"],
+                "template_hits": totals["template"],
+                "misses": totals["miss"],
+                "llm_calls_saved": saved,
+                "tokens_saved_estimate": totals["tokens_saved"],
+                "tenants_evicted": self.evicted_tenants,
+            },
+            "top_queries": self._hot.top(top_k),
+            "tenants": {
+                # sem tenant = "default"; chaves em texto para o JSON
+                ("default" if tenant is None else str(tenant)): {
+                    **usage,
+                    "hit_rate": round(usage["hits"] / usage["requests"], 4),
+                }
+                for tenant, usage in self._tenants.items()
+            },
+        }
@@ -0,0 +1,155 @@
+"""
+Query cache - Cache L1 em memória (LRU + TTL) para filtros já extraídos
+
+Fica na frente de `find_cached_query` para evitar ida ao banco (e ao LLM)
+em queries quentes. Chaveado pela query normalizada, separado por tenant
+(organização): a mesma query em duas organizações são entradas distintas.
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from llm_api.normalization import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """
+    Cache LRU com expiração por TTL, com LRU próprio por tenant.
+
+    Ao exceder a capacidade, sai a entrada menos usada do tenant com mais
+    entradas: um tenant barulhento recicla as próprias entradas em vez de
+    expulsar as entradas quentes dos demais. Com um único tenant (o padrão,
+    `tenant=None`) é um LRU comum. Os tenants ficam agrupados por número de
+    entradas, então achar o maior é O(1) mesmo com muitas organizações.
+
+    Attributes:
+        max_entries: Número máximo de entradas mantidas em memória (todos os tenants)
+        ttl_seconds: Tempo de vida de cada entrada (padrão 24h, igual ao cache SQL)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 24 * 3600,
+        normalizer: Optional[Callable[[str], str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._normalize = normalizer or normalize_query
+        self._clock = clock
+        # tenant -> chave normalizada -> (expira_em, valor)
+        self._tenants: Dict[Hashable, "OrderedDict[str, tuple[float, Dict[str, Any]]]"] = {}
+        # tamanho -> tenants com esse número de entradas (na ordem em que chegaram nele)
+        self._by_size: Dict[int, Dict[Hashable, None]] = {}
+        self._max_size = 0
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        logger.info(
+            "QueryCache inicializado (max_entries=%s, ttl=%ss)", self.max_entries, self.ttl_seconds
+        )
+
+    def key(self, query_text: str) -> str:
+        """Chave de cache para a query (texto normalizado)"""
+        return self._normalize(query_text)
+
+    def get(self, query_text: str, tenant: Hashable = None) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o registro cacheado ({"id", "filters"}) ou None.
+        Entradas expiradas são removidas na leitura.
+        """
+        key = self.key(query_text)
+        entries = self._tenants.get(tenant)
+        item = entries.get(key) if entries is not None else None
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = item
+        if expires_at <= self._clock():
+            self._remove(tenant, key)
+            self.misses += 1
+            return None
+
+        entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(
+        self,
+        query_text: str,
+        value: Dict[str, Any],
+        ttl_seconds: Optional[float] = None,
+        tenant: Hashable = None,
+    ) -> None:
+        """
+        Armazena o registro, removendo o menos usado se exceder a capacidade.
+        `ttl_seconds` encurta o TTL da entrada (ex.: registro SQL já envelhecido).
+        """
+        key = self.key(query_text)
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        entries = self._tenants.setdefault(tenant, OrderedDict())
+        if key not in entries:
+            self._size += 1
+            self._resize(tenant, len(entries), len(entries) + 1)
+        entries[key] = (self._clock() + ttl, value)
+        entries.move_to_end(key)
+        while self._size > self.max_entries:
+            self._evict()
+
+    def discard(self, query_text: str, tenant: Hashable = None) -> None:
+        """Remove a entrada da query (se existir)"""
+        self._remove(tenant, self.key(query_text))
+
+    def clear(self) -> None:
+        """Remove todas as entradas"""
+        self._tenants.clear()
+        self._by_size.clear()
+        self._max_size = 0
+        self._size = 0
+
+    def tenant_sizes(self) -> Dict[Hashable, int]:
+        """Entradas por tenant"""
+        return {tenant: len(entries) for tenant, entries in self._tenants.items()}
+
+    def _evict(self) -> None:
+        tenant = next(iter(self._by_size[self._max_size]))
+        entries = self._tenants[tenant]
+        entries.popitem(last=False)
+        self._size -= 1
+        self._resize(tenant, len(entries) + 1, len(entries))
+        if not entries:
+            del self._tenants[tenant]
+
+    def _remove(self, tenant: Hashable, key: str) -> None:
+        entries = self._tenants.get(tenant)
+        if entries is not None and entries.pop(key, None) is not None:
+            self._size -= 1
+            self._resize(tenant, len(entries) + 1, len(entries))
+            if not entries:
+                del self._tenants[tenant]
+
+    def _resize(self, tenant: Hashable, old: int, new: int) -> None:
+        """Move o tenant de grupo; tamanhos mudam de 1 em 1, então o maior anda no máximo 1"""
+        if old:
+            group = self._by_size[old]
+            del group[tenant]
+            if not group:
+                del self._by_size[old]
+        if new:
+            self._by_size.setdefault(new, {})[tenant] = None
+            self._max_size = max(self._max_size, new)
+        while self._max_size and self._max_size not in self._by_size:
+            self._max_size -= 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, query_text: str) -> bool:
+        entries = self._tenants.get(None)
+        item = entries.get(self.key(query_text)) if entries is not None else None
+        return item is not None and item[0] > self._clock()
@@ -0,0 +1,103 @@
+"""
+Template cache - Reaproveita a estrutura do parse entre queries que só mudam o preço
+
+"doces até 30" e "doces até 50" têm a mesma chave de template ("doces <=#").
+O primeiro parse bem-sucedido grava a estrutura (search_term, category e qual
+faixa alimenta price_min/price_max). Os seguintes montam os filtros trocando
+apenas os números, sem LLM.
+"""
+import logging
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from llm_api.cache.query_cache import QueryCache
+from llm_api.normalization import normalize_query, template_key
+
+logger = logging.getLogger(__name__)
+
+# Campo do filtro -> operador da faixa na chave normalizada
+BOUNDS = (("price_max", "<="), ("price_min", ">="))
+
+
+class TemplateCache:
+    """
+    Estruturas de parse por template (LRU + TTL, mesmo armazenamento do L1).
+
+    Só aprende quando o resultado do LLM bate exatamente com as faixas da
+    query (cada faixa vira um preço com o operador correspondente e o número
+    não aparece no search_term); qualquer outra interpretação fica de fora.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 24 * 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._entries = QueryCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, normalizer=lambda key: key, clock=clock
+        )
+
+    @property
+    def hits(self) -> int:
+        return self._entries.hits
+
+    @property
+    def misses(self) -> int:
+        return self._entries.misses
+
+    def learn(self, query_text: str, filters: Dict[str, Any], tenant: Hashable = None) -> bool:
+        """Grava a estrutura dos filtros se a query tiver faixas de preço compatíveis"""
+        template, slots = template_key(normalize_query(query_text))
+        if not slots:
+            return False
+
+        bounds: Dict[str, int] = {}
+        for field, operator in BOUNDS:
+            value = filters.get(field)
+            if value is None:
+                continue
+            matches = [i for i, slot in enumerate(slots) if slot == (operator, float(value))]
+            if len(matches) != 1:
+                return False
+            bounds[field] = matches[0]
+        if len(bounds) != len(slots):
+            return False
+
+        search_term = filters.get("search_term") or ""
+        if any(_number_text(value) in search_term for _, value in slots):
+            return False
+
+        self._entries.set(template, {
+            "search_term": filters.get("search_term"),
+            "category": filters.get("category"),
+            "bounds": bounds,
+        }, tenant=tenant)
+        return True
+
+    def lookup(self, query_text: str, tenant: Hashable = None) -> Optional[Dict[str, Any]]:
+        """Filtros montados a partir do template, ou None"""
+        template, slots = template_key(normalize_query(query_text))
+        if not slots:
+            return None
+        structure = self._entries.get(template, tenant=tenant)
+        if structure is None:
+            return None
+
+        filters = {
+            "search_term": structure["search_term"],
+            "category": structure["category"],
+            "price_min": None,
+            "price_max": None,
+        }
+        for field, index in structure["bounds"].items():
+            filters[field] = slots[index][1]
+        logger.debug("Template hit: %s -> %s", template, filters)
+        return filters
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _number_text(value: float) -> str:
+    return str(int(value)) if value.is_integer() else f"{value:g}"
@@ -0,0 +1,134 @@
+"""
+Cache warmup - Pré-carrega o cache L1 com as queries mais populares
+
+Executado no `lifespan` após um deploy para que a primeira onda de tráfego
+não vá toda para o LLM. Roda com orçamento de tempo: o que não carregar
+dentro do prazo fica para o fluxo normal (cache miss -> LLM).
+
+Cada entrada vale no L1 só o que resta do TTL soft do registro (a idade vem
+do banco); registros já além dele ficam de fora e são servidos pelo cache
+SQL, que agenda a revalidação (ou deixa de servir após o TTL hard).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from llm_api.cache.query_cache import QueryCache
+from llm_api.repositories import IQueryRepository
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmup:
+    """
+    Warmup do cache a partir do histórico de queries.
+
+    Status possíveis:
+    - idle: warmup ainda não iniciado (ou desabilitado)
+    - running: carregando entradas (app ainda não está pronta)
+    - completed: todas as entradas carregadas
+    - timeout: orçamento de tempo esgotado (carga parcial)
+    - failed: erro ao ler o histórico
+    """
+
+    def __init__(
+        self,
+        cache: QueryCache,
+        top_n: int = 200,
+        window_hours: int = 24,
+        budget_seconds: float = 5.0,
+        include_search_metrics: bool = False,
+        soft_ttl_seconds: float = 24 * 3600,
+    ):
+        self._cache = cache
+        self.top_n = top_n
+        self.window_hours = window_hours
+        self.budget_seconds = budget_seconds
+        self.include_search_metrics = include_search_metrics
+        self.soft_ttl_seconds = soft_ttl_seconds
+        self.state = "idle"
+        self.loaded = 0
+        self.skipped_stale = 0
+        self.duration_ms: Optional[float] = None
+        self._blocks_readiness = True
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_ready(self) -> bool:
+        """A app só não está pronta enquanto um warmup de startup está em execução"""
+        return not (self.state == "running" and self._blocks_readiness)
+
+    def start(self, repository: IQueryRepository, block_readiness: bool = True) -> asyncio.Task:
+        """
+        Inicia o warmup em background.
+        O status muda para `running` imediatamente, antes do primeiro request.
+        Com `block_readiness=False` (app já atendendo, ex.: banco reconectado)
+        o warmup não derruba a readiness.
+        """
+        self.state = "running"
+        self._blocks_readiness = block_readiness
+        self._task = asyncio.create_task(self.run(repository))
+        return self._task
+
+    async def stop(self) -> None:
+        """Cancela o warmup se ainda estiver rodando (shutdown)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self, repository: IQueryRepository) -> None:
+        """Executa o warmup respeitando o orçamento de tempo"""
+        self.state = "running"
+        self.loaded = 0
+        self.skipped_stale = 0
+        started = time.perf_counter()
+        logger.info(
+            "🔥 Warmup do cache: top %s queries das últimas %sh (orçamento %ss)",
+            self.top_n, self.window_hours, self.budget_seconds,
+        )
+        try:
+            await asyncio.wait_for(self._load(repository), timeout=self.budget_seconds)
+            self.state = "completed"
+        except asyncio.TimeoutError:
+            self.state = "timeout"
+            logger.warning("⚠️ Warmup excedeu o orçamento de %ss (carga parcial)", self.budget_seconds)
+        except Exception as e:
+            self.state = "failed"
+            logger.warning("⚠️ Falha no warmup do cache: %s", e)
+        finally:
+            self.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(
+            "✅ Warmup finalizado: %s entradas em %sms (%s)", self.loaded, self.duration_ms, self.state
+        )
+
+    async def _load(self, repository: IQueryRepository) -> None:
+        rows = await repository.get_top_queries(
+            limit=self.top_n,
+            window_hours=self.window_hours,
+            include_search_metrics=self.include_search_metrics,
+        )
+        for row in rows:
+            remaining = self.soft_ttl_seconds - (row.get("age_seconds") or 0.0)
+            if remaining <= 0:
+                self.skipped_stale += 1
+                continue
+            self._cache.set(
+                row["query_text"],
+                {"id": row["id"], "filters": row["filters"]},
+                ttl_seconds=remaining,
+                tenant=row.get("organization_id"),
+            )
+            self.loaded += 1
+
+    def status(self) -> Dict[str, Any]:
+        """Resumo do warmup para o health check"""
+        return {
+            "state": self.state,
+            "loaded": self.loaded,
+            "skipped_stale": self.skipped_stale,
+            "duration_ms": self.duration_ms,
+        }
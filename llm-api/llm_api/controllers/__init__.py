@@ -4,8 +4,10 @@ Responsável apenas por HTTP concerns (request/response)
 """
 from llm_api.controllers.query_controller import QueryController
 from llm_api.controllers.router import create_router
+from llm_api.controllers.timing_middleware import ServerTimingMiddleware
 
 __all__ = [
     "QueryController",
     "create_router",
+    "ServerTimingMiddleware",
 ]
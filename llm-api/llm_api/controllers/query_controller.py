@@ -2,11 +2,16 @@
 Query Controller - Endpoints HTTP
 Responsável apenas por HTTP concerns (request/response)
 """
+import json
 import logging
-from fastapi import HTTPException, status
+from typing import AsyncIterator, Optional
 
+from fastapi import HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+
+from llm_api.controllers import transport
 from llm_api.schemas import FiltrosBusca, QueryInput
-from llm_api.services import QueryService
+from llm_api.services import IdempotencyConflictError, QueryService
 
 logger = logging.getLogger(__name__)
 
@@ -29,28 +34,64 @@ class QueryController:
         self._service = service
         logger.info("QueryController inicializado")
 
-    async def parse_query(self, input: QueryInput) -> dict:
+    async def parse_query(self, input: QueryInput, idempotency_key: Optional[str] = None) -> dict:
         """
         Endpoint: POST /api/v1/parse-query
-        Parse query e salva no banco
+        Parse query e salva no banco (retries com o mesmo Idempotency-Key
+        não reprocessam)
+        """
+        filtros = await self._parse_and_save(input, idempotency_key)
+        # Retorna apenas os filtros (compatível com os testes atuais)
+        return filtros.model_dump()
+
+    async def parse_query_packed(
+        self, body: bytes, content_type: Optional[str], idempotency_key: Optional[str] = None
+    ) -> Response:
         """
+        Endpoint: POST /api/v1/parse-query/msgpack
+        Mesmo fluxo do parse_query com o corpo em MessagePack (ou JSON,
+        conforme o Content-Type); a resposta sai no mesmo formato, direto
+        do dict dos filtros, sem response_model nem jsonable_encoder
+        """
+        try:
+            media_type = transport.negotiate(content_type)
+        except transport.UnsupportedMediaTypeError as e:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
         try:
-            logger.info(f"[HTTP] POST /parse-query - query: {input.query}")
+            input = QueryInput.model_validate(transport.decode(body, media_type))
+        except ValueError as e:
+            logger.warning("[HTTP] Corpo inválido em /parse-query/msgpack: %s", e)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-            # Delega para service
-            filtros, query_id = await self._service.parse_and_save_query(input)
+        filtros = await self._parse_and_save(input, idempotency_key)
+        return Response(transport.encode(filtros.model_dump(), media_type), media_type=media_type)
 
-            logger.info(f"[HTTP] Resposta com sucesso - query_id: {query_id}")
+    async def _parse_and_save(self, input: QueryInput, idempotency_key: Optional[str]) -> FiltrosBusca:
+        try:
+            logger.info("[HTTP] POST /parse-query - query: %s", input.query)
 
-            # Retorna apenas os filtros (compatível com os testes atuais)
-            return filtros.model_dump()
+            # Delega para service
+            if idempotency_key:
+                filtros, query_id = await self._service.parse_and_save_query(
+                    input, idempotency_key=idempotency_key
+                )
+            else:
+                filtros, query_id = await self._service.parse_and_save_query(input)
+
+            logger.info("[HTTP] Resposta com sucesso - query_id: %s", query_id)
+            return filtros
+        except IdempotencyConflictError as e:
+            logger.warning("[HTTP] Idempotency-Key em conflito: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+            )
         except ValueError as e:
-            logger.warning(f"[HTTP] Erro de validação: {str(e)}")
+            logger.warning("[HTTP] Erro de validação: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
             )
         except Exception as e:
-            logger.error(f"[HTTP] Erro interno: {str(e)}")
+            logger.error("[HTTP] Erro interno: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Erro ao processar query",
@@ -62,30 +103,112 @@ class QueryController:
         Parse APENAS, sem salvar no banco
         """
         try:
-            logger.info(f"[HTTP] POST /parse-query-only - query: {input.query}")
+            logger.info("[HTTP] POST /parse-query-only - query: %s", input.query)
             filtros = await self._service.parse_query_only(input.query)
             logger.info("[HTTP] Resposta com sucesso")
             return filtros
         except Exception as e:
-            logger.error(f"[HTTP] Erro: {str(e)}")
+            logger.error("[HTTP] Erro: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Erro ao processar query",
             )
 
-    async def get_history(self, limit: int = 10) -> dict:
+    async def stream_parse_query_only(self, input: QueryInput) -> StreamingResponse:
         """
-        Endpoint: GET /api/v1/history?limit=10
-        Retorna histórico de queries
+        Endpoint: POST /api/v1/parse-query-only/stream
+        Parse sem salvar, em Server-Sent Events: `partial` a cada campo que o
+        LLM concluir e um `final` validado (sempre o último evento)
         """
+        logger.info("[HTTP] POST /parse-query-only/stream - query: %s", input.query)
+        return StreamingResponse(
+            self._sse_events(input.query),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def _sse_events(self, query_text: str) -> AsyncIterator[str]:
+        # A resposta já começou: erros viram o evento `error` em vez de HTTP 500
         try:
-            logger.info(f"[HTTP] GET /history - limit: {limit}")
-            history = await self._service.get_query_history(limit)
-            logger.info(f"[HTTP] Retornando {len(history)} queries")
+            async for event, filtros in self._service.stream_parse_query(query_text):
+                yield f"event: {event}\ndata: {json.dumps(filtros.model_dump(), ensure_ascii=False)}\n\n"
+        except Exception as e:
+            logger.error("[HTTP] Erro no stream: %s", e)
+            yield f"event: error\ndata: {json.dumps({'detail': 'Erro ao processar query'})}\n\n"
+
+    async def get_history(self, limit: int = 10, organization_id: Optional[int] = None) -> dict:
+        """
+        Endpoint: GET /api/v1/history?limit=10&organization_id=1
+        Retorna histórico de queries (da organização, se informada)
+        """
+        try:
+            logger.info("[HTTP] GET /history - limit: %s, organization_id: %s", limit, organization_id)
+            history = await self._service.get_query_history(limit, organization_id=organization_id)
+            logger.info("[HTTP] Retornando %s queries", len(history))
             return {"success": True, "data": history}
         except Exception as e:
-            logger.error(f"[HTTP] Erro: {str(e)}")
+            logger.error("[HTTP] Erro: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Erro ao recuperar histórico",
             )
+
+    async def get_metrics(self) -> dict:
+        """
+        Endpoint: GET /api/v1/metrics
+        Retorna métricas operacionais (limiter do LLM, etc.)
+        """
+        try:
+            return {"success": True, "data": self._service.get_metrics()}
+        except Exception as e:
+            logger.error("[HTTP] Erro: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Erro ao recuperar métricas",
+            )
+
+    async def get_cache_stats(self, top_k: int = 10) -> dict:
+        """
+        Endpoint: GET /api/v1/admin/cache?top_k=10
+        Retorna hit rate por camada, economia de LLM e queries mais quentes
+        """
+        try:
+            return {"success": True, "data": self._service.get_cache_stats(top_k)}
+        except Exception as e:
+            logger.error("[HTTP] Erro: %s", e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Erro ao recuperar estatísticas do cache",
+            )
+
+    async def get_artifacts(self) -> dict:
+        """
+        Endpoint: GET /api/v1/admin/artifacts
+        Versões dos artefatos locais (léxico + classificador) e última validação
+        """
+        data = self._service.get_artifacts_status()
+        if data is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Retreino de artefatos desabilitado")
+        return {"success": True, "data": data}
+
+    async def refresh_artifacts(self) -> dict:
+        """
+        Endpoint: POST /api/v1/admin/artifacts/refresh
+        Retreina agora; a troca só acontece se o candidato passar na validação
+        """
+        data = await self._service.refresh_artifacts()
+        if data is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Retreino de artefatos desabilitado")
+        return {"success": True, "data": data}
+
+    async def rollback_artifacts(self) -> dict:
+        """
+        Endpoint: POST /api/v1/admin/artifacts/rollback
+        Volta para a versão anterior dos artefatos locais
+        """
+        rolled_back = await self._service.rollback_artifacts()
+        if rolled_back is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Retreino de artefatos desabilitado")
+        if not rolled_back:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Nenhuma versão anterior para restaurar")
+        return {"success": True, "data": self._service.get_artifacts_status()}
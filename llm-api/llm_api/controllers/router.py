@@ -1,8 +1,11 @@
 """
 Router - Factory para criar as rotas
 """
+import hmac
 import logging
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
 
 from llm_api.schemas import QueryInput, FiltrosBusca
 from llm_api.controllers.query_controller import QueryController
@@ -10,13 +13,26 @@ from llm_api.controllers.query_controller import QueryController
 logger = logging.getLogger(__name__)
 
 
-def create_router(controller: QueryController) -> APIRouter:
+def create_router(controller: QueryController, admin_token: Optional[str] = None) -> APIRouter:
     """
     Factory function para criar o router com endpoints
     Segue o padrão de composição sobre herança
+
+    Args:
+        admin_token: Token exigido (header `X-Admin-Token`) nas rotas /admin/*;
+            sem token as rotas admin ficam desligadas (404)
     """
     router = APIRouter(prefix="/api/v1", tags=["queries"])
 
+    async def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")) -> None:
+        if not admin_token:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+        if x_admin_token is None or not hmac.compare_digest(x_admin_token, admin_token):
+            logger.warning("[HTTP] Token admin ausente ou inválido")
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token admin inválido")
+
+    admin = [Depends(require_admin)]
+
     @router.get("/health", tags=["health"])
     async def health():
         """Health check endpoint"""
@@ -24,18 +40,45 @@ def create_router(controller: QueryController) -> APIRouter:
         return {"status": "ok"}
 
     @router.post("/parse-query", response_model=dict)
-    async def parse_query(input: QueryInput):
+    async def parse_query(
+        input: QueryInput,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    ):
         """
         Parse query e salva no banco
         
         ```
         POST /api/v1/parse-query
+        Idempotency-Key: 6f1c2a9e-...   (opcional: retries devolvem o mesmo resultado)
         {
-            "query": "doces até 50 reais"
+            "query": "doces até 50 reais",
+            "organization_id": 1
         }
         ```
         """
-        return await controller.parse_query(input)
+        return await controller.parse_query(input, idempotency_key)
+
+    @router.post("/parse-query/msgpack")
+    async def parse_query_packed(
+        request: Request,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    ):
+        """
+        Parse query e salva no banco, com transporte compacto
+
+        Corpo e resposta em MessagePack (`Content-Type: application/msgpack`)
+        ou JSON (`application/json`), com os mesmos campos do /parse-query.
+        Erros continuam em JSON.
+
+        ```
+        POST /api/v1/parse-query/msgpack
+        Content-Type: application/msgpack
+        <msgpack {"query": "doces até 50 reais", "organization_id": 1}>
+        ```
+        """
+        return await controller.parse_query_packed(
+            await request.body(), request.headers.get("content-type"), idempotency_key
+        )
 
     @router.post("/parse-query-only", response_model=FiltrosBusca)
     async def parse_query_only(input: QueryInput):
@@ -51,15 +94,96 @@ def create_router(controller: QueryController) -> APIRouter:
         """
         return await controller.parse_query_only(input)
 
+    @router.post("/parse-query-only/stream")
+    async def stream_parse_query_only(input: QueryInput):
+        """
+        Parse APENAS, publicando os filtros parciais via Server-Sent Events
+
+        ```
+        POST /api/v1/parse-query-only/stream
+        {
+            "query": "doces até 50 reais"
+        }
+
+        event: partial
+        data: {"search_term": null, "category": "Doces", "price_min": null, "price_max": null}
+
+        event: final
+        data: {"search_term": null, "category": "Doces", "price_min": null, "price_max": 50.0}
+        ```
+        """
+        return await controller.stream_parse_query_only(input)
+
     @router.get("/history", response_model=dict)
-    async def get_history(limit: int = 10):
+    async def get_history(limit: int = 10, organization_id: Optional[int] = None):
         """
-        Retorna histórico de queries
+        Retorna histórico de queries (só da organização, se informada)
         
         ```
-        GET /api/v1/history?limit=10
+        GET /api/v1/history?limit=10&organization_id=1
+        ```
+        """
+        return await controller.get_history(limit, organization_id=organization_id)
+
+    @router.get("/metrics", response_model=dict)
+    async def get_metrics():
+        """
+        Métricas operacionais (limite de concorrência do LLM, fila, descartes)
+
+        ```
+        GET /api/v1/metrics
+        ```
+        """
+        return await controller.get_metrics()
+
+    @router.get("/admin/cache", response_model=dict, tags=["admin"], dependencies=admin)
+    async def get_cache_stats(top_k: int = Query(10, ge=1, le=100)):
+        """
+        Hit rate por camada (janela deslizante), chamadas LLM e tokens
+        economizados e top-K de queries normalizadas
+
+        ```
+        GET /api/v1/admin/cache?top_k=10
+        X-Admin-Token: ...
+        ```
+        """
+        return await controller.get_cache_stats(top_k)
+
+    @router.get("/admin/artifacts", response_model=dict, tags=["admin"], dependencies=admin)
+    async def get_artifacts():
+        """
+        Versão em uso e anterior do léxico/classificador locais, com a validação
+
+        ```
+        GET /api/v1/admin/artifacts
+        X-Admin-Token: ...
+        ```
+        """
+        return await controller.get_artifacts()
+
+    @router.post("/admin/artifacts/refresh", response_model=dict, tags=["admin"], dependencies=admin)
+    async def refresh_artifacts():
+        """
+        Retreina os artefatos locais com o histórico recente e troca a quente
+        se o candidato passar na validação
+
+        ```
+        POST /api/v1/admin/artifacts/refresh
+        X-Admin-Token: ...
+        ```
+        """
+        return await controller.refresh_artifacts()
+
+    @router.post("/admin/artifacts/rollback", response_model=dict, tags=["admin"], dependencies=admin)
+    async def rollback_artifacts():
+        """
+        Volta para a versão anterior dos artefatos locais
+
+        ```
+        POST /api/v1/admin/artifacts/rollback
+        X-Admin-Token: ...
         ```
         """
-        return await controller.get_history(limit)
+        return await controller.rollback_artifacts()
 
     return router
@@ -0,0 +1,60 @@
+"""
+Server-Timing middleware - Expõe o tempo de cada etapa do request
+
+Adiciona o header `Server-Timing` (cache, llm, validation, persistence, total)
+e emite uma linha de log estruturada por request (campos via `extra`,
+serializados em JSON pelo `JsonFormatter`).
+"""
+import logging
+import time
+
+from llm_api.logging_config import current_route
+from llm_api.timing import end_request, format_server_timing, get_timings, start_request
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """Middleware ASGI (sem BaseHTTPMiddleware, para não criar task extra por request)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = start_request()
+        route_token = current_route.set(scope.get("path"))
+        started = time.perf_counter()
+        status_code = 500
+        timings = {}
+
+        async def send_with_timing(message):
+            nonlocal status_code, timings
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timings = get_timings()
+                timings["total"] = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", format_server_timing(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request(token)
+            logger.info(
+                "request_timing",
+                extra={
+                    "event": "request_timing",
+                    "method": scope.get("method"),
+                    "route": scope.get("path"),
+                    "status": status_code,
+                    "latency_ms": round(timings.get("total", (time.perf_counter() - started) * 1000), 2),
+                    "stages": {k: round(v, 2) for k, v in timings.items() if k != "total"},
+                },
+            )
+            current_route.reset(route_token)
@@ -0,0 +1,54 @@
+"""
+Transport - Corpo do request/resposta em MessagePack ou JSON, escolhido pelo Content-Type
+
+Usado pela variante compacta do /parse-query: o backend envia
+`application/msgpack` e recebe a resposta no mesmo formato, sem passar
+por response_model, jsonable_encoder e JSONResponse.
+"""
+import json
+from typing import Any, Optional
+
+import msgpack
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+# Aliases aceitos no Content-Type do request (a resposta usa o canônico)
+_MSGPACK_ALIASES = frozenset({MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"})
+
+
+class UnsupportedMediaTypeError(ValueError):
+    """Content-Type que não é MessagePack nem JSON"""
+
+
+def negotiate(content_type: Optional[str]) -> str:
+    """
+    Media type da resposta para o Content-Type do request (parâmetros como
+    `charset` são ignorados; sem Content-Type = MessagePack).
+
+    Raises:
+        UnsupportedMediaTypeError: nem MessagePack nem JSON
+    """
+    media_type = (content_type or MSGPACK_MEDIA_TYPE).split(";", 1)[0].strip().lower()
+    if media_type in _MSGPACK_ALIASES:
+        return MSGPACK_MEDIA_TYPE
+    if media_type == JSON_MEDIA_TYPE:
+        return JSON_MEDIA_TYPE
+    raise UnsupportedMediaTypeError(f"Content-Type não suportado: {content_type}")
+
+
+def decode(body: bytes, media_type: str) -> Any:
+    """Corpo -> objeto Python (ValueError se o corpo for inválido)"""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except (msgpack.UnpackException, ValueError, TypeError) as e:
+            raise ValueError(f"MessagePack inválido: {e}") from e
+    return json.loads(body)
+
+
+def encode(payload: Any, media_type: str) -> bytes:
+    """Objeto Python -> corpo da resposta"""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
@@ -0,0 +1,169 @@
+"""
+Logging estruturado (JSON) fora do event loop
+
+- `QueueHandler` no event loop só fixa a mensagem (e o traceback) e enfileira
+- `QueueListener` em thread dedicada serializa em JSON e escreve no stream
+- Amostragem por rota para eventos INFO de alto volume (WARNING+ sempre passa)
+
+Use %-style nos logs (`logger.info("x: %s", valor)`) para que a interpolação
+só aconteça nos registros que passam do nível e da amostragem, e
+`extra={...}` para campos estruturados.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Rota do request atual (definida pelo middleware HTTP)
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+# Atributos padrão do LogRecord (o resto veio de `extra=` e vira campo do JSON)
+_RESERVED_ATTRS = set(
+    logging.LogRecord("", logging.INFO, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata o LogRecord como uma linha JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "route", None):
+            payload["route"] = record.route
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and key not in payload:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class RouteSampler(logging.Filter):
+    """
+    Amostra registros INFO/DEBUG por rota.
+
+    Eventos em `UNSAMPLED_EVENTS` (campo `event` do `extra=`) sempre passam:
+    `request_timing` é a linha única por request do middleware de timing.
+
+    Args:
+        sample_rates: {rota: fração mantida}, ex.: {"/api/v1/parse-query": 0.1}
+    """
+
+    UNSAMPLED_EVENTS = frozenset({"request_timing"})
+
+    def __init__(self, sample_rates: Dict[str, float], rng: Optional[random.Random] = None):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self._random = (rng or random.Random()).random
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        route = current_route.get()
+        record.route = route
+        if record.levelno >= logging.WARNING or route is None:
+            return True
+        if getattr(record, "event", None) in self.UNSAMPLED_EVENTS:
+            return True
+        rate = self.sample_rates.get(route)
+        return rate is None or self._random() < rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que NÃO formata no thread do chamador.
+
+    O `prepare` padrão chama `format()` antes de enfileirar. Aqui só a parte
+    barata fica no chamador: interpola a mensagem e renderiza o traceback,
+    para que args mutáveis mudados depois não apareçam no log e os frames do
+    request não fiquem vivos na fila. A serialização JSON fica para o listener.
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_sample_rates(raw: str) -> Dict[str, float]:
+    """Converte "rota=taxa,rota=taxa" em dicionário"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        route, _, rate = item.partition("=")
+        rates[route.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(
+    level: str = "INFO",
+    json_format: bool = True,
+    sample_rates: Optional[Dict[str, float]] = None,
+    stream=None,
+) -> logging.handlers.QueueListener:
+    """
+    Configura o root logger com a pipeline assíncrona.
+    Idempotente: chamadas seguintes substituem a configuração anterior.
+    """
+    global _listener
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(
+        JsonFormatter() if json_format else logging.Formatter("%(levelname)s:%(name)s:%(message)s")
+    )
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(RouteSampler(sample_rates or {}))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def setup_logging_from_env() -> logging.handlers.QueueListener:
+    """Configuração via LOG_LEVEL, LOG_FORMAT (json|text) e LOG_SAMPLE_RATES"""
+    return setup_logging(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        json_format=os.getenv("LOG_FORMAT", "json").lower() == "json",
+        sample_rates=parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+    )
+
+
+def shutdown_logging() -> None:
+    """Esvazia a fila e para a thread do listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
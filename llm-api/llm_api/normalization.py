@@ -0,0 +1,227 @@
+"""
+Normalização de queries - chave de cache (L1, cache SQL, analytics)
+
+Pipeline compilado uma vez no import:
+1. caixa baixa + remoção de acentos ("até" -> "ate")
+2. moeda e números: "R$ 50", "50 reais", "50,00", "49.90", "1.000" e números
+   por extenso em contexto de preço ("até cinquenta") viram o número canônico
+3. faixas de preço: "até 50" / "menos de 50" / "abaixo de 50" -> "<=50";
+   "a partir de 10" / "mais de 10" / "acima de 10" -> ">=10";
+   "entre 10 e 50" -> ">=10 <=50" (mesma semântica do prompt do LLM)
+4. remove stopwords e palavras de preenchimento ("quero", "por favor", "de")
+5. ordena os termos restantes ("chocolate brownie" == "brownie chocolate");
+   negações ("sem açúcar") ficam presas ao termo seguinte e as faixas de
+   preço vão ao final, também ordenadas
+
+A chave muda quando as regras mudam: `NORMALIZER_VERSION` é gravado junto com
+a chave em `queries`, e registros de versões antigas simplesmente deixam de
+bater no cache.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+NORMALIZER_VERSION = 2
+
+STOPWORDS = frozenset({
+    "a", "as", "o", "os", "um", "uma", "uns", "umas",
+    "de", "da", "do", "das", "dos", "d",
+    "em", "no", "na", "nos", "nas", "num", "numa",
+    "e", "ou", "para", "pra", "pro", "por", "com", "que",
+})
+
+FILLERS = frozenset({
+    "quero", "queria", "gostaria", "preciso", "procuro", "procurando", "busco",
+    "buscando", "buscar", "encontrar", "achar", "ver", "mostre", "mostra",
+    "mostrar", "me", "eu", "favor", "algum", "alguma", "alguns", "algumas",
+    "tem", "tiver", "produto", "produtos", "opcoes", "opcao",
+})
+
+CURRENCY = frozenset({"r$", "rs", "reais", "real", "brl", "conto", "contos", "pila", "pilas"})
+
+# Negações/modificadores que só fazem sentido com o termo seguinte
+BINDERS = frozenset({"sem", "nao", "zero"})
+
+# Palavras de preço (já sem acento, depois das stopwords) -> operador
+PRICE_MAX = frozenset({"ate", "abaixo", "menos", "maximo", "max", "inferior"})
+PRICE_MIN = frozenset({"acima", "mais", "partir", "minimo", "min", "superior", "desde"})
+# Ruído que pode aparecer entre a palavra de preço e o número ("no máximo", "a partir de")
+PRICE_GLUE = frozenset({"a", "de", "do", "no", "o", "por", "que", "em", "r$", "rs"})
+
+UNITS = {
+    "zero": 0, "um": 1, "uma": 1, "dois": 2, "duas": 2, "tres": 3, "quatro": 4,
+    "cinco": 5, "seis": 6, "sete": 7, "oito": 8, "nove": 9, "dez": 10,
+    "onze": 11, "doze": 12, "treze": 13, "quatorze": 14, "catorze": 14,
+    "quinze": 15, "dezesseis": 16, "dezessete": 17, "dezoito": 18, "dezenove": 19,
+    "vinte": 20, "trinta": 30, "quarenta": 40, "cinquenta": 50, "sessenta": 60,
+    "setenta": 70, "oitenta": 80, "noventa": 90,
+    "cem": 100, "cento": 100, "duzentos": 200, "trezentos": 300,
+    "quatrocentos": 400, "quinhentos": 500, "seiscentos": 600,
+    "setecentos": 700, "oitocentos": 800, "novecentos": 900,
+}
+
+_SPACES = re.compile(r"\s+")
+# "R$50" / "50reais" -> separa moeda do número
+_CURRENCY_GLUED = re.compile(r"\b(r\$|rs)(?=\d)|(?<=\d)(reais|real)\b")
+# 1.000 / 1.000,50 (milhar com ponto) | 49,90 (decimal com vírgula) | 49.9 (decimal com ponto)
+_NUMBER = re.compile(r"\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+,\d+|\d+(?:\.\d{1,2})?")
+_PUNCTUATION = re.compile(r"[^\w$<>=.,\s]|(?<!\d)[.,]|[.,](?!\d)")
+_PRICE_SLOT = re.compile(r"(<=|>=)(\d+(?:\.\d+)?)")
+
+
+def _fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _canonical_number(raw: str) -> str:
+    if "," in raw:
+        raw = raw.replace(".", "").replace(",", ".")
+    elif raw.count(".") == 1 and len(raw.split(".")[1]) == 3:
+        raw = raw.replace(".", "")
+    elif raw.count(".") > 1:
+        raw = raw.replace(".", "")
+    value = float(raw)
+    return str(int(value)) if value.is_integer() else f"{value:g}"
+
+
+def _is_number(token: str) -> bool:
+    return bool(_NUMBER.fullmatch(token))
+
+
+def _number_words(tokens: List[str], start: int) -> Optional[tuple]:
+    """Lê "cento e vinte e cinco" a partir de `start`: (valor, próximo índice)"""
+    total, current, i, seen = 0, 0, start, False
+    while i < len(tokens):
+        token = tokens[i]
+        if token in UNITS:
+            current += UNITS[token]
+            seen = True
+        elif token == "mil":
+            total += (current or 1) * 1000
+            current = 0
+            seen = True
+        elif token == "e" and seen and i + 1 < len(tokens) and tokens[i + 1] in UNITS:
+            pass
+        else:
+            break
+        i += 1
+    if not seen:
+        return None
+    return total + current, i
+
+
+def _numbers_from_words(tokens: List[str]) -> List[str]:
+    """Números por extenso só em contexto de preço (antes de moeda ou depois de "até" etc.)"""
+    out: List[str] = []
+    i = 0
+    while i < len(tokens):
+        parsed = _number_words(tokens, i) if tokens[i] in UNITS or tokens[i] == "mil" else None
+        if parsed is not None:
+            value, end = parsed
+            previous = next((t for t in reversed(out) if t not in PRICE_GLUE), "")
+            following = tokens[end] if end < len(tokens) else ""
+            if following in CURRENCY or previous in PRICE_MAX or previous in PRICE_MIN:
+                out.append(str(value))
+                i = end
+                continue
+        out.append(tokens[i])
+        i += 1
+    return out
+
+
+def _price_clauses(tokens: List[str]) -> tuple:
+    """Separa as faixas de preço ("<=50", ">=10") do restante dos termos"""
+    terms: List[str] = []
+    clauses: List[str] = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        # "entre 10 e 50" / "de 10 a 50"
+        if token in ("entre", "de"):
+            j = i + 1
+            while j < len(tokens) and tokens[j] in PRICE_GLUE:
+                j += 1
+            k = j + 1
+            while k < len(tokens) and (tokens[k] in PRICE_GLUE or tokens[k] in ("e", "a", "ate")):
+                k += 1
+            if j < len(tokens) and k < len(tokens) and _is_number(tokens[j]) and _is_number(tokens[k]):
+                clauses += [f">={tokens[j]}", f"<={tokens[k]}"]
+                i = k + 1
+                continue
+        operator = "<=" if token in PRICE_MAX else ">=" if token in PRICE_MIN else None
+        if token == "menos" and terms and terms[-1] == "pelo":
+            # "pelo menos 10" é mínimo, não máximo
+            operator = ">="
+            terms.pop()
+        if operator:
+            j = i + 1
+            while j < len(tokens) and (tokens[j] in PRICE_GLUE or tokens[j] in PRICE_MAX or tokens[j] in PRICE_MIN):
+                j += 1
+            if j < len(tokens) and _is_number(tokens[j]):
+                clauses.append(f"{operator}{tokens[j]}")
+                i = j + 1
+                continue
+        terms.append(token)
+        i += 1
+    return terms, clauses
+
+
+def normalize_query_v1(query: str) -> str:
+    """Regra antiga (v1): caixa baixa, espaços e "reais"/"r$" removidos. Mantida para comparação"""
+    normalized = _SPACES.sub(" ", query.lower().strip())
+    return normalized.replace("reais", "").replace("r$", "").strip()
+
+
+@lru_cache(maxsize=8192)
+def normalize_query(query: str) -> str:
+    """
+    Chave de cache canônica da query (versão `NORMALIZER_VERSION`).
+
+    Cacheada em memória: o mesmo texto é normalizado uma única vez mesmo
+    passando por L1, cache SQL, cache negativo e analytics no mesmo request.
+    """
+    text = _fold(query)
+    text = _CURRENCY_GLUED.sub(lambda m: f" {m.group(0)} ", text)
+    text = _PUNCTUATION.sub(" ", text)
+    tokens = [
+        _canonical_number(token) if _is_number(token) else token
+        for token in text.split()
+    ]
+    tokens = _numbers_from_words(tokens)
+    terms, clauses = _price_clauses([t for t in tokens if t not in CURRENCY])
+
+    words: List[str] = []
+    pending = ""
+    for token in terms:
+        if token in STOPWORDS or token in FILLERS:
+            continue
+        if token in BINDERS:
+            pending = f"{pending}{token} "
+            continue
+        words.append(pending + token)
+        pending = ""
+    if pending:
+        words.append(pending.strip())
+
+    key = " ".join(sorted(words) + sorted(clauses))
+    # Só stopwords ("quero uns"): melhor a regra antiga do que uma chave vazia
+    return key or normalize_query_v1(_fold(query))
+
+
+def template_key(normalized: str) -> Tuple[str, List[Tuple[str, float]]]:
+    """
+    Mascara as faixas de preço de uma chave normalizada:
+    "doces <=30" -> ("doces <=#", [("<=", 30.0)]). Sem faixas, a lista vem vazia.
+    """
+    tokens: List[str] = []
+    slots: List[Tuple[str, float]] = []
+    for token in normalized.split():
+        match = _PRICE_SLOT.fullmatch(token)
+        if match:
+            tokens.append(f"{match.group(1)}#")
+            slots.append((match.group(1), float(match.group(2))))
+        else:
+            tokens.append(token)
+    return " ".join(tokens), slots
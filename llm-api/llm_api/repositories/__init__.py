@@ -5,9 +5,13 @@ Implementa o padrão Repository e Dependency Injection
 from llm_api.repositories.base import IQueryRepository
 from llm_api.repositories.query_repository import QueryRepository
 from llm_api.repositories.mock_repository import MockQueryRepository
+from llm_api.repositories.failover_repository import FailoverQueryRepository
+from llm_api.repositories.reconnector import DatabaseReconnector
 
 __all__ = [
     "IQueryRepository",
     "QueryRepository",
     "MockQueryRepository",
+    "FailoverQueryRepository",
+    "DatabaseReconnector",
 ]
@@ -9,13 +9,23 @@ class IQueryRepository(ABC):
     """Interface do Repository - Define o contrato"""
 
     @abstractmethod
-    async def save_query(self, query_text: str, filters: Dict[str, Any]) -> str:
-        """Salva uma query processada no banco de dados"""
+    async def save_query(
+        self,
+        query_text: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+        organization_id: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> str:
+        """Salva uma query processada no banco de dados (com origem e custo do parse, tenant e Idempotency-Key)"""
         pass
 
     @abstractmethod
-    async def get_query_history(self, limit: int = 10) -> list[Dict[str, Any]]:
-        """Recupera histórico de queries"""
+    async def get_query_history(
+        self, limit: int = 10, organization_id: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        """Recupera histórico de queries (só da organização, se informada)"""
         pass
 
     @abstractmethod
@@ -29,6 +39,55 @@ class IQueryRepository(ABC):
         pass
 
     @abstractmethod
-    async def find_cached_query(self, query_text: str) -> Optional[Dict[str, Any]]:
-        """Busca query similar no cache (últimas 24h)"""
+    async def update_query_filters(
+        self,
+        query_id: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Substitui os filtros de uma query (ex.: re-parse de um fallback)"""
         pass
+
+    @abstractmethod
+    async def find_cached_query(
+        self,
+        query_text: str,
+        max_age_seconds: float = 24 * 3600,
+        organization_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Busca query similar no cache da organização (padrão: últimas 24h), com `age_seconds`"""
+        pass
+
+    @abstractmethod
+    async def find_by_idempotency_key(
+        self,
+        idempotency_key: str,
+        organization_id: Optional[int] = None,
+        max_age_seconds: float = 24 * 3600,
+    ) -> Optional[Dict[str, Any]]:
+        """Query mais recente gravada com este Idempotency-Key na organização (na janela)"""
+        pass
+
+    @abstractmethod
+    async def get_top_queries(
+        self, limit: int = 200, window_hours: int = 24, include_search_metrics: bool = False
+    ) -> list[Dict[str, Any]]:
+        """Recupera as queries processadas mais frequentes na janela (para warmup do cache)"""
+        pass
+
+    @abstractmethod
+    async def get_training_examples(
+        self, limit: int = 50000, window_hours: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        """Queries processadas pelo LLM mais recentes ({query_text, filters}) para treinar modelos locais"""
+        pass
+
+    @abstractmethod
+    async def get_categories(self) -> list[str]:
+        """Nomes das categorias do catálogo (tabela `categories` do backend; vazio se não houver)"""
+        pass
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        """Métricas dos pools de conexão por papel (vazio se não houver pool)"""
+        return {}
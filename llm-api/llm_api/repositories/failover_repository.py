@@ -0,0 +1,175 @@
+"""
+Failover repository - PostgreSQL quando disponível, buffer in-memory enquanto não
+
+A app sobe mesmo com o banco fora do ar: as queries vão para um buffer
+in-memory limitado e, quando o `DatabaseReconnector` conseguir um pool,
+ele é plugado aqui (`attach_pool`) e o buffer é enviado em lote (`flush_buffer`).
+A troca para o PostgreSQL só acontece com o buffer vazio: até lá leituras,
+updates e gravações novas continuam no buffer, e nenhum id da queda fica
+invisível (re-parse e replay de Idempotency-Key continuam achando o registro).
+Como a troca acontece dentro deste objeto, service e controller criados no
+startup passam a usar o banco sem serem recriados.
+"""
+import logging
+from typing import Any, Dict, Optional
+
+import asyncpg
+
+from llm_api.repositories.base import IQueryRepository
+from llm_api.repositories.query_repository import QueryRepository
+
+logger = logging.getLogger(__name__)
+
+
+class FailoverQueryRepository(IQueryRepository):
+    """
+    Delega para o QueryRepository com pool (se plugado) ou para o buffer in-memory.
+
+    Attributes:
+        buffer_max_entries: Limite do buffer (descarta as queries mais antigas)
+    """
+
+    def __init__(self, buffer_max_entries: int = 10000):
+        self.buffer_max_entries = buffer_max_entries
+        self._buffer = QueryRepository(memory_max_entries=buffer_max_entries)
+        self._sql: Optional[QueryRepository] = None
+        # Pool plugado aguardando o fim do backfill
+        self._pending: Optional[QueryRepository] = None
+
+    @property
+    def is_degraded(self) -> bool:
+        """True enquanto o PostgreSQL não está em uso (sem pool ou backfill em andamento)"""
+        return self._sql is None
+
+    @property
+    def buffered(self) -> int:
+        """Queries no buffer aguardando backfill"""
+        return self._buffer.memory_size
+
+    def attach_pool(
+        self,
+        db_pool: asyncpg.Pool,
+        read_pool: Optional[asyncpg.Pool] = None,
+        max_replica_lag_seconds: Optional[float] = None,
+    ) -> None:
+        """Pool disponível: passa a usar o PostgreSQL já (buffer vazio) ou ao fim do `flush_buffer`"""
+        self._pending = QueryRepository(
+            db_pool=db_pool, read_pool=read_pool, max_replica_lag_seconds=max_replica_lag_seconds
+        )
+        if not self.buffered:
+            self._activate()
+        else:
+            logger.info("Pool do PostgreSQL plugado, aguardando backfill de %s queries", self.buffered)
+
+    def _activate(self) -> None:
+        self._sql, self._pending = self._pending, None
+        logger.info("Repository conectado ao PostgreSQL")
+
+    async def flush_buffer(self) -> int:
+        """
+        Envia o buffer ao banco em lotes e, vazio, troca para o PostgreSQL
+        (sem await entre a última checagem e a troca). Cada registro só sai
+        do buffer depois de gravado; o que mudou durante o lote vai no
+        próximo. Se falhar, a exceção sobe com o buffer intacto (quem chamou
+        decide quando tentar de novo).
+        """
+        target = self._pending or self._sql
+        if target is None:
+            return 0
+        sent = 0
+        while self.buffered:
+            records = self._buffer.snapshot_memory()
+            await target.bulk_insert(records)
+            sent += self._buffer.discard_memory(records)
+        if self._pending is not None:
+            self._activate()
+        return sent
+
+    def status(self) -> Dict[str, Any]:
+        """Resumo para o health check"""
+        return {
+            "connected": not self.is_degraded,
+            "buffered": self.buffered,
+            "dropped": self._buffer.mem_dropped,
+        }
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        return self._sql.pool_metrics() if self._sql is not None else {}
+
+    def _active(self) -> QueryRepository:
+        return self._sql if self._sql is not None else self._buffer
+
+    async def save_query(
+        self,
+        query_text: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+        organization_id: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> str:
+        return await self._active().save_query(
+            query_text,
+            filters,
+            status=status,
+            provenance=provenance,
+            organization_id=organization_id,
+            idempotency_key=idempotency_key,
+        )
+
+    async def get_query_history(
+        self, limit: int = 10, organization_id: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        return await self._active().get_query_history(limit, organization_id=organization_id)
+
+    async def get_query_by_id(self, query_id: str) -> Optional[Dict[str, Any]]:
+        return await self._active().get_query_by_id(query_id)
+
+    async def update_query_status(self, query_id: str, status: str) -> bool:
+        return await self._active().update_query_status(query_id, status)
+
+    async def update_query_filters(
+        self,
+        query_id: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        return await self._active().update_query_filters(
+            query_id, filters, status=status, provenance=provenance
+        )
+
+    async def find_cached_query(
+        self,
+        query_text: str,
+        max_age_seconds: float = 24 * 3600,
+        organization_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        return await self._active().find_cached_query(
+            query_text, max_age_seconds=max_age_seconds, organization_id=organization_id
+        )
+
+    async def find_by_idempotency_key(
+        self,
+        idempotency_key: str,
+        organization_id: Optional[int] = None,
+        max_age_seconds: float = 24 * 3600,
+    ) -> Optional[Dict[str, Any]]:
+        return await self._active().find_by_idempotency_key(
+            idempotency_key, organization_id=organization_id, max_age_seconds=max_age_seconds
+        )
+
+    async def get_top_queries(
+        self, limit: int = 200, window_hours: int = 24, include_search_metrics: bool = False
+    ) -> list[Dict[str, Any]]:
+        return await self._active().get_top_queries(
+            limit=limit, window_hours=window_hours, include_search_metrics=include_search_metrics
+        )
+
+    async def get_training_examples(
+        self, limit: int = 50000, window_hours: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        return await self._active().get_training_examples(limit=limit, window_hours=window_hours)
+
+    async def get_categories(self) -> list[str]:
+        return await self._active().get_categories()
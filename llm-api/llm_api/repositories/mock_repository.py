@@ -9,10 +9,20 @@ from llm_api.repositories.base import IQueryRepository
 class MockQueryRepository(IQueryRepository):
     """Mock do Repository para testes unitários"""
 
-    async def save_query(self, query_text: str, filters: Dict[str, Any]) -> str:
+    async def save_query(
+        self,
+        query_text: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+        organization_id: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> str:
         return "mock-id-123"
 
-    async def get_query_history(self, limit: int = 10) -> list[Dict[str, Any]]:
+    async def get_query_history(
+        self, limit: int = 10, organization_id: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
         return [
             {
                 "id": "mock-id-123",
@@ -33,5 +43,48 @@ class MockQueryRepository(IQueryRepository):
     async def update_query_status(self, query_id: str, status: str) -> bool:
         return query_id == "mock-id-123"
 
-    async def find_cached_query(self, query_text: str) -> Optional[Dict[str, Any]]:
+    async def update_query_filters(
+        self,
+        query_id: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        return query_id == "mock-id-123"
+
+    async def find_cached_query(
+        self,
+        query_text: str,
+        max_age_seconds: float = 24 * 3600,
+        organization_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        return None
+
+    async def find_by_idempotency_key(
+        self,
+        idempotency_key: str,
+        organization_id: Optional[int] = None,
+        max_age_seconds: float = 24 * 3600,
+    ) -> Optional[Dict[str, Any]]:
         return None
+
+    async def get_top_queries(
+        self, limit: int = 200, window_hours: int = 24, include_search_metrics: bool = False
+    ) -> list[Dict[str, Any]]:
+        return [
+            {
+                "id": "mock-id-123",
+                "query_text": "doces até 50",
+                "filters": {"category": "Doces", "price_max": 50.0},
+                "hits": 1,
+                "age_seconds": 0.0,
+            }
+        ]
+
+    async def get_training_examples(
+        self, limit: int = 50000, window_hours: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        return [{"query_text": "doces até 50", "filters": {"category": "Doces", "price_max": 50.0}}]
+
+    async def get_categories(self) -> list[str]:
+        return ["Doces"]
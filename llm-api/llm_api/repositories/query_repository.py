@@ -6,16 +6,121 @@ Também oferece um modo in-memory para testes unitários quando `db_pool` não 
 """
 import logging
 import json
-from typing import Dict, Any, Optional, List
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
 from uuid import uuid4
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 import asyncpg
 
+from llm_api.normalization import NORMALIZER_VERSION, normalize_query
 from llm_api.repositories.base import IQueryRepository
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Colunas de proveniência/custo do parse, na ordem dos parâmetros SQL
+PROVENANCE_FIELDS = (
+    "source", "llm_model", "prompt_version", "llm_latency_ms", "input_tokens", "output_tokens",
+)
+
+_INSERT_QUERY = """
+    INSERT INTO queries
+        (id, query_text, filters, status, created_at, updated_at, normalized_query, normalizer_version,
+         source, llm_model, prompt_version, llm_latency_ms, input_tokens, output_tokens,
+         organization_id, idempotency_key)
+    VALUES ($1, $2, $3, $4, (NOW() AT TIME ZONE 'UTC'), (NOW() AT TIME ZONE 'UTC'), $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+"""
+
+# Sem organização ($2 NULL) lista todas; com organização usa (organization_id, created_at)
+_SELECT_HISTORY = """
+    SELECT
+        id,
+        query_text,
+        filters::TEXT as filters,
+        status,
+        created_at,
+        organization_id
+    FROM queries
+    WHERE ($2::integer IS NULL OR organization_id = $2)
+    ORDER BY created_at DESC
+    LIMIT $1
+"""
+
+_SELECT_BY_ID = """
+    SELECT
+        id,
+        query_text,
+        filters::TEXT as filters,
+        status,
+        created_at,
+        source,
+        llm_model,
+        prompt_version,
+        llm_latency_ms,
+        input_tokens,
+        output_tokens,
+        organization_id
+    FROM queries
+    WHERE id = $1
+"""
+
+# Retry com Idempotency-Key: lido no primário (a réplica pode ainda não ter o
+# INSERT do primeiro request, que acabou de acontecer)
+_SELECT_BY_IDEMPOTENCY_KEY = """
+    SELECT id, query_text, filters::TEXT as filters, status, created_at
+    FROM queries
+    WHERE organization_id IS NOT DISTINCT FROM $2
+    AND idempotency_key = $1
+    AND created_at > (NOW() AT TIME ZONE 'UTC') - make_interval(secs => $3)
+    ORDER BY created_at DESC
+    LIMIT 1
+"""
+
+# Exemplos de treino dos modelos locais: só o que o LLM rotulou (source NULL =
+# registros anteriores à proveniência, também do LLM)
+_SELECT_TRAINING_EXAMPLES = """
+    SELECT query_text, filters::TEXT AS filters
+    FROM queries
+    WHERE status = 'processed'
+    AND (source IS NULL OR source = 'llm')
+    AND ($2::integer IS NULL OR created_at > (NOW() AT TIME ZONE 'UTC') - make_interval(hours => $2))
+    ORDER BY created_at DESC
+    LIMIT $1
+"""
+
+_SELECT_CATEGORIES = "SELECT name FROM categories ORDER BY name"
+
+# Atraso da réplica em segundos (0 no primário ou com o WAL recebido todo aplicado;
+# sem isso uma réplica parada, sem escrita no primário, pareceria atrasada)
+_REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp())
+    END::float8
+"""
+
+# Intervalo mínimo entre medições de atraso da réplica
+REPLICA_LAG_CHECK_INTERVAL_SECONDS = 1.0
+
+# Backfill de registros do modo in-memory: mantém id e timestamps originais e é
+# idempotente (um flush repetido após falha parcial não duplica)
+_BULK_INSERT_QUERY = """
+    INSERT INTO queries
+        (id, query_text, filters, status, created_at, updated_at, normalized_query, normalizer_version,
+         source, llm_model, prompt_version, llm_latency_ms, input_tokens, output_tokens,
+         organization_id, idempotency_key)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16)
+    ON CONFLICT (id) DO UPDATE SET
+        filters = EXCLUDED.filters, status = EXCLUDED.status, updated_at = EXCLUDED.updated_at,
+        source = EXCLUDED.source, llm_model = EXCLUDED.llm_model, prompt_version = EXCLUDED.prompt_version,
+        llm_latency_ms = EXCLUDED.llm_latency_ms, input_tokens = EXCLUDED.input_tokens,
+        output_tokens = EXCLUDED.output_tokens
+"""
+
 
 class QueryRepository(IQueryRepository):
     """
@@ -30,25 +135,56 @@ class QueryRepository(IQueryRepository):
         db_pool: asyncpg.Pool para gerenciar conexões
     """
 
-    def __init__(self, db_pool: Optional[asyncpg.Pool] = None, connection: Optional[asyncpg.Connection] = None):
+    def __init__(
+        self,
+        db_pool: Optional[asyncpg.Pool] = None,
+        connection: Optional[asyncpg.Connection] = None,
+        memory_max_entries: Optional[int] = None,
+        read_pool: Optional[asyncpg.Pool] = None,
+        max_replica_lag_seconds: Optional[float] = None,
+    ):
         """
         Inicializa o repositório com um pool de conexões.
         
         Args:
-            db_pool: Pool de conexões do asyncpg
+            db_pool: Pool de conexões do asyncpg (primário: escritas)
+            memory_max_entries: Limite do modo in-memory (descarta as mais antigas);
+                None = sem limite
+            read_pool: Pool da réplica para leituras (cache, histórico, por ID);
+                None = leituras também no primário
+            max_replica_lag_seconds: Acima deste atraso as leituras voltam ao
+                primário; None = sem limite
         """
         self.db_pool = db_pool
+        self.read_pool = read_pool
+        self.max_replica_lag_seconds = max_replica_lag_seconds
+        self._replica_lag: Optional[float] = None
+        self._lag_checked_at = float("-inf")
+        # Leituras concluídas por papel e leituras da réplica repetidas no primário
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.replica_fallbacks = 0
         self._conn = connection
         # Modo in-memory para testes unitários
         self._memory_enabled = db_pool is None and connection is None
         if self._memory_enabled:
             self._mem_store = {}
-            self._mem_order = []  # manter ordem por created_at
+            self._mem_order = deque()  # manter ordem por created_at
+            self._mem_max_entries = memory_max_entries
+            self.mem_dropped = 0
             logger.info("QueryRepository inicializado em modo in-memory para testes")
         else:
             logger.info("QueryRepository inicializado com PostgreSQL")
 
-    async def save_query(self, query_text: str, filters: Dict[str, Any]) -> str:
+    async def save_query(
+        self,
+        query_text: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+        organization_id: Optional[int] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> str:
         """
         Salva uma query com seus filtros no banco.
         
@@ -58,6 +194,12 @@ class QueryRepository(IQueryRepository):
         Args:
             query_text: Texto da query original
             filters: Dicionário com filtros extraídos pela IA
+            status: "processed" ou "fallback" (fallbacks não entram no cache SQL)
+            provenance: Origem e custo do parse (`PROVENANCE_FIELDS`: source,
+                llm_model, prompt_version, llm_latency_ms, input_tokens,
+                output_tokens); campos ausentes ficam NULL
+            organization_id: Organização (tenant); None = sem tenant
+            idempotency_key: Header Idempotency-Key do request, se houver
             
         Returns:
             ID único (UUID v4 truncado) da query salva
@@ -66,60 +208,74 @@ class QueryRepository(IQueryRepository):
             asyncpg.PostgresError: Erro ao inserir no banco
         """
         query_id = self._generate_id()
+        metadata = self._provenance_values(provenance)
         if self._memory_enabled:
             created_at = datetime.now(timezone.utc)
             self._mem_store[query_id] = {
                 "id": query_id,
                 "query_text": query_text,
                 "filters": filters,
-                "status": "processed",
+                "status": status,
                 "created_at": created_at.isoformat(),
+                "organization_id": organization_id,
+                "idempotency_key": idempotency_key,
+                **dict(zip(PROVENANCE_FIELDS, metadata)),
             }
             self._mem_order.append(query_id)
-            logger.info(f"[MEM] Query salva com ID: {query_id} (texto: {query_text[:50]}...)")
+            if self._mem_max_entries is not None and len(self._mem_order) > self._mem_max_entries:
+                del self._mem_store[self._mem_order.popleft()]
+                self.mem_dropped += 1
+            logger.info("[MEM] Query salva com ID: %s (texto: %s...)", query_id, query_text[:50])
             return query_id
         else:
             try:
                 if self._conn is not None:
                     filters_json = json.dumps(filters)
                     await self._conn.execute(
-                        """
-                        INSERT INTO queries (id, query_text, filters, status, created_at)
-                        VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
-                        """,
+                        _INSERT_QUERY,
                         query_id,
                         query_text,
                         filters_json,
-                        "processed",
+                        status,
+                        normalize_query(query_text),
+                        NORMALIZER_VERSION,
+                        *metadata,
+                        organization_id,
+                        idempotency_key,
                     )
                 else:
                     async with self.db_pool.acquire() as conn:
                         filters_json = json.dumps(filters)
                         await conn.execute(
-                            """
-                            INSERT INTO queries (id, query_text, filters, status, created_at)
-                            VALUES ($1, $2, $3, $4, CURRENT_TIMESTAMP)
-                            """,
+                            _INSERT_QUERY,
                             query_id,           # $1 - parametrizado
                             query_text,         # $2 - parametrizado
                             filters_json,       # $3 - JSON serializado para JSONB
-                            "processed",        # $4 - parametrizado
+                            status,             # $4 - parametrizado
+                            normalize_query(query_text),  # $5 - chave de cache
+                            NORMALIZER_VERSION,           # $6 - versão das regras
+                            *metadata,                    # $7..$12 - proveniência/custo
+                            organization_id,              # $13 - tenant
+                            idempotency_key,              # $14 - retry do backend
                         )
-                logger.info(f"Query salva com ID: {query_id} (texto: {query_text[:50]}...)")
+                logger.info("Query salva com ID: %s (texto: %s...)", query_id, query_text[:50])
                 return query_id
             except asyncpg.PostgresError as e:
-                logger.error(f"Erro ao salvar query: {e}")
+                logger.error("Erro ao salvar query: %s", e)
                 raise
 
-    async def get_query_history(self, limit: int = 10) -> list[Dict[str, Any]]:
+    async def get_query_history(
+        self, limit: int = 10, organization_id: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
         """
         Retorna o histórico das últimas queries.
         
-        Usa índice em created_at para performance.
+        Usa índice em created_at (ou organization_id, created_at) para performance.
         Parametriza o LIMIT contra injection.
         
         Args:
             limit: Número máximo de queries a retornar (padrão 10)
+            organization_id: Só queries desta organização; None = todas
             
         Returns:
             Lista de dicionários com dados das queries, ordenados por created_at DESC
@@ -131,48 +287,25 @@ class QueryRepository(IQueryRepository):
 
         if self._memory_enabled:
             # Ordena por created_at desc com base na ordem de inserção e timestamps
-            items = [self._mem_store[qid] for qid in self._mem_order]
+            items = [
+                self._mem_store[qid] for qid in self._mem_order
+                if organization_id is None or self._mem_store[qid].get("organization_id") == organization_id
+            ]
             items_sorted = sorted(
                 items,
                 key=lambda x: x.get("created_at") or "",
                 reverse=True,
             )
             result = items_sorted[:limit]
-            logger.info(f"[MEM] Histórico retornado: {len(result)} queries")
+            logger.info("[MEM] Histórico retornado: %s queries", len(result))
             return result
         else:
             try:
-                if self._conn is not None:
-                    rows = await self._conn.fetch(
-                        """
-                        SELECT 
-                            id,
-                            query_text,
-                            filters::TEXT as filters,
-                            status,
-                            created_at
-                        FROM queries
-                        ORDER BY created_at DESC
-                        LIMIT $1
-                        """,
-                        limit,  # $1 - parametrizado
-                    )
-                else:
-                    async with self.db_pool.acquire() as conn:
-                        rows = await conn.fetch(
-                        """
-                        SELECT 
-                            id,
-                            query_text,
-                            filters::TEXT as filters,
-                            status,
-                            created_at
-                        FROM queries
-                        ORDER BY created_at DESC
-                        LIMIT $1
-                        """,
-                        limit,  # $1 - parametrizado
-                    )
+                rows = await self._read(lambda conn: conn.fetch(
+                    _SELECT_HISTORY,
+                    limit,            # $1 - parametrizado
+                    organization_id,  # $2 - tenant (NULL = todas)
+                ))
 
                 result = []
                 for row in rows:
@@ -182,12 +315,13 @@ class QueryRepository(IQueryRepository):
                         "filters": json.loads(row["filters"]),
                         "status": row["status"],
                         "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                        "organization_id": row["organization_id"],
                     })
 
-                logger.info(f"Histórico retornado: {len(result)} queries")
+                logger.info("Histórico retornado: %s queries", len(result))
                 return result
             except asyncpg.PostgresError as e:
-                logger.error(f"Erro ao buscar histórico: {e}")
+                logger.error("Erro ao buscar histórico: %s", e)
                 raise
 
     async def get_query_by_id(self, query_id: str) -> Optional[Dict[str, Any]]:
@@ -205,57 +339,38 @@ class QueryRepository(IQueryRepository):
         if self._memory_enabled:
             rec = self._mem_store.get(query_id)
             if rec:
-                logger.info(f"[MEM] Query encontrada: {query_id}")
+                logger.info("[MEM] Query encontrada: %s", query_id)
                 return rec
             else:
-                logger.warning(f"[MEM] Query não encontrada: {query_id}")
+                logger.warning("[MEM] Query não encontrada: %s", query_id)
                 return None
         else:
             try:
-                if self._conn is not None:
-                    row = await self._conn.fetchrow(
-                        """
-                        SELECT 
-                            id,
-                            query_text,
-                            filters::TEXT as filters,
-                            status,
-                            created_at
-                        FROM queries
-                        WHERE id = $1
-                        """,
-                        query_id,  # $1 - parametrizado (seguro contra injection)
-                    )
-                else:
-                    async with self.db_pool.acquire() as conn:
-                        row = await conn.fetchrow(
-                        """
-                        SELECT 
-                            id,
-                            query_text,
-                            filters::TEXT as filters,
-                            status,
-                            created_at
-                        FROM queries
-                        WHERE id = $1
-                        """,
+                # Recém-gravada e ainda não replicada: confirma no primário
+                row = await self._read(
+                    lambda conn: conn.fetchrow(
+                        _SELECT_BY_ID,
                         query_id,  # $1 - parametrizado (seguro contra injection)
-                    )
+                    ),
+                    confirm_miss=True,
+                )
 
                 if row:
-                    logger.info(f"Query encontrada: {query_id}")
+                    logger.info("Query encontrada: %s", query_id)
                     return {
                         "id": row["id"],
                         "query_text": row["query_text"],
                         "filters": json.loads(row["filters"]),
                         "status": row["status"],
                         "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                        "organization_id": row["organization_id"],
+                        **{field: row[field] for field in PROVENANCE_FIELDS},
                     }
                 else:
-                    logger.warning(f"Query não encontrada: {query_id}")
+                    logger.warning("Query não encontrada: %s", query_id)
                     return None
             except asyncpg.PostgresError as e:
-                logger.error(f"Erro ao buscar query {query_id}: {e}")
+                logger.error("Erro ao buscar query %s: %s", query_id, e)
                 raise
 
     async def update_query_status(self, query_id: str, status: str) -> bool:
@@ -275,10 +390,10 @@ class QueryRepository(IQueryRepository):
             rec = self._mem_store.get(query_id)
             if rec:
                 rec["status"] = status
-                logger.info(f"[MEM] Status de {query_id} atualizado para: {status}")
+                logger.info("[MEM] Status de %s atualizado para: %s", query_id, status)
                 return True
             else:
-                logger.warning(f"[MEM] Query não encontrada ao atualizar: {query_id}")
+                logger.warning("[MEM] Query não encontrada ao atualizar: %s", query_id)
                 return False
         else:
             try:
@@ -312,83 +427,514 @@ class QueryRepository(IQueryRepository):
 
                 # asyncpg retorna string como "UPDATE n" onde n é número de linhas afetadas
                 if "1" in result or "UPDATE 1" in result:
-                    logger.info(f"Status de {query_id} atualizado para: {status}")
+                    logger.info("Status de %s atualizado para: %s", query_id, status)
                     return True
                 else:
-                    logger.warning(f"Query não encontrada ao atualizar: {query_id}")
+                    logger.warning("Query não encontrada ao atualizar: %s", query_id)
                     return False
             except asyncpg.PostgresError as e:
-                logger.error(f"Erro ao atualizar status de {query_id}: {e}")
+                logger.error("Erro ao atualizar status de %s: %s", query_id, e)
                 raise
 
-    async def find_cached_query(self, query_text: str) -> Optional[Dict[str, Any]]:
+    async def update_query_filters(
+        self,
+        query_id: str,
+        filters: Dict[str, Any],
+        status: str = "processed",
+        provenance: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """
+        Substitui filtros e status de uma query já salva.
+
+        Usado pelo re-parse em background: um registro salvo como "fallback"
+        passa a "processed" com os filtros reais e volta a valer como cache.
+
+        Args:
+            query_id: ID da query a atualizar
+            filters: Novos filtros
+            status: Novo status
+            provenance: Origem e custo do novo parse (substitui os anteriores)
+
+        Returns:
+            True se atualizada, False se query não existe
+        """
+        metadata = self._provenance_values(provenance)
+        if self._memory_enabled:
+            rec = self._mem_store.get(query_id)
+            if not rec:
+                logger.warning("[MEM] Query não encontrada ao atualizar filtros: %s", query_id)
+                return False
+            rec["filters"] = filters
+            rec["status"] = status
+            rec.update(zip(PROVENANCE_FIELDS, metadata))
+            rec["updated_at"] = datetime.now(timezone.utc).isoformat()
+            logger.info("[MEM] Filtros de %s atualizados (status: %s)", query_id, status)
+            return True
+
+        sql = """
+            UPDATE queries
+            SET filters = $1, status = $2, updated_at = (NOW() AT TIME ZONE 'UTC'),
+                source = $4, llm_model = $5, prompt_version = $6,
+                llm_latency_ms = $7, input_tokens = $8, output_tokens = $9
+            WHERE id = $3
         """
-        Busca query similar processada nas últimas 24h para economizar chamadas LLM.
+        args = (json.dumps(filters), status, query_id, *metadata)
+        try:
+            if self._conn is not None:
+                result = await self._conn.execute(sql, *args)
+            else:
+                async with self.db_pool.acquire() as conn:
+                    result = await conn.execute(sql, *args)
+        except asyncpg.PostgresError as e:
+            logger.error("Erro ao atualizar filtros de %s: %s", query_id, e)
+            raise
+
+        if result == "UPDATE 1":
+            logger.info("Filtros de %s atualizados (status: %s)", query_id, status)
+            return True
+        logger.warning("Query não encontrada ao atualizar filtros: %s", query_id)
+        return False
+
+    async def find_cached_query(
+        self,
+        query_text: str,
+        max_age_seconds: float = 24 * 3600,
+        organization_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Busca query similar processada (atualizada há no máximo `max_age_seconds`,
+        padrão 24h) para economizar chamadas LLM.
         Normaliza a query para melhorar cache hit rate.
+
+        A idade conta da última atualização dos filtros (re-parse/revalidação)
+        e volta em `age_seconds`, para o service decidir se revalida.
+
+        O cache é por organização: só casa com queries do mesmo
+        `organization_id` (None casa só com queries sem organização).
         """
         normalized = self._normalize_query(query_text)
         
         if self._memory_enabled:
+            now = datetime.now(timezone.utc)
             for qid in reversed(self._mem_order):
                 rec = self._mem_store[qid]
+                if rec.get('status') != 'processed' or rec.get('organization_id') != organization_id:
+                    continue
                 if self._normalize_query(rec['query_text']) == normalized:
-                    logger.info(f"[MEM] Cache HIT para: {query_text}")
-                    return rec
-            logger.info(f"[MEM] Cache MISS para: {query_text}")
+                    refreshed_at = datetime.fromisoformat(rec.get('updated_at') or rec['created_at'])
+                    age = (now - refreshed_at).total_seconds()
+                    if age > max_age_seconds:
+                        continue
+                    logger.info("[MEM] Cache HIT para: %s", query_text)
+                    return {**rec, 'age_seconds': age}
+            logger.info("[MEM] Cache MISS para: %s", query_text)
             return None
         else:
+            # `= $4` e `IS NULL` em SQLs separados: os dois usam o índice por tenant
+            tenant_clause = "organization_id = $4" if organization_id is not None else "organization_id IS NULL"
+            args = (normalized, float(max_age_seconds), NORMALIZER_VERSION)
+            if organization_id is not None:
+                args += (organization_id,)
+            sql = f"""
+                SELECT id, query_text, filters::TEXT as filters, created_at,
+                       EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - COALESCE(updated_at, created_at))::float8 AS age_seconds
+                FROM queries
+                WHERE {tenant_clause}
+                AND normalized_query = $1
+                AND normalizer_version = $3
+                AND COALESCE(updated_at, created_at) > (NOW() AT TIME ZONE 'UTC') - make_interval(secs => $2)
+                AND status = 'processed'
+                ORDER BY COALESCE(updated_at, created_at) DESC
+                LIMIT 1
+            """
             try:
-                if self._conn is not None:
-                    row = await self._conn.fetchrow(
-                        """
-                        SELECT id, query_text, filters::TEXT as filters, created_at
-                        FROM queries
-                        WHERE LOWER(TRIM(REGEXP_REPLACE(query_text, '\\s+', ' ', 'g'))) = $1
-                        AND created_at > NOW() - INTERVAL '24 hours'
-                        AND status = 'processed'
-                        ORDER BY created_at DESC
-                        LIMIT 1
-                        """,
-                        normalized
-                    )
-                else:
-                    async with self.db_pool.acquire() as conn:
-                        row = await conn.fetchrow(
-                            """
-                            SELECT id, query_text, filters::TEXT as filters, created_at
-                            FROM queries
-                            WHERE LOWER(TRIM(REGEXP_REPLACE(query_text, '\\s+', ' ', 'g'))) = $1
-                            AND created_at > NOW() - INTERVAL '24 hours'
-                            AND status = 'processed'
-                            ORDER BY created_at DESC
-                            LIMIT 1
-                            """,
-                            normalized
-                        )
+                row = await self._read(lambda conn: conn.fetchrow(sql, *args))
                 
                 if row:
-                    logger.info(f"Cache HIT para: {query_text}")
+                    logger.info("Cache HIT para: %s", query_text)
                     return {
                         'id': row['id'],
                         'query_text': row['query_text'],
                         'filters': json.loads(row['filters']),
-                        'created_at': row['created_at'].isoformat() if row['created_at'] else None
+                        'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+                        'age_seconds': row['age_seconds'],
                     }
                 else:
-                    logger.info(f"Cache MISS para: {query_text}")
+                    logger.info("Cache MISS para: %s", query_text)
                     return None
             except asyncpg.PostgresError as e:
-                logger.error(f"Erro ao buscar cache: {e}")
+                logger.error("Erro ao buscar cache: %s", e)
                 return None
 
+    async def find_by_idempotency_key(
+        self,
+        idempotency_key: str,
+        organization_id: Optional[int] = None,
+        max_age_seconds: float = 24 * 3600,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Busca a query gravada por um request anterior com o mesmo
+        Idempotency-Key (mesma organização, criada há no máximo
+        `max_age_seconds`). Lê sempre do primário.
+
+        Returns:
+            {id, query_text, filters, status, created_at} ou None
+        """
+        if self._memory_enabled:
+            now = datetime.now(timezone.utc)
+            for qid in reversed(self._mem_order):
+                rec = self._mem_store[qid]
+                if rec.get("idempotency_key") != idempotency_key or rec.get("organization_id") != organization_id:
+                    continue
+                age = (now - datetime.fromisoformat(rec["created_at"])).total_seconds()
+                return rec if age <= max_age_seconds else None
+            return None
+
+        args = (idempotency_key, organization_id, float(max_age_seconds))
+        try:
+            if self._conn is not None:
+                row = await self._conn.fetchrow(_SELECT_BY_IDEMPOTENCY_KEY, *args)
+            else:
+                async with self.db_pool.acquire() as conn:
+                    row = await conn.fetchrow(_SELECT_BY_IDEMPOTENCY_KEY, *args)
+        except asyncpg.PostgresError as e:
+            logger.error("Erro ao buscar Idempotency-Key: %s", e)
+            return None
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "query_text": row["query_text"],
+            "filters": json.loads(row["filters"]),
+            "status": row["status"],
+            "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+        }
+
+    async def get_top_queries(
+        self, limit: int = 200, window_hours: int = 24, include_search_metrics: bool = False
+    ) -> list[Dict[str, Any]]:
+        """
+        Retorna as queries processadas mais frequentes na janela recente.
+
+        Usado no warmup do cache: agrupa pela chave normalizada (mesma de
+        `find_cached_query`) e devolve o registro mais recente de cada grupo.
+        Com `include_search_metrics`, a popularidade também conta as buscas
+        registradas pelo backend em `search_metrics` (cache hits não geram
+        novas linhas em `queries`).
+
+        Args:
+            limit: Número máximo de queries
+            window_hours: Janela de tempo considerada
+
+        Returns:
+            Lista de {id, query_text, filters, organization_id, hits, age_seconds}
+            ordenada por hits DESC (uma entrada por organização e chave
+            normalizada); `age_seconds` conta da última atualização dos filtros
+            do registro, como em `find_cached_query`
+        """
+        if self._memory_enabled:
+            since = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+            groups: Dict[tuple, Dict[str, Any]] = {}
+            for qid in self._mem_order:
+                rec = self._mem_store[qid]
+                if rec.get("status") != "processed":
+                    continue
+                if datetime.fromisoformat(rec["created_at"]) < since:
+                    continue
+                key = (rec.get("organization_id"), self._normalize_query(rec["query_text"]))
+                group = groups.setdefault(key, {"hits": 0})
+                refreshed_at = datetime.fromisoformat(rec.get("updated_at") or rec["created_at"])
+                group.update(
+                    id=rec["id"], query_text=rec["query_text"], filters=rec["filters"],
+                    organization_id=rec.get("organization_id"),
+                    age_seconds=(datetime.now(timezone.utc) - refreshed_at).total_seconds(),
+                )
+                group["hits"] += 1
+            result = sorted(groups.values(), key=lambda g: g["hits"], reverse=True)[:limit]
+            logger.info("[MEM] Top queries retornadas: %s", len(result))
+            return result
+
+        # A popularidade vinda de search_metrics (texto cru do backend) só pode ser
+        # agrupada depois de normalizada em Python; nesse caso o corte é feito aqui.
+        # search_metrics não tem organização: conta só para as queries sem tenant
+        sql = """
+            WITH recent AS (
+                SELECT id, query_text, filters, created_at, organization_id,
+                       normalized_query AS normalized,
+                       COALESCE(updated_at, created_at) AS refreshed_at
+                FROM queries
+                WHERE status = 'processed'
+                AND normalizer_version = $3
+                AND created_at > (NOW() AT TIME ZONE 'UTC') - make_interval(hours => $2)
+            ),
+            latest AS (
+                SELECT DISTINCT ON (organization_id, normalized)
+                       organization_id, normalized, id, query_text, filters, refreshed_at
+                FROM recent
+                ORDER BY organization_id, normalized, created_at DESC
+            ),
+            hits AS (
+                SELECT organization_id, normalized, COUNT(*) AS hits
+                FROM recent
+                GROUP BY organization_id, normalized
+            )
+            SELECT l.id, l.query_text, l.filters::TEXT AS filters, l.organization_id,
+                   l.normalized, h.hits,
+                   EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - l.refreshed_at)::float8 AS age_seconds
+            FROM latest l
+            JOIN hits h
+              ON h.normalized = l.normalized
+             AND h.organization_id IS NOT DISTINCT FROM l.organization_id
+            ORDER BY h.hits DESC
+            LIMIT $1
+        """
+        metrics_sql = """
+            SELECT query, COUNT(*) AS n
+            FROM search_metrics
+            WHERE created_at > NOW() - make_interval(hours => $1)
+            GROUP BY query
+        """
+        sql_limit = None if include_search_metrics else limit
+        try:
+            async def fetch_top(conn):
+                rows = await conn.fetch(sql, sql_limit, window_hours, NORMALIZER_VERSION)
+                metric_rows = (
+                    await conn.fetch(metrics_sql, window_hours) if include_search_metrics else []
+                )
+                return rows, metric_rows
+
+            rows, metric_rows = await self._read(fetch_top)
+
+            groups = {
+                (row["organization_id"], row["normalized"]): {
+                    "id": row["id"],
+                    "query_text": row["query_text"],
+                    "filters": json.loads(row["filters"]),
+                    "organization_id": row["organization_id"],
+                    "hits": int(row["hits"]),
+                    "age_seconds": row["age_seconds"],
+                }
+                for row in rows
+            }
+            for row in metric_rows:
+                group = groups.get((None, normalize_query(row["query"])))
+                if group is not None:
+                    group["hits"] += int(row["n"])
+            result = sorted(groups.values(), key=lambda g: g["hits"], reverse=True)[:limit]
+            logger.info("Top queries retornadas: %s", len(result))
+            return result
+        except asyncpg.PostgresError as e:
+            logger.error("Erro ao buscar top queries: %s", e)
+            raise
+
+    async def get_training_examples(
+        self, limit: int = 50000, window_hours: Optional[int] = None
+    ) -> list[Dict[str, Any]]:
+        """
+        Pares (query, filtros) rotulados pelo LLM, dos mais recentes, para
+        treinar modelos locais (`CategoryClassifier`). Ficam de fora fallbacks
+        e os parses de template e regra (o modelo não aprende consigo mesmo);
+        registros anteriores à proveniência (source NULL) entram.
+
+        Args:
+            limit: Número máximo de exemplos
+            window_hours: Só a janela recente; None = todo o histórico
+
+        Returns:
+            Lista de {query_text, filters}
+        """
+        if self._memory_enabled:
+            since = (
+                datetime.now(timezone.utc) - timedelta(hours=window_hours) if window_hours is not None else None
+            )
+            result = []
+            for qid in reversed(self._mem_order):
+                rec = self._mem_store[qid]
+                if rec.get("status") != "processed" or rec.get("source") not in (None, "llm"):
+                    continue
+                if since is not None and datetime.fromisoformat(rec["created_at"]) < since:
+                    continue
+                result.append({"query_text": rec["query_text"], "filters": rec["filters"]})
+                if len(result) >= limit:
+                    break
+            return result
+
+        try:
+            rows = await self._read(lambda conn: conn.fetch(_SELECT_TRAINING_EXAMPLES, limit, window_hours))
+        except asyncpg.PostgresError as e:
+            logger.error("Erro ao buscar exemplos de treino: %s", e)
+            raise
+        return [{"query_text": row["query_text"], "filters": json.loads(row["filters"])} for row in rows]
+
+    async def get_categories(self) -> list[str]:
+        """
+        Nomes das categorias do catálogo (tabela `categories`, do backend, no
+        mesmo banco). Sem a tabela (banco só da llm-api) ou em modo in-memory,
+        lista vazia: os artefatos locais não são filtrados pelo catálogo.
+        """
+        if self._memory_enabled:
+            return []
+        try:
+            rows = await self._read(lambda conn: conn.fetch(_SELECT_CATEGORIES))
+        except asyncpg.UndefinedTableError:
+            logger.warning("Tabela categories não encontrada, catálogo vazio")
+            return []
+        return [row["name"] for row in rows]
+
+    async def _read(
+        self, fetch: Callable[[asyncpg.Connection], Awaitable[T]], confirm_miss: bool = False
+    ) -> T:
+        """
+        Executa a leitura `fetch(conn)` no pool escolhido por `_reader`.
+
+        Se a réplica falhar (erro do banco ou de rede), a leitura é repetida
+        no primário; com `max_replica_lag_seconds`, a réplica fica fora até a
+        próxima medição de atraso.
+        Com `confirm_miss`, um resultado None na réplica também é confirmado
+        no primário.
+        """
+        if self._conn is not None:
+            return await fetch(self._conn)
+        pool = await self._reader()
+        if pool is self.read_pool:
+            try:
+                async with pool.acquire() as conn:
+                    result = await fetch(conn)
+            except (asyncpg.PostgresError, OSError) as e:
+                logger.warning("Leitura na réplica falhou, repetindo no primário: %s", e)
+                self._replica_lag = None
+                self._lag_checked_at = time.monotonic()
+                self.replica_fallbacks += 1
+            else:
+                self.replica_reads += 1
+                if result is not None or not confirm_miss:
+                    return result
+        async with self.db_pool.acquire() as conn:
+            result = await fetch(conn)
+        self.primary_reads += 1
+        return result
+
+    async def _reader(self) -> asyncpg.Pool:
+        """Pool para leituras: a réplica, se houver e estiver dentro do atraso aceito"""
+        if self.read_pool is not None:
+            if self.max_replica_lag_seconds is None:
+                return self.read_pool
+            lag = await self._measure_replica_lag()
+            if lag is not None and lag <= self.max_replica_lag_seconds:
+                return self.read_pool
+        return self.db_pool
+
+    async def _measure_replica_lag(self) -> Optional[float]:
+        """Atraso da réplica, medido no máximo a cada `REPLICA_LAG_CHECK_INTERVAL_SECONDS`"""
+        now = time.monotonic()
+        if now - self._lag_checked_at < REPLICA_LAG_CHECK_INTERVAL_SECONDS:
+            return self._replica_lag
+        self._lag_checked_at = now
+        try:
+            async with self.read_pool.acquire() as conn:
+                self._replica_lag = await conn.fetchval(_REPLICA_LAG_QUERY)
+        except (asyncpg.PostgresError, OSError) as e:
+            logger.warning("Réplica indisponível, leituras no primário: %s", e)
+            self._replica_lag = None
+        return self._replica_lag
+
+    def pool_metrics(self) -> Dict[str, Any]:
+        """Ocupação dos pools por papel (primary/replica) e distribuição das leituras"""
+        metrics: Dict[str, Any] = {}
+        for role, pool in (("primary", self.db_pool), ("replica", self.read_pool)):
+            if pool is not None:
+                metrics[role] = {
+                    "size": pool.get_size(),
+                    "idle": pool.get_idle_size(),
+                    "max": pool.get_max_size(),
+                }
+        if metrics:
+            metrics["reads"] = {
+                "replica": self.replica_reads,
+                "primary": self.primary_reads,
+                "replica_fallbacks": self.replica_fallbacks,
+            }
+            if self.read_pool is not None:
+                metrics["replica_lag_seconds"] = self._replica_lag
+        return metrics
+
     @staticmethod
     def _normalize_query(query: str) -> str:
-        """Normaliza query para melhorar cache hit rate"""
-        import re
-        normalized = query.lower().strip()
-        normalized = re.sub(r'\s+', ' ', normalized)
-        normalized = normalized.replace('reais', '').replace('r$', '')
-        return normalized.strip()
+        """Normaliza query para melhorar cache hit rate (ver `llm_api.normalization`)"""
+        return normalize_query(query)
+
+    @property
+    def memory_size(self) -> int:
+        """Registros no modo in-memory"""
+        return len(self._mem_order) if self._memory_enabled else 0
+
+    def snapshot_memory(self) -> List[Dict[str, Any]]:
+        """Cópia dos registros do modo in-memory, do mais antigo ao mais recente (continuam lá)"""
+        return [dict(self._mem_store[qid]) for qid in self._mem_order]
+
+    def discard_memory(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Remove os registros que não mudaram desde o `snapshot_memory` (os
+        alterados no meio do caminho ficam para o próximo lote). Retorna quantos saíram.
+        """
+        removed = 0
+        for rec in records:
+            if self._mem_store.get(rec["id"]) == rec:
+                del self._mem_store[rec["id"]]
+                self._mem_order.remove(rec["id"])
+                removed += 1
+        return removed
+
+    async def bulk_insert(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Insere em lote registros vindos do modo in-memory (backfill após
+        reconexão), numa única transação com `executemany`. Um id já enviado
+        é atualizado (registro alterado no buffer durante o lote anterior).
+
+        Returns:
+            Quantidade de registros enviados
+        """
+        if not records:
+            return 0
+        rows = [
+            (
+                rec["id"],
+                rec["query_text"],
+                json.dumps(rec["filters"]),
+                rec["status"],
+                self._db_timestamp(rec["created_at"]),
+                self._db_timestamp(rec.get("updated_at") or rec["created_at"]),
+                normalize_query(rec["query_text"]),
+                NORMALIZER_VERSION,
+                *self._provenance_values(rec),
+                rec.get("organization_id"),
+                rec.get("idempotency_key"),
+            )
+            for rec in records
+        ]
+        try:
+            if self._conn is not None:
+                await self._conn.executemany(_BULK_INSERT_QUERY, rows)
+            else:
+                async with self.db_pool.acquire() as conn:
+                    async with conn.transaction():
+                        await conn.executemany(_BULK_INSERT_QUERY, rows)
+        except asyncpg.PostgresError as e:
+            logger.error("Erro no backfill de %s queries: %s", len(rows), e)
+            raise
+        logger.info("Backfill: %s queries inseridas em lote", len(rows))
+        return len(rows)
+
+    @staticmethod
+    def _db_timestamp(value: str) -> datetime:
+        """ISO com fuso (modo in-memory) -> TIMESTAMP sem fuso em UTC"""
+        return datetime.fromisoformat(value).astimezone(timezone.utc).replace(tzinfo=None)
+
+    @staticmethod
+    def _provenance_values(provenance: Optional[Dict[str, Any]]) -> tuple:
+        """Valores de `PROVENANCE_FIELDS` na ordem das colunas (None se ausente)"""
+        provenance = provenance or {}
+        return tuple(provenance.get(field) for field in PROVENANCE_FIELDS)
 
     @staticmethod
     def _generate_id() -> str:
@@ -0,0 +1,112 @@
+"""
+Database reconnector - Reconecta ao PostgreSQL em background com backoff
+
+Se o banco não responder no `lifespan`, a app sobe em modo degradado
+(buffer in-memory) e este loop tenta de novo com backoff exponencial.
+Ao conectar: pluga o pool no FailoverQueryRepository e faz o backfill do
+buffer (também com backoff, sem abrir um pool novo a cada falha); o
+repository só passa a ler e gravar no PostgreSQL com o buffer vazio.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import asyncpg
+
+from llm_api.repositories.failover_repository import FailoverQueryRepository
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseReconnector:
+    """
+    Loop de reconexão.
+
+    Status possíveis:
+    - idle: não iniciado (conectou no startup)
+    - reconnecting: tentando abrir o pool
+    - flushing: conectado, enviando o buffer
+    - connected: pool plugado e buffer vazio
+
+    `connect` devolve (pool do primário, pool da réplica ou None).
+
+    Attributes:
+        initial_delay: Espera antes da primeira tentativa (dobra a cada falha)
+        max_delay: Teto da espera entre tentativas
+        max_replica_lag_seconds: Repassado ao repository ao plugar os pools
+    """
+
+    def __init__(
+        self,
+        repository: FailoverQueryRepository,
+        connect: Callable[[], Awaitable[Tuple[asyncpg.Pool, Optional[asyncpg.Pool]]]],
+        on_connected: Optional[Callable[[asyncpg.Pool, Optional[asyncpg.Pool]], Any]] = None,
+        initial_delay: float = 1.0,
+        max_delay: float = 60.0,
+        max_replica_lag_seconds: Optional[float] = None,
+    ):
+        self._repository = repository
+        self._connect = connect
+        self._on_connected = on_connected
+        self.initial_delay = initial_delay
+        self.max_delay = max(initial_delay, max_delay)
+        self.max_replica_lag_seconds = max_replica_lag_seconds
+        self.state = "idle"
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.backfilled = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """Inicia o loop em background (idempotente enquanto estiver rodando)"""
+        if self._task is None or self._task.done():
+            self.state = "reconnecting"
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        """Cancela o loop se ainda estiver rodando (shutdown)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self) -> None:
+        self.state = "reconnecting"
+        write_pool, read_pool = await self._retry(self._connect, "Reconexão ao PostgreSQL")
+        self._repository.attach_pool(
+            write_pool, read_pool, max_replica_lag_seconds=self.max_replica_lag_seconds
+        )
+        logger.info("✅ PostgreSQL reconectado após %s tentativas", self.attempts)
+
+        self.state = "flushing"
+        self.backfilled += await self._retry(self._repository.flush_buffer, "Backfill do buffer")
+        self.state = "connected"
+        if self._on_connected is not None:
+            self._on_connected(write_pool, read_pool)
+
+    async def _retry(self, operation: Callable[[], Awaitable[Any]], label: str) -> Any:
+        delay = self.initial_delay
+        while True:
+            await asyncio.sleep(delay)
+            self.attempts += 1
+            try:
+                return await operation()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                delay = min(delay * 2, self.max_delay)
+                logger.warning("%s falhou (tentativa %s, próxima em %.0fs): %s", label, self.attempts, delay, e)
+
+    def status(self) -> Dict[str, Any]:
+        """Resumo para o health check"""
+        return {
+            "state": self.state,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "backfilled": self.backfilled,
+            **self._repository.status(),
+        }
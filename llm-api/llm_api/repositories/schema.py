@@ -12,14 +12,57 @@ CREATE TABLE IF NOT EXISTS queries (
     query_text TEXT NOT NULL,
     filters JSONB NOT NULL DEFAULT '{}',
     status VARCHAR(20) NOT NULL DEFAULT 'processed',
-    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC'),
+    updated_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC')
 );
 
+-- Timestamps sem fuso sempre em UTC (igual ao flush do buffer de failover),
+-- independente do TimeZone da sessão
+ALTER TABLE queries ALTER COLUMN created_at SET DEFAULT (NOW() AT TIME ZONE 'UTC');
+ALTER TABLE queries ALTER COLUMN updated_at SET DEFAULT (NOW() AT TIME ZONE 'UTC');
+
 -- Índices para performance
 CREATE INDEX IF NOT EXISTS idx_queries_created_at ON queries(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_queries_status ON queries(status);
 CREATE INDEX IF NOT EXISTS idx_queries_created_status ON queries(created_at DESC, status);
+
+-- Chave de cache (llm_api.normalization) gravada junto com a versão das regras
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS normalized_query TEXT;
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS normalizer_version SMALLINT;
+
+-- Proveniência e custo do parse (source: llm, template, rule, fallback)
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS source VARCHAR(20);
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS llm_model VARCHAR(64);
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS prompt_version SMALLINT;
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS llm_latency_ms REAL;
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS input_tokens INTEGER;
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS output_tokens INTEGER;
+-- Agregações por janela de tempo (custo por source/modelo) sem ler a tabela:
+-- BRIN é minúsculo e serve bem a created_at, que só cresce; o índice coberto
+-- responde "latência/tokens por modelo na última hora" só com index-only scan
+CREATE INDEX IF NOT EXISTS idx_queries_created_brin ON queries USING BRIN (created_at);
+CREATE INDEX IF NOT EXISTS idx_queries_source_created
+    ON queries(source, created_at)
+    INCLUDE (llm_model, llm_latency_ms, input_tokens, output_tokens);
+
+-- Multi-tenancy (RQ-05): cache e histórico por organização. Os índices começam
+-- pelo tenant (queries sem organização usam o mesmo índice via IS NULL);
+-- idx_queries_org_normalized substitui o antigo idx_queries_normalized
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS organization_id INTEGER;
+CREATE INDEX IF NOT EXISTS idx_queries_org_normalized
+    ON queries(organization_id, normalized_query, normalizer_version)
+    WHERE status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_queries_org_created ON queries(organization_id, created_at DESC);
+DROP INDEX IF EXISTS idx_queries_normalized;
+
+-- Idempotency-Key do request que gravou a query: retries do backend (mesmo
+-- após restart ou em outra réplica) devolvem este registro em vez de reprocessar.
+-- Não é UNIQUE: dois requests simultâneos em réplicas diferentes gravam os
+-- dois e o retry seguinte fica com o mais recente
+ALTER TABLE queries ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(255);
+CREATE INDEX IF NOT EXISTS idx_queries_idempotency
+    ON queries(organization_id, idempotency_key, created_at DESC)
+    WHERE idempotency_key IS NOT NULL;
 """
 
 # SQL para limpar tudo (CUIDADO: destrutivo!)
@@ -35,8 +78,8 @@ CREATE TABLE IF NOT EXISTS queries (
     query_text TEXT NOT NULL,
     filters JSONB NOT NULL DEFAULT '{}',
     status VARCHAR(20) NOT NULL DEFAULT 'processed',
-    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC'),
+    updated_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'UTC')
 );
 
 -- Índices
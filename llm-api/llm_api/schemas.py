@@ -33,3 +33,7 @@ class QueryInput(BaseModel):
     """Schema de entrada do endpoint"""
 
     query: str
+    organization_id: Optional[int] = Field(
+        None,
+        description="Organização (tenant) da busca: isola cache e histórico entre organizações.",
+    )
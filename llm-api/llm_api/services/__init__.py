@@ -2,5 +2,29 @@
 Service layer - Lógica de negócio e orquestração
 """
 from llm_api.services.query_service import QueryService
+from llm_api.services.concurrency_limiter import AdaptiveConcurrencyLimiter, LoadShedError
+from llm_api.services.reparse_scheduler import ReparseScheduler
+from llm_api.services.idempotency import IdempotencyConflictError, IdempotencyStore
+from llm_api.services.rule_parser import AgreementStats, RuleParser
+from llm_api.services.category_classifier import CategoryClassifier, CategoryPrediction
+from llm_api.services.artifact_refresher import ArtifactRefresher
+from llm_api.services.model_router import ModelRouter, ModelTier, query_complexity
+from llm_api.services.stub_llm import StubChatModel
 
-__all__ = ["QueryService"]
+__all__ = [
+    "QueryService",
+    "AdaptiveConcurrencyLimiter",
+    "LoadShedError",
+    "ReparseScheduler",
+    "IdempotencyStore",
+    "IdempotencyConflictError",
+    "RuleParser",
+    "AgreementStats",
+    "CategoryClassifier",
+    "CategoryPrediction",
+    "ArtifactRefresher",
+    "ModelRouter",
+    "ModelTier",
+    "query_complexity",
+    "StubChatModel",
+]
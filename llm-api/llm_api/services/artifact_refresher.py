@@ -0,0 +1,295 @@
+"""
+Artifact refresher - Retreino periódico e troca a quente dos artefatos locais
+
+O léxico do `RuleParser` e o `CategoryClassifier` envelhecem conforme o
+catálogo muda. A cada `interval_seconds` (ou sob demanda, no endpoint admin)
+este job relê as queries rotuladas pelo LLM na janela recente e a tabela
+`categories`, treina um candidato e o valida num conjunto separado contra a
+versão em uso:
+
+- precisão: concordância (categoria e preço) com o LLM nas queries que a
+  regra responderia sozinha (confiança >= `confidence_threshold`)
+- o candidato entra se a precisão for >= `min_precision` e não cair mais de
+  `max_regression` em relação à versão atual no mesmo conjunto
+
+A troca é uma única atribuição (sem await no meio): um request usa a versão
+inteira, antiga ou nova. A versão anterior fica guardada para `rollback()`.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from llm_api.normalization import _fold
+from llm_api.repositories import IQueryRepository
+from llm_api.services.category_classifier import CategoryClassifier, Example, evaluate, split_examples
+from llm_api.services.rule_parser import RuleParser, learn_lexicon, merge_lexicon
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactVersion:
+    """Um conjunto de artefatos em uso: a regra (léxico + classificador) e como foi validada"""
+
+    def __init__(
+        self,
+        version: Optional[int],
+        rule_parser: RuleParser,
+        source: str,
+        examples: int = 0,
+        validation: Optional[Dict[str, Any]] = None,
+    ):
+        self.version = version
+        self.rule_parser = rule_parser
+        self.source = source
+        self.examples = examples
+        self.validation = validation or {}
+        self.built_at = datetime.now(timezone.utc).isoformat()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "source": self.source,
+            "built_at": self.built_at,
+            "examples": self.examples,
+            "validation": self.validation,
+        }
+
+
+def rule_precision(
+    parser: RuleParser, examples: Sequence[Example], confidence_threshold: float
+) -> Dict[str, Optional[float]]:
+    """Cobertura e precisão (categoria e preço iguais aos do LLM) da regra acima do limiar"""
+    served = agreed = 0
+    for query_text, filters in examples:
+        filtros, confidence = parser.parse(query_text)
+        if confidence < confidence_threshold:
+            continue
+        served += 1
+        agreed += (
+            filtros.category == filters.get("category")
+            and filtros.price_min == filters.get("price_min")
+            and filtros.price_max == filters.get("price_max")
+        )
+    return {
+        "coverage": round(served / len(examples), 4) if examples else None,
+        "precision": round(agreed / served, 4) if served else None,
+    }
+
+
+class ArtifactRefresher:
+    """
+    Status do último ciclo:
+    - idle: nenhum ciclo ainda
+    - running: treinando/validando
+    - swapped: candidato validado e em uso
+    - rejected: candidato pior que o atual (ou abaixo de `min_precision`)
+    - skipped: menos de `min_examples` exemplos na janela
+    - failed: erro ao ler o histórico ou treinar
+
+    Attributes:
+        interval_seconds: Intervalo entre ciclos do loop em background
+        window_hours: Janela do histórico usado no treino
+        artifact_path: Se definido, a versão aceita (ou restaurada no
+            rollback) é gravada nele; é o arquivo carregado no startup.
+            Versão sem classificador renomeia o arquivo para `.rolled_back`
+    """
+
+    def __init__(
+        self,
+        repository: IQueryRepository,
+        initial: RuleParser,
+        interval_seconds: float = 24 * 3600,
+        window_hours: int = 30 * 24,
+        max_examples: int = 50000,
+        min_examples: int = 500,
+        holdout_fraction: float = 0.2,
+        confidence_threshold: float = 0.85,
+        min_precision: float = 0.9,
+        max_regression: float = 0.02,
+        artifact_path: Optional[str] = None,
+    ):
+        self._repository = repository
+        self.interval_seconds = interval_seconds
+        self.window_hours = window_hours
+        self.max_examples = max_examples
+        self.min_examples = min_examples
+        self.holdout_fraction = holdout_fraction
+        self.confidence_threshold = confidence_threshold
+        self.min_precision = min_precision
+        self.max_regression = max_regression
+        self.artifact_path = artifact_path
+
+        self.current = ArtifactVersion(1, initial, source="startup")
+        self.previous: Optional[ArtifactVersion] = None
+        self.state = "idle"
+        self.last_error: Optional[str] = None
+        self.last_candidate: Optional[Dict[str, Any]] = None
+        self.duration_ms: Optional[float] = None
+        self._next_version = 2
+        self._lock = asyncio.Lock()
+        # Gravações do artefato em série: refresh e rollback podem se cruzar
+        self._persist_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def rule_parser(self) -> RuleParser:
+        """Regra da versão em uso (lida a cada request)"""
+        return self.current.rule_parser
+
+    def start(self) -> asyncio.Task:
+        """Inicia o loop periódico (o primeiro ciclo espera `interval_seconds`)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        return self._task
+
+    async def stop(self) -> None:
+        """Cancela o loop (shutdown)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.refresh()
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Um ciclo: lê o histórico, treina, valida e troca se o candidato for aceito"""
+        if self._lock.locked():
+            return self.status()
+        async with self._lock:
+            self.state = "running"
+            started = time.perf_counter()
+            try:
+                examples = [
+                    (row["query_text"], row["filters"])
+                    for row in await self._repository.get_training_examples(
+                        limit=self.max_examples, window_hours=self.window_hours
+                    )
+                ]
+                categories = await self._repository.get_categories()
+                # CPU: fora do event loop (o estado só muda aqui, no loop)
+                candidate = await asyncio.to_thread(self._build, examples, categories)
+                if candidate is None:
+                    self.state = "skipped"
+                elif self._accept_or_reject(candidate):
+                    await self._persist()
+            except Exception as e:
+                self.state = "failed"
+                self.last_error = str(e)
+                logger.warning("Falha ao atualizar artefatos locais: %s", e)
+            finally:
+                self.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        return self.status()
+
+    def _build(self, examples: List[Example], categories: List[str]) -> Optional[ArtifactVersion]:
+        """Treina e valida um candidato (roda em thread); None se faltarem exemplos"""
+        # Categorias que saíram do catálogo não são mais aprendidas
+        catalog = {_fold(name) for name in categories}
+        if catalog:
+            examples = [
+                (text, filters) for text, filters in examples
+                if not filters.get("category") or _fold(filters["category"]) in catalog
+            ]
+        if len(examples) < self.min_examples:
+            logger.info("Artefatos locais mantidos: %s exemplos (mínimo %s)", len(examples), self.min_examples)
+            return None
+
+        train, holdout = split_examples(examples, self.holdout_fraction)
+        classifier = CategoryClassifier.train(train)
+        report = evaluate(classifier, holdout)
+        learned = learn_lexicon(train)
+        # Nomes do catálogo também indicam a categoria ("produtos de limpeza")
+        for name in categories:
+            learned.setdefault(name, ())
+            learned[name] += (_fold(name),)
+        classifier.metadata["holdout"] = {
+            key: report.get(key) for key in ("examples", "category_accuracy", "price_accuracy")
+        }
+        classifier.metadata["lexicon"] = {category: list(words) for category, words in learned.items()}
+        current = self.current.rule_parser
+        parser = RuleParser(
+            merge_lexicon(learned),
+            classifier=classifier,
+            classifier_threshold=current.classifier_threshold,
+        )
+        validation = {
+            "holdout": len(holdout),
+            "classifier": classifier.metadata["holdout"],
+            "candidate": rule_precision(parser, holdout, self.confidence_threshold),
+            "current": rule_precision(current, holdout, self.confidence_threshold),
+        }
+        return ArtifactVersion(None, parser, source="refresh", examples=len(train), validation=validation)
+
+    def _accept_or_reject(self, candidate: ArtifactVersion) -> bool:
+        """Troca para o candidato se passar na validação; True se trocou"""
+        precision = candidate.validation["candidate"]["precision"]
+        current_precision = candidate.validation["current"]["precision"]
+        if precision is None or precision < self.min_precision or (
+            current_precision is not None and precision < current_precision - self.max_regression
+        ):
+            self.state = "rejected"
+            self.last_candidate = candidate.summary()
+            logger.warning(
+                "Artefatos candidatos rejeitados: precisão %s (atual %s, mínimo %s)",
+                precision, current_precision, self.min_precision,
+            )
+            return False
+        candidate.version = self._next_version
+        self._next_version += 1
+        self.previous, self.current = self.current, candidate
+        self.last_candidate = candidate.summary()
+        self.state = "swapped"
+        self.last_error = None
+        logger.info(
+            "Artefatos locais v%s em uso: precisão %s, cobertura %s (anterior v%s)",
+            candidate.version, precision, candidate.validation["candidate"]["coverage"], self.previous.version,
+        )
+        return True
+
+    async def rollback(self) -> bool:
+        """Volta para a versão anterior (a atual vira a anterior); False se não houver"""
+        if self.previous is None:
+            return False
+        self.previous, self.current = self.current, self.previous
+        logger.warning("Rollback dos artefatos locais: v%s -> v%s", self.previous.version, self.current.version)
+        await self._persist()
+        return True
+
+    async def _persist(self) -> None:
+        """
+        Grava o classificador em uso no arquivo do startup, em thread (não
+        derruba a troca se falhar). Sem classificador (versão do startup sem
+        artefato), o arquivo da versão descartada sai do caminho para não
+        voltar no restart.
+        """
+        if self.artifact_path is None:
+            return
+        async with self._persist_lock:
+            # A versão em uso quando a vez chega: a última troca é a que fica no disco
+            classifier = self.current.rule_parser.classifier
+            try:
+                if classifier is not None:
+                    await asyncio.to_thread(classifier.save, self.artifact_path)
+                else:
+                    os.replace(self.artifact_path, f"{self.artifact_path}.rolled_back")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Falha ao gravar artefato em %s: %s", self.artifact_path, e)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "current": self.current.summary(),
+            "previous": self.previous.summary() if self.previous is not None else None,
+            "last_candidate": self.last_candidate,
+            "last_error": self.last_error,
+            "duration_ms": self.duration_ms,
+        }
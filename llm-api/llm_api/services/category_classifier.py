@@ -0,0 +1,375 @@
+"""
+Category classifier - Classificador local destilado das respostas do LLM
+
+A tabela `queries` guarda milhares de pares (query, filtros) que o LLM já
+rotulou. Este módulo treina, sobre esse histórico, um modelo com features de
+n-gramas em hashing (termos, pares de termos e trigramas de caracteres da
+chave normalizada) e duas cabeças:
+
+- category: naive Bayes multinomial, categoria da query (ou nenhuma)
+- price: regressão logística, se o LLM extraiu alguma faixa de preço
+
+O artefato é um JSON gzip só com os buckets vistos no treino (dezenas de KB
+para dezenas de milhares de queries). A inferência é Python puro: ~20
+lookups num dict e uma soma por feature, na casa das dezenas de
+microssegundos (sem NumPy, que a API não usa).
+
+Uso no serviço: o `RuleParser` consulta o classificador para inferir a
+categoria quando o léxico não a conhece e para baixar a confiança quando o
+histórico diz que há preço que as regras não extraíram.
+"""
+import gzip
+import json
+import logging
+import math
+import os
+import statistics
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone
+from operator import add
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from llm_api.normalization import normalize_query, template_key
+
+logger = logging.getLogger(__name__)
+
+# Formato do artefato: incremente ao mudar features ou layout
+ARTIFACT_VERSION = 1
+DEFAULT_BUCKETS = 1 << 18
+
+# Rótulo da cabeça de categoria quando o LLM não atribuiu categoria
+NO_CATEGORY = "__none__"
+
+# Exemplo de treino: (texto da query, filtros devolvidos pelo LLM)
+Example = Tuple[str, Dict[str, Any]]
+
+
+class CategoryPrediction(NamedTuple):
+    category: Optional[str]
+    category_probability: float
+    price_probability: float
+
+
+def query_features(query_text: str, buckets: int = DEFAULT_BUCKETS) -> Tuple[List[int], List[int]]:
+    """
+    Buckets das features da query, em dois grupos:
+    - termos da chave normalizada (faixas de preço viram `<=#`/`>=#`; sem
+      faixa, o marcador `#0`) e pares de termos vizinhos
+    - trigramas de caracteres de cada termo ("brigadeiros" ~ "brigadeiro")
+
+    A cabeça de categoria usa os dois; a de preço só os termos
+    """
+    template, slots = template_key(normalize_query(query_text))
+    words = template.split()
+    terms = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not slots:
+        terms.append("#0")
+    chars = []
+    for word in words:
+        if "#" not in word:
+            padded = f"<{word}>"
+            chars.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return (
+        [zlib.crc32(gram.encode()) % buckets for gram in terms],
+        [zlib.crc32(gram.encode()) % buckets for gram in chars],
+    )
+
+
+class _NaiveBayesHead:
+    """Uma cabeça do classificador: log-priors e log-verossimilhança por bucket"""
+
+    def __init__(self, classes: List[str], log_prior: List[float], table: Dict[int, Tuple[float, ...]]):
+        self.classes = classes
+        self.log_prior = log_prior
+        self.table = table
+
+    @classmethod
+    def fit(cls, samples: Iterable[Tuple[List[int], str]], alpha: float) -> "_NaiveBayesHead":
+        samples = list(samples)
+        classes = sorted({label for _, label in samples})
+        index = {label: i for i, label in enumerate(classes)}
+        docs = [0] * len(classes)
+        totals = [0] * len(classes)
+        counts: Dict[int, List[int]] = {}
+        for features, label in samples:
+            c = index[label]
+            docs[c] += 1
+            totals[c] += len(features)
+            for bucket in features:
+                counts.setdefault(bucket, [0] * len(classes))[c] += 1
+
+        vocabulary = max(1, len(counts))
+        log_prior = [math.log(n / len(samples)) for n in docs]
+        denominators = [math.log(total + alpha * vocabulary) for total in totals]
+        table = {
+            bucket: tuple(math.log(n + alpha) - denominators[c] for c, n in enumerate(row))
+            for bucket, row in counts.items()
+        }
+        return cls(classes, log_prior, table)
+
+    def probabilities(self, features: List[int]) -> List[float]:
+        # Buckets fora do vocabulário de treino não discriminam: são ignorados
+        scores = self.log_prior
+        for bucket in features:
+            row = self.table.get(bucket)
+            if row is not None:
+                scores = list(map(add, scores, row))
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "classes": self.classes,
+            "log_prior": [round(value, 4) for value in self.log_prior],
+            "table": {str(bucket): [round(value, 4) for value in row] for bucket, row in self.table.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_NaiveBayesHead":
+        return cls(
+            data["classes"],
+            data["log_prior"],
+            {int(bucket): tuple(row) for bucket, row in data["table"].items()},
+        )
+
+
+class _LogisticHead:
+    """
+    Cabeça binária linear (regressão logística por SGD). Para "tem preço" o
+    naive Bayes não serve: termos que quase sempre vêm com preço no histórico
+    somam evidência independente e abafam o marcador `#0`
+    """
+
+    def __init__(self, bias: float, weights: Dict[int, float]):
+        self.bias = bias
+        self.weights = weights
+
+    @classmethod
+    def fit(
+        cls, samples: Sequence[Tuple[List[int], bool]], epochs: int = 5, learning_rate: float = 0.2
+    ) -> "_LogisticHead":
+        head = cls(0.0, {})
+        # Ordem fixa (determinística), intercalada pelo passo para não treinar em blocos
+        order = sorted(range(len(samples)), key=lambda i: (i * 7919) % len(samples))
+        for epoch in range(epochs):
+            rate = learning_rate / (1 + epoch)
+            for i in order:
+                features, label = samples[i]
+                error = head.probability(features) - label
+                head.bias -= rate * error
+                for bucket in features:
+                    head.weights[bucket] = head.weights.get(bucket, 0.0) - rate * error
+        return head
+
+    def probability(self, features: List[int]) -> float:
+        z = self.bias + sum(self.weights.get(bucket, 0.0) for bucket in features)
+        if z < -30:
+            return 0.0
+        return 1 / (1 + math.exp(-z))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "bias": round(self.bias, 4),
+            "weights": {str(bucket): round(weight, 4) for bucket, weight in self.weights.items() if abs(weight) >= 1e-4},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_LogisticHead":
+        return cls(data["bias"], {int(bucket): weight for bucket, weight in data["weights"].items()})
+
+
+class CategoryClassifier:
+    """
+    Classificador treinado no histórico do LLM.
+
+    `metadata` vai no artefato: quando e com quantos exemplos foi treinado e,
+    se houver, a avaliação no conjunto separado (`evaluate`).
+    """
+
+    def __init__(
+        self,
+        category_head: _NaiveBayesHead,
+        price_head: _LogisticHead,
+        buckets: int = DEFAULT_BUCKETS,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        self._category = category_head
+        self._price = price_head
+        self.buckets = buckets
+        self.metadata = metadata or {}
+
+    @classmethod
+    def train(
+        cls, examples: Iterable[Example], buckets: int = DEFAULT_BUCKETS, alpha: float = 0.1
+    ) -> "CategoryClassifier":
+        """Treina as duas cabeças sobre pares (query, filtros do LLM)"""
+        category_samples = []
+        price_samples = []
+        for query_text, filters in examples:
+            terms, chars = query_features(query_text, buckets)
+            category_samples.append((terms + chars, filters.get("category") or NO_CATEGORY))
+            has_price = filters.get("price_min") is not None or filters.get("price_max") is not None
+            price_samples.append((terms, has_price))
+        if not category_samples:
+            raise ValueError("Sem exemplos para treinar o classificador")
+
+        classifier = cls(
+            _NaiveBayesHead.fit(category_samples, alpha),
+            _LogisticHead.fit(price_samples),
+            buckets=buckets,
+            metadata={
+                "artifact_version": ARTIFACT_VERSION,
+                "trained_at": datetime.now(timezone.utc).isoformat(),
+                "examples": len(category_samples),
+                "categories": Counter(label for _, label in category_samples).most_common(),
+            },
+        )
+        logger.info(
+            "Classificador treinado: %s exemplos, %s categorias, %s buckets",
+            len(category_samples), len(classifier._category.classes), len(classifier._category.table),
+        )
+        return classifier
+
+    def predict(self, query_text: str) -> CategoryPrediction:
+        """Categoria mais provável (None = sem categoria) e probabilidades"""
+        terms, chars = query_features(query_text, self.buckets)
+        probabilities = self._category.probabilities(terms + chars)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        label = self._category.classes[best]
+        return CategoryPrediction(
+            None if label == NO_CATEGORY else label, probabilities[best], self._price.probability(terms)
+        )
+
+    def predict_many(self, query_texts: Sequence[str]) -> List[CategoryPrediction]:
+        """Inferência em lote (avaliação, validação antes de trocar o artefato)"""
+        return [self.predict(query_text) for query_text in query_texts]
+
+    @property
+    def categories(self) -> List[str]:
+        return [label for label in self._category.classes if label != NO_CATEGORY]
+
+    def save(self, path: str) -> None:
+        """Grava o artefato (JSON gzip) atomicamente: escreve ao lado e renomeia"""
+        payload = {
+            "artifact_version": ARTIFACT_VERSION,
+            "buckets": self.buckets,
+            "metadata": self.metadata,
+            "category": self._category.to_dict(),
+            "price": self._price.to_dict(),
+        }
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CategoryClassifier":
+        """
+        Carrega um artefato de `save`.
+
+        Raises:
+            OSError: arquivo ausente ou ilegível
+            ValueError: artefato de outra versão ou corrompido
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("artifact_version") != ARTIFACT_VERSION:
+            raise ValueError(
+                f"Artefato versão {payload.get('artifact_version')}, esperado {ARTIFACT_VERSION}: {path}"
+            )
+        return cls(
+            _NaiveBayesHead.from_dict(payload["category"]),
+            _LogisticHead.from_dict(payload["price"]),
+            buckets=payload["buckets"],
+            metadata=payload.get("metadata"),
+        )
+
+
+def split_examples(examples: Iterable[Example], holdout_fraction: float = 0.2) -> Tuple[List[Example], List[Example]]:
+    """
+    Separa treino e validação de forma determinística pela chave normalizada:
+    variações da mesma query ficam do mesmo lado (sem vazamento)
+    """
+    train, holdout = [], []
+    for example in examples:
+        digest = zlib.crc32(normalize_query(example[0]).encode()) % 1000
+        (holdout if digest < holdout_fraction * 1000 else train).append(example)
+    return train, holdout
+
+
+def train_with_holdout(
+    examples: Iterable[Example], holdout_fraction: float = 0.2, **kwargs: Any
+) -> Tuple[CategoryClassifier, Dict[str, Any]]:
+    """Treina sem o conjunto separado e grava o resumo da avaliação nele em `metadata["holdout"]`"""
+    train, holdout = split_examples(examples, holdout_fraction)
+    classifier = CategoryClassifier.train(train, **kwargs)
+    report = evaluate(classifier, holdout)
+    classifier.metadata["holdout"] = {
+        key: report.get(key) for key in ("examples", "category_accuracy", "price_accuracy")
+    }
+    return classifier, report
+
+
+def evaluate(
+    classifier: CategoryClassifier, examples: Sequence[Example], thresholds: Sequence[float] = (0.5, 0.8, 0.9, 0.95)
+) -> Dict[str, Any]:
+    """
+    Relatório offline contra os rótulos do LLM: acurácia das duas cabeças,
+    precisão/recall por categoria, cobertura x acurácia por limiar de
+    probabilidade e latência por query (µs)
+    """
+    if not examples:
+        return {"examples": 0}
+    texts = [text for text, _ in examples]
+    started = time.perf_counter()
+    predictions = classifier.predict_many(texts)
+    batch_us = (time.perf_counter() - started) * 1e6 / len(texts)
+
+    single_us = []
+    for text in texts[:1000]:
+        started = time.perf_counter()
+        classifier.predict(text)
+        single_us.append((time.perf_counter() - started) * 1e6)
+    single_us.sort()
+
+    expected = [filters.get("category") for _, filters in examples]
+    has_price = [filters.get("price_min") is not None or filters.get("price_max") is not None for _, filters in examples]
+    correct = [p.category == e for p, e in zip(predictions, expected)]
+
+    per_category = {}
+    for category in sorted({e for e in expected if e} | {p.category for p in predictions if p.category}):
+        predicted = sum(1 for p in predictions if p.category == category)
+        support = sum(1 for e in expected if e == category)
+        hits = sum(1 for p, e in zip(predictions, expected) if p.category == category == e)
+        per_category[category] = {
+            "support": support,
+            "precision": round(hits / predicted, 4) if predicted else None,
+            "recall": round(hits / support, 4) if support else None,
+        }
+
+    coverage = {}
+    for threshold in thresholds:
+        covered = [ok for p, ok in zip(predictions, correct) if p.category_probability >= threshold]
+        coverage[str(threshold)] = {
+            "coverage": round(len(covered) / len(examples), 4),
+            "accuracy": round(sum(covered) / len(covered), 4) if covered else None,
+        }
+
+    return {
+        "examples": len(examples),
+        "category_accuracy": round(sum(correct) / len(examples), 4),
+        "price_accuracy": round(
+            sum((p.price_probability >= 0.5) == h for p, h in zip(predictions, has_price)) / len(examples), 4
+        ),
+        "per_category": per_category,
+        "coverage": coverage,
+        "latency_us": {
+            "p50": round(statistics.median(single_us), 2),
+            "p95": round(single_us[min(len(single_us) - 1, int(0.95 * len(single_us)))], 2),
+            "batch_per_query": round(batch_us, 2),
+        },
+    }
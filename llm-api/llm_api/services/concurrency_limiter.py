@@ -0,0 +1,174 @@
+"""
+Concurrency limiter - Limite adaptativo (AIMD) de chamadas simultâneas ao LLM
+
+Protege a cota do Gemini e a latência de todos os requests em picos de tráfego:
+- Aumento aditivo do limite enquanto a latência observada fica abaixo do alvo
+- Redução multiplicativa quando a latência passa do alvo ou a chamada falha
+- Fila de espera limitada; quando cheia (ou quando a espera estourar o prazo)
+  o request é descartado (load shedding) e o service aplica o fallback
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoadShedError(Exception):
+    """Request descartado pelo limiter (fila cheia ou prazo de espera excedido)"""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limiter AIMD com fila FIFO limitada.
+
+    Attributes:
+        limit: Limite atual de chamadas simultâneas (ajustado dinamicamente)
+        in_flight: Chamadas em execução
+        shed_count: Total de requests descartados
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 50,
+        max_queue: int = 100,
+        queue_timeout: float = 1.5,
+        latency_target: float = 1.0,
+        backoff: float = 0.9,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self._clock = clock
+
+        self.in_flight = 0
+        self.accepted = 0
+        self.shed_count = 0
+        # Média móvel exponencial da latência (estimativa de espera na fila)
+        self.avg_latency: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        logger.info(
+            "AdaptiveConcurrencyLimiter inicializado (limit=%s, max_queue=%s, alvo=%ss)",
+            self.limit, self.max_queue, self.latency_target,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def acquire(self, timeout: Optional[float] = None):
+        """
+        Reserva um slot para a chamada ao LLM.
+
+        Chamada cancelada por quem a disparou (ex.: a regra respondeu antes)
+        devolve o slot sem amostra: não é sinal de sobrecarga do provedor.
+
+        Raises:
+            LoadShedError: fila cheia ou espera excederia o prazo
+        """
+        wait_budget = self.queue_timeout if timeout is None else timeout
+        await self._enter(wait_budget)
+        started = self._clock()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self._return_slot()
+            raise
+        except BaseException:
+            self._release(self._clock() - started, ok=False)
+            raise
+        self._release(self._clock() - started, ok=True)
+
+    async def _enter(self, wait_budget: float) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.accepted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self._shed("fila cheia")
+
+        # Posição na fila / vazão estimada: se já sabemos que não dá tempo, descarta
+        if self.avg_latency is not None:
+            expected_wait = (len(self._waiters) + 1) * self.avg_latency / self.limit
+            if expected_wait > wait_budget:
+                self._shed(f"espera estimada {expected_wait:.2f}s > {wait_budget:.2f}s")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), wait_budget)
+        except asyncio.TimeoutError:
+            if fut.done():
+                # Slot concedido exatamente no limite do prazo
+                self.accepted += 1
+                return
+            self._discard(fut)
+            self._shed("prazo de espera excedido")
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot concedido mas o request foi cancelado: devolve sem amostra
+                self._return_slot()
+            else:
+                self._discard(fut)
+            raise
+        self.accepted += 1
+
+    def _discard(self, fut: asyncio.Future) -> None:
+        fut.cancel()
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+
+    def _shed(self, reason: str) -> None:
+        self.shed_count += 1
+        logger.warning("Load shedding da chamada LLM: %s", reason)
+        raise LoadShedError(reason)
+
+    def _return_slot(self) -> None:
+        """Libera o slot sem alterar o limite nem a latência média"""
+        self.in_flight -= 1
+        self._grant()
+
+    def _release(self, latency: float, ok: bool) -> None:
+        self.in_flight -= 1
+        self.avg_latency = (
+            latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+        )
+        if ok and latency <= self.latency_target:
+            # Aumento aditivo: ~+1 a cada `limit` chamadas bem-sucedidas
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        else:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._grant()
+
+    def _grant(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self.in_flight += 1
+            fut.set_result(None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot das métricas do limiter"""
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "accepted": self.accepted,
+            "shed_count": self.shed_count,
+            "avg_latency_ms": round(self.avg_latency * 1000, 2) if self.avg_latency is not None else None,
+        }
@@ -0,0 +1,120 @@
+"""
+Idempotency store - Retries com o mesmo Idempotency-Key não repetem o trabalho
+
+O backend desiste em 2s e tenta de novo, mas o primeiro request continua
+rodando aqui. Com o mesmo `Idempotency-Key`:
+- em andamento: o retry espera o resultado do primeiro (mesma Future)
+- concluído na janela: devolve o resultado gravado, sem LLM e sem novo INSERT
+
+Em memória fica só chave -> (query_id, fingerprint) em LRU + TTL; os filtros
+são relidos de `queries`, e a chave também é gravada lá (outra réplica ou um
+restart ainda reconhecem o retry).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from llm_api.cache.query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyConflictError(Exception):
+    """Mesmo Idempotency-Key reutilizado com outra query"""
+
+
+class IdempotencyStore:
+    """
+    Requests em andamento e concluídos por chave.
+
+    Attributes:
+        max_entries: Chaves concluídas mantidas em memória
+        ttl_seconds: Janela em que um retry é reconhecido
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 24 * 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self._completed = QueryCache(
+            max_entries=max_entries, ttl_seconds=ttl_seconds, normalizer=lambda key: key, clock=clock
+        )
+        # chave -> (fingerprint, Future do primeiro request)
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self.joined = 0
+        self.replayed = 0
+
+    async def run(
+        self,
+        key: str,
+        fingerprint: str,
+        execute: Callable[[], Awaitable[Any]],
+        replay: Callable[[Optional[str]], Awaitable[Optional[Any]]],
+        query_id_of: Callable[[Any], str],
+    ) -> Any:
+        """
+        Executa `execute` uma única vez por chave.
+
+        `replay(query_id)` remonta um resultado já gravado (query_id None =
+        procurar a chave no banco; cabe a ele conferir a query gravada) e
+        devolve None se não houver; `query_id_of` extrai o id do resultado
+        para guardar na memória.
+
+        Raises:
+            IdempotencyConflictError: chave já usada com outro `fingerprint`
+        """
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._check(key, in_flight[0], fingerprint)
+            self.joined += 1
+            logger.info("Idempotency-Key em andamento, aguardando o primeiro request: %s", key)
+            return await asyncio.shield(in_flight[1])
+
+        # Registra antes de qualquer await: retries concorrentes caem no ramo acima
+        future = asyncio.get_running_loop().create_future()
+        # Sem retries esperando, a exceção não pode virar "never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._in_flight[key] = (fingerprint, future)
+        try:
+            result = await self._replay(key, fingerprint, replay)
+            if result is None:
+                result = await execute()
+            self._completed.set(key, {"query_id": query_id_of(result), "fingerprint": fingerprint})
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def _replay(
+        self, key: str, fingerprint: str, replay: Callable[[Optional[str]], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        entry = self._completed.get(key)
+        if entry is not None:
+            self._check(key, entry["fingerprint"], fingerprint)
+            result = await replay(entry["query_id"])
+        else:
+            result = await replay(None)
+        if result is not None:
+            self.replayed += 1
+            logger.info("Idempotency-Key já concluído, devolvendo o resultado gravado: %s", key)
+        return result
+
+    @staticmethod
+    def _check(key: str, stored: str, fingerprint: str) -> None:
+        if stored != fingerprint:
+            raise IdempotencyConflictError(f"Idempotency-Key reutilizado com outra query: {key}")
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "completed": len(self._completed),
+            "joined": self.joined,
+            "replayed": self.replayed,
+        }
@@ -0,0 +1,170 @@
+"""
+Model router - Escolhe o tier de modelo pela complexidade da query
+
+Queries simples ("doces até 50") vão para um modelo barato e rápido; as
+longas, com várias restrições ou preço em linguagem vaga ("barato", "em
+conta") vão para um modelo maior. Cada tier tem seu próprio timeout e seu
+limiter de concorrência, e acumula latência, tokens e custo estimado.
+
+Os tiers vêm do JSON em `LLM_TIERS` (ver `.env.example`), do mais barato
+ao mais caro.
+"""
+import logging
+import math
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from llm_api.normalization import normalize_query, template_key
+from llm_api.services.concurrency_limiter import AdaptiveConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+# Preço sem número ("barato", "em conta"): o LLM precisa decidir o que fazer
+PRICE_HINTS = frozenset({
+    "barato", "barata", "baratos", "baratas", "caro", "cara", "caros", "caras",
+    "conta", "economico", "economica", "preco", "precos", "valor", "promocao", "oferta", "desconto",
+})
+NEGATIONS = frozenset({"sem", "nao", "zero"})
+
+# Amostras de latência guardadas por tier (p50/p95)
+LATENCY_SAMPLES = 1000
+
+
+def query_complexity(query_text: str) -> float:
+    """
+    Pontuação de complexidade da query (0 = trivial):
+    termos / 4 + faixas de preço + 2 por preço vago + negações + números soltos
+    ("bolo para 20 pessoas": número que não virou faixa de preço)
+    """
+    template, slots = template_key(normalize_query(query_text))
+    terms = [word for word in template.split() if "#" not in word]
+    hints = sum(1 for term in terms if term in PRICE_HINTS)
+    negations = sum(1 for term in terms if term in NEGATIONS)
+    loose_numbers = sum(1 for term in terms if term.replace(".", "", 1).isdigit())
+    return len(terms) / 4 + len(slots) + 2 * hints + negations + loose_numbers
+
+
+class ModelTier:
+    """
+    Um modelo configurado: até qual complexidade atende, timeout por chamada,
+    limite de concorrência e preço por 1k tokens (USD) para o custo estimado.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_name: str,
+        structured_llm: Any,
+        max_complexity: float = math.inf,
+        timeout_seconds: Optional[float] = None,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        input_cost_per_1k: float = 0.0,
+        output_cost_per_1k: float = 0.0,
+    ):
+        self.name = name
+        self.model_name = model_name
+        self.structured_llm = structured_llm
+        self.max_complexity = max_complexity
+        self.timeout_seconds = timeout_seconds
+        self.limiter = limiter
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def record(self, provenance: Dict[str, Any], ok: bool, timed_out: bool = False) -> None:
+        """Contabiliza uma chamada a partir da proveniência do parse"""
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        if timed_out:
+            self.timeouts += 1
+        if provenance.get("llm_latency_ms") is not None:
+            self._latencies.append(provenance["llm_latency_ms"])
+        input_tokens = provenance.get("input_tokens") or 0
+        output_tokens = provenance.get("output_tokens") or 0
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cost_usd += (
+            input_tokens * self.input_cost_per_1k + output_tokens * self.output_cost_per_1k
+        ) / 1000
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        return {
+            "model": self.model_name,
+            "max_complexity": None if math.isinf(self.max_complexity) else self.max_complexity,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "p50": _percentile(latencies, 0.5),
+                "p95": _percentile(latencies, 0.95),
+            },
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "limit": round(self.limiter.limit, 2) if self.limiter is not None else None,
+        }
+
+
+class ModelRouter:
+    """Encaminha cada query ao primeiro tier cuja `max_complexity` a comporta (senão, ao último)"""
+
+    def __init__(self, tiers: List[ModelTier], scorer: Callable[[str], float] = query_complexity):
+        if not tiers:
+            raise ValueError("ModelRouter precisa de pelo menos um tier")
+        self.tiers = sorted(tiers, key=lambda tier: tier.max_complexity)
+        self._score = scorer
+
+    @classmethod
+    def from_config(cls, config: List[Dict[str, Any]], build_llm: Callable[[Dict[str, Any]], Any]) -> "ModelRouter":
+        """
+        Monta os tiers a partir da lista de `LLM_TIERS`. `build_llm(item)`
+        devolve o LLM estruturado do tier (Gemini ou stub).
+        """
+        tiers = []
+        for item in config:
+            max_concurrency = item.get("max_concurrency")
+            limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=max_concurrency,
+                max_limit=max_concurrency,
+                max_queue=item.get("max_queue", 100),
+                queue_timeout=item.get("queue_timeout_seconds", 1.5),
+                latency_target=item.get("latency_target_seconds", 1.0),
+            ) if max_concurrency else None
+            tiers.append(ModelTier(
+                name=item["name"],
+                model_name=item["model"],
+                structured_llm=build_llm(item),
+                max_complexity=item.get("max_complexity", math.inf),
+                timeout_seconds=item.get("timeout_seconds"),
+                limiter=limiter,
+                input_cost_per_1k=item.get("input_cost_per_1k", 0.0),
+                output_cost_per_1k=item.get("output_cost_per_1k", 0.0),
+            ))
+            logger.info("Tier de modelo %s: %s (complexidade <= %s)", item["name"], item["model"], tiers[-1].max_complexity)
+        return cls(tiers)
+
+    def route(self, query_text: str) -> ModelTier:
+        score = self._score(query_text)
+        for tier in self.tiers:
+            if score <= tier.max_complexity:
+                return tier
+        return self.tiers[-1]
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {tier.name: tier.metrics() for tier in self.tiers}
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
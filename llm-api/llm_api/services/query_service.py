@@ -1,15 +1,38 @@
 """
 Query Service - Lógica de negócio e orquestração
 """
+import asyncio
 import logging
+import time
+from langchain_core.utils.json import parse_partial_json
 from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import ValidationError
 
 from llm_api.schemas import FiltrosBusca, QueryInput
 from llm_api.repositories import IQueryRepository
-from typing import Callable, Optional
+from llm_api.normalization import normalize_query
+from llm_api.cache import CacheAnalytics, QueryCache, TemplateCache
+from llm_api.timing import mark, mark_tier, timed_stage
+from llm_api.services.concurrency_limiter import AdaptiveConcurrencyLimiter, LoadShedError
+from llm_api.services.reparse_scheduler import ReparseScheduler
+from llm_api.services.idempotency import IdempotencyConflictError, IdempotencyStore
+from llm_api.services.rule_parser import AgreementStats, RuleParser
+from llm_api.services.model_router import ModelRouter
+from llm_api.services.artifact_refresher import ArtifactRefresher
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Versão de `_build_prompt`: gravada com cada parse; incremente ao mudar o prompt
+PROMPT_VERSION = 1
+
+# Tokens da resposta estruturada (JSON com 4 campos), somados ao prompt na estimativa
+ESTIMATED_OUTPUT_TOKENS = 40
+
+# Registro stale fica no L1 por este tempo: limita a uma revalidação por minuto
+# por query mesmo se o LLM continuar falhando
+STALE_L1_TTL_SECONDS = 60
+
 
 class QueryService:
     """
@@ -26,6 +49,23 @@ class QueryService:
         llm_model: ChatGoogleGenerativeAI,
         repository: IQueryRepository,
         structured_llm_provider: Optional[Callable[[], object]] = None,
+        cache: Optional[QueryCache] = None,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        analytics: Optional[CacheAnalytics] = None,
+        negative_cache: Optional[QueryCache] = None,
+        reparse: Optional[ReparseScheduler] = None,
+        revalidator: Optional[ReparseScheduler] = None,
+        soft_ttl_seconds: float = 24 * 3600,
+        hard_ttl_seconds: Optional[float] = None,
+        template_cache: Optional[TemplateCache] = None,
+        model_name: Optional[str] = None,
+        idempotency: Optional[IdempotencyStore] = None,
+        rule_parser: Optional[RuleParser] = None,
+        speculation_threshold: float = 0.85,
+        speculation_cancel_llm: bool = False,
+        llm_deadline_seconds: Optional[float] = None,
+        model_router: Optional[ModelRouter] = None,
+        artifacts: Optional[ArtifactRefresher] = None,
     ):
         """
         Injeta dependências (LLM e Repository)
@@ -38,69 +78,662 @@ class QueryService:
         else:
             self._structured_llm_provider = lambda: llm_model.with_structured_output(FiltrosBusca)
         self._repository = repository
+        # Cache L1 em memória (opcional) na frente do cache SQL
+        self._cache = cache
+        # Limite adaptativo de chamadas simultâneas ao LLM (opcional)
+        self._limiter = limiter
+        # Hit rate por camada e queries mais quentes (opcional)
+        self._analytics = analytics
+        # Fallbacks recentes (TTL curto) e re-parse em background (opcionais)
+        self._negative_cache = negative_cache
+        self._reparse = reparse
+        # Stale-while-revalidate: entre o TTL soft e o hard o cache SQL ainda é
+        # servido, com uma revalidação em background por query
+        self._revalidator = revalidator
+        self._soft_ttl = soft_ttl_seconds
+        self._hard_ttl = max(soft_ttl_seconds, hard_ttl_seconds or soft_ttl_seconds)
+        # Estrutura do parse por template de preço ("doces <=#") (opcional)
+        self._templates = template_cache
+        # Nome do modelo gravado na proveniência de cada parse
+        self._model_name = model_name
+        # Retries com o mesmo Idempotency-Key (opcional)
+        self._idempotency = idempotency
+        # Execução especulativa: regra local e LLM em paralelo (opcional).
+        # Acima do limiar a regra responde na hora; o LLM é cancelado ou
+        # termina em background (corrige o registro se discordar)
+        self._rule_parser = rule_parser
+        self._speculation_threshold = speculation_threshold
+        self._speculation_cancel_llm = speculation_cancel_llm
+        self._llm_deadline = llm_deadline_seconds
+        self._agreement = AgreementStats()
+        self._speculation = {
+            "rule_served": 0, "llm_waited": 0, "deadline_expired": 0,
+            "llm_cancelled": 0, "llm_overruled": 0,
+        }
+        self._background: set = set()
+        # Tier de modelo por complexidade da query (opcional; sem ele, um único modelo)
+        self._router = model_router
+        # Retreino periódico da regra (léxico + classificador) com troca a quente
+        # (opcional): a versão em uso substitui `rule_parser`
+        self._artifacts = artifacts
         logger.info("QueryService inicializado com injeção de dependências")
 
     async def parse_and_save_query(
-        self, query_input: QueryInput
+        self, query_input: QueryInput, idempotency_key: Optional[str] = None
     ) -> tuple[FiltrosBusca, str]:
         """
         Processa query em linguagem natural e salva no banco
         OTIMIZAÇÃO: Verifica cache ANTES de chamar LLM
+        Com `idempotency_key`, retries do mesmo request aguardam o primeiro
+        (ou recebem o resultado já gravado) em vez de processar de novo.
         Retorna: (FiltrosBusca, query_id)
+
+        Raises:
+            IdempotencyConflictError: chave já usada com outra query
         """
-        logger.info(f"Iniciando parse de query: {query_input.query}")
+        if idempotency_key is None or self._idempotency is None:
+            return await self._parse_and_save(query_input)
+
+        tenant = query_input.organization_id
+        fingerprint = normalize_query(query_input.query)
+
+        async def replay(query_id: Optional[str]) -> Optional[tuple[FiltrosBusca, str]]:
+            if query_id is not None:
+                record = await self._repository.get_query_by_id(query_id)
+            else:
+                record = await self._repository.find_by_idempotency_key(
+                    idempotency_key, organization_id=tenant,
+                    max_age_seconds=self._idempotency.ttl_seconds,
+                )
+                if record is not None and normalize_query(record['query_text']) != fingerprint:
+                    raise IdempotencyConflictError(
+                        f"Idempotency-Key reutilizado com outra query: {idempotency_key}"
+                    )
+            if record is None:
+                return None
+            return FiltrosBusca(**record['filters']), record['id']
+
+        return await self._idempotency.run(
+            f"{'default' if tenant is None else tenant}:{idempotency_key}",
+            fingerprint,
+            execute=lambda: self._parse_and_save(query_input, idempotency_key),
+            replay=replay,
+            query_id_of=lambda result: result[1],
+        )
+
+    async def _parse_and_save(
+        self, query_input: QueryInput, idempotency_key: Optional[str] = None
+    ) -> tuple[FiltrosBusca, str]:
+        logger.info("Iniciando parse de query: %s", query_input.query)
+        # Caches, histórico e métricas são separados por organização
+        tenant = query_input.organization_id
 
         # 1. VERIFICA CACHE PRIMEIRO (economia de tokens LLM)
-        cached = await self._repository.find_cached_query(query_input.query)
+        with timed_stage("cache"):
+            tier = "l1"
+            cached = self._cache.get(query_input.query, tenant=tenant) if self._cache is not None else None
+            if cached:
+                logger.info("Cache L1 hit! Economizou 1 chamada LLM. Reusando query_id: %s", cached['id'])
+            else:
+                tier = "sql"
+                cached = await self._repository.find_cached_query(
+                    query_input.query, max_age_seconds=self._hard_ttl, organization_id=tenant
+                )
+                if cached:
+                    logger.info("Cache hit! Economizou 1 chamada LLM. Reusando query_id: %s", cached['id'])
+                    self._serve_cached(query_input.query, cached, tenant)
+                elif self._negative_cache is not None:
+                    # Fallback recente da mesma query: não martela o LLM que acabou de falhar
+                    tier = "negative"
+                    cached = self._negative_cache.get(query_input.query, tenant=tenant)
+                    if cached:
+                        logger.info("Cache negativo hit, servindo fallback: %s", cached['id'])
+                        mark("fallback")
+
+        # Mesma query com outro preço já parseada: monta os filtros sem LLM
+        filtros = None
+        if not cached and self._templates is not None:
+            with timed_stage("template"):
+                templated = self._templates.lookup(query_input.query, tenant=tenant)
+            if templated:
+                tier = "template"
+                mark("template")
+                filtros = FiltrosBusca(**templated)
+                logger.info("Template hit! Economizou 1 chamada LLM: %s", query_input.query)
+
+        if self._analytics is not None:
+            self._analytics.record(
+                query_input.query,
+                tier if cached or filtros else "miss",
+                estimated_tokens=self._estimate_tokens(query_input.query),
+                tenant=tenant,
+            )
         if cached:
-            logger.info(f"Cache hit! Economizou 1 chamada LLM. Reusando query_id: {cached['id']}")
+            mark_tier(tier)
             return FiltrosBusca(**cached['filters']), cached['id']
 
-        # 2. Parse via LLM (só se não encontrou no cache)
-        filtros = await self._parse_query(query_input.query)
-        logger.debug(f"Filtros extraídos: {filtros.model_dump()}")
+        # 2. Parse via LLM (só se não encontrou no cache nem template),
+        # em paralelo com a regra local se houver
+        pending = None
+        rule_parser = self._current_rule_parser()
+        if filtros is None and rule_parser is not None:
+            filtros, provenance, pending = await self._speculate(query_input.query, rule_parser)
+        elif filtros is None:
+            filtros, provenance = await self._invoke_llm(query_input.query)
+            logger.debug("Filtros extraídos: %s", filtros)
+        else:
+            provenance = {"source": "template"}
 
         # 3. Valida filtros
-        if not self.validate_filters(filtros):
-            logger.warning("Filtros inválidos, aplicando fallback")
-            filtros = FiltrosBusca(search_term=query_input.query)
+        with timed_stage("validation"):
+            degraded = filtros is None or not self.validate_filters(filtros)
+            if degraded:
+                if filtros is not None:
+                    logger.warning("Filtros inválidos, aplicando fallback")
+                    mark("fallback")
+                filtros = self._fallback(query_input.query)
+                provenance["source"] = "fallback"
+            filters_dict = filtros.model_dump()
 
-        # 4. Salva no banco
-        query_id = await self._repository.save_query(
-            query_input.query, filtros.model_dump()
-        )
-        logger.info(f"Query salva com ID: {query_id}")
+        # 4. Salva no banco (fallback fica fora do cache SQL)
+        status = "fallback" if degraded else "processed"
+        try:
+            with timed_stage("persistence"):
+                query_id = await self._repository.save_query(
+                    query_input.query, filters_dict, status=status, provenance=provenance,
+                    organization_id=tenant, idempotency_key=idempotency_key,
+                )
+                logger.info("Query salva com ID: %s", query_id)
 
-        # 5. Atualiza status
-        await self._repository.update_query_status(query_id, "processed")
+                # 5. Atualiza status
+                await self._repository.update_query_status(query_id, status)
+        except BaseException:
+            # Sem registro gravado (ou request cancelado) o LLM especulativo
+            # não tem o que confirmar nem corrigir
+            if pending is not None:
+                pending[0].cancel()
+            raise
 
+        if degraded:
+            self._remember_failure(query_input.query, query_id, filters_dict, tenant)
+        else:
+            self._remember(query_input.query, query_id, filters_dict, tenant)
+        if pending is not None:
+            self._run_in_background(self._settle_speculation(pending, query_input.query, query_id, tenant))
+
+        mark_tier(provenance["source"])
         return filtros, query_id
 
+    def _current_rule_parser(self) -> Optional[RuleParser]:
+        """Regra em uso: a versão ativa dos artefatos (se houver refresher) ou a fixa"""
+        if self._artifacts is not None:
+            return self._artifacts.rule_parser
+        return self._rule_parser
+
+    async def _speculate(self, query_text: str, rule_parser: RuleParser):
+        """
+        Dispara o LLM e roda a regra enquanto ele responde.
+
+        Retorna (filtros, proveniência, pendente): `pendente` é
+        (task do LLM, filtros da regra, confiança) quando a regra respondeu
+        e o LLM continua em background.
+        """
+        llm_task = asyncio.create_task(self._invoke_llm(query_text))
+        with timed_stage("rule"):
+            rule_filtros, confidence = rule_parser.parse(query_text)
+        rule_usable = confidence > 0 and self.validate_filters(rule_filtros)
+
+        if rule_usable and confidence >= self._speculation_threshold:
+            mark("rule")
+            self._speculation["rule_served"] += 1
+            if self._speculation_cancel_llm:
+                llm_task.cancel()
+                self._speculation["llm_cancelled"] += 1
+                return rule_filtros, {"source": "rule"}, None
+            return rule_filtros, {"source": "rule"}, (llm_task, rule_filtros, confidence)
+
+        self._speculation["llm_waited"] += 1
+        try:
+            filtros, provenance = await asyncio.wait_for(asyncio.shield(llm_task), self._llm_deadline)
+        except asyncio.TimeoutError:
+            # LLM passou do prazo: a regra (se extraiu algo) responde e ele segue em background
+            self._speculation["deadline_expired"] += 1
+            if not rule_usable:
+                llm_task.cancel()
+                mark("fallback")
+                return None, {"source": "llm", "llm_model": self._model_name, "prompt_version": PROMPT_VERSION}, None
+            logger.warning("LLM excedeu %ss, servindo a regra: %s", self._llm_deadline, query_text)
+            mark("rule")
+            return rule_filtros, {"source": "rule"}, (llm_task, rule_filtros, confidence)
+
+        if filtros is not None and self.validate_filters(filtros):
+            self._agreement.record(confidence, rule_filtros, filtros)
+        return filtros, provenance, None
+
+    async def _settle_speculation(self, pending, query_text: str, query_id: str, tenant: Optional[int]) -> None:
+        """
+        LLM em background após a regra: compara e grava a resposta dele no
+        registro e nos caches. Mesmo quando concorda, o registro passa a ter
+        a proveniência do LLM; senão as queries em que a regra acerta nunca
+        entrariam nos exemplos de treino (`get_training_examples`).
+        """
+        llm_task, rule_filtros, confidence = pending
+        filtros, provenance = await llm_task
+        if filtros is None or not self.validate_filters(filtros):
+            return
+        if not self._agreement.record(confidence, rule_filtros, filtros):
+            self._speculation["llm_overruled"] += 1
+            logger.info("LLM discordou da regra, atualizando query %s: %s", query_id, query_text)
+        filters_dict = filtros.model_dump()
+        await self._repository.update_query_filters(
+            query_id, filters_dict, status="processed", provenance=provenance
+        )
+        self._remember(query_text, query_id, filters_dict, tenant)
+
+    def _run_in_background(self, coro) -> None:
+        """Mantém a referência da task até ela terminar (erros só no log)"""
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+
+        def done(t: asyncio.Task) -> None:
+            self._background.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                logger.warning("Verificação em background falhou: %s", t.exception())
+
+        task.add_done_callback(done)
+
     async def parse_query_only(self, query_text: str) -> FiltrosBusca:
         """Apenas faz parse, sem salvar"""
         return await self._parse_query(query_text)
 
-    async def get_query_history(self, limit: int = 10) -> list:
-        """Recupera histórico de queries"""
-        return await self._repository.get_query_history(limit)
+    async def stream_parse_query(self, query_text: str) -> AsyncIterator[Tuple[str, FiltrosBusca]]:
+        """
+        Parse sem salvar, publicando os filtros à medida que o LLM os gera.
+
+        Produz ("partial", filtros) a cada campo concluído e termina com um
+        ("final", filtros) validado (fallback se o LLM falhar ou devolver
+        filtros inválidos). Um partial pode divergir do final: quem consome
+        deve trocar a busca se o final mudar.
+
+        Usa o mesmo tier do ModelRouter (modelo, limiter e timeout) que o
+        parse sem stream, e conta a chamada nas métricas do tier.
+        """
+        prompt = self._build_prompt(query_text)
+        tier = self._router.route(query_text) if self._router is not None else None
+        provenance: Dict[str, Any] = {
+            "source": "llm",
+            "llm_model": tier.model_name if tier is not None else self._model_name,
+            "prompt_version": PROMPT_VERSION,
+        }
+        filtros = None
+        producer = None
+        try:
+            if tier is not None:
+                structured_llm, limiter, timeout = tier.structured_llm, tier.limiter, tier.timeout_seconds
+            else:
+                structured_llm, limiter, timeout = self._structured_llm_provider(), self._limiter, None
+            events: asyncio.Queue = asyncio.Queue()
+            producer = asyncio.create_task(
+                self._pump_stream(structured_llm, limiter, prompt, events, provenance, timeout)
+            )
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                complete, filtros = item
+                if not complete:
+                    yield "partial", filtros
+            await producer
+            if tier is not None:
+                tier.record(provenance, ok=True)
+        except LoadShedError as e:
+            logger.warning("LLM sobrecarregado, aplicando fallback no stream: %s", e)
+            filtros = None
+            if tier is not None:
+                tier.record(provenance, ok=False)
+        except Exception as e:
+            logger.warning("Erro no stream do LLM, aplicando fallback: %s", e)
+            filtros = None
+            if tier is not None:
+                tier.record(provenance, ok=False, timed_out=isinstance(e, asyncio.TimeoutError))
+        finally:
+            if producer is not None:
+                producer.cancel()
+
+        if filtros is None or not self.validate_filters(filtros):
+            filtros = self._fallback(query_text)
+        yield "final", filtros
+
+    async def _pump_stream(
+        self,
+        structured_llm,
+        limiter,
+        prompt: str,
+        events: asyncio.Queue,
+        provenance: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Lê o stream do LLM para `events` e termina com None.
+
+        Roda fora do gerador: o slot do limiter é devolvido assim que o
+        provedor termina, e a latência medida pelo AIMD não inclui o tempo
+        em que o cliente lento demora a consumir os parciais. `timeout` vale
+        para o stream inteiro; latência e tokens vão para `provenance`.
+        """
+        async def pump() -> None:
+            start = time.perf_counter()
+            try:
+                async for item in self._astream_filters(structured_llm, prompt, provenance):
+                    events.put_nowait(item)
+            finally:
+                provenance["llm_latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        try:
+            if limiter is not None:
+                async with limiter.acquire():
+                    await asyncio.wait_for(pump(), timeout)
+            else:
+                await asyncio.wait_for(pump(), timeout)
+        finally:
+            events.put_nowait(None)
+
+    async def _astream_filters(
+        self, structured_llm, prompt: str, provenance: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Tuple[bool, FiltrosBusca]]:
+        """
+        (completo?, filtros) do `astream` do LLM estruturado, só quando mudam.
+
+        Com include_raw os chunks trazem {"raw": AIMessageChunk} (argumentos da
+        tool call em JSON parcial) e, no fim, {"parsed": FiltrosBusca}. O último
+        campo do JSON parcial pode estar cortado ("Do" de "Doces", 2 de 25) e
+        só é publicado quando o próximo começa ou com o objeto completo.
+        Com `provenance`, os tokens do `usage_metadata` acumulado são gravados nela.
+        """
+        raw = None
+        parsed = None
+        last = None
+        async for chunk in structured_llm.astream(prompt):
+            complete = False
+            if isinstance(chunk, FiltrosBusca):
+                # parser que já entrega objetos (cada um pode ser refinado pelo próximo)
+                candidate = parsed = chunk
+            elif isinstance(chunk, dict) and chunk.get("parsed") is not None:
+                candidate = parsed = chunk["parsed"]
+                complete = True
+                if chunk.get("raw") is not None:
+                    raw = chunk["raw"] if raw is None else raw + chunk["raw"]
+            elif isinstance(chunk, dict) and chunk.get("raw") is not None:
+                raw = chunk["raw"] if raw is None else raw + chunk["raw"]
+                candidate = self._partial_filters(raw)
+            else:
+                continue
+            if complete or (candidate is not None and candidate != last):
+                last = candidate
+                yield complete, candidate
+        if provenance is not None:
+            usage = getattr(raw, "usage_metadata", None) or {}
+            provenance["input_tokens"] = usage.get("input_tokens")
+            provenance["output_tokens"] = usage.get("output_tokens")
+        if parsed is None:
+            raise ValueError("Stream do LLM terminou sem filtros completos")
+
+    @staticmethod
+    def _partial_filters(raw) -> Optional[FiltrosBusca]:
+        """Campos já concluídos nos argumentos parciais da tool call (ou no texto JSON)"""
+        tool_calls = getattr(raw, "tool_calls", None) or []
+        if tool_calls:
+            args = tool_calls[0].get("args") or {}
+        elif isinstance(getattr(raw, "content", None), str) and raw.content.strip():
+            args = parse_partial_json(raw.content) or {}
+        else:
+            return None
+        complete = {key: value for key, value in list(args.items())[:-1] if key in FiltrosBusca.model_fields}
+        if not complete:
+            return None
+        try:
+            return FiltrosBusca(**complete)
+        except ValidationError:
+            return None
+
+    async def get_query_history(self, limit: int = 10, organization_id: Optional[int] = None) -> list:
+        """Recupera histórico de queries (só da organização, se informada)"""
+        if organization_id is None:
+            return await self._repository.get_query_history(limit)
+        return await self._repository.get_query_history(limit, organization_id=organization_id)
+
+    def get_metrics(self) -> dict:
+        """Métricas operacionais do service"""
+        metrics = {}
+        if self._limiter is not None:
+            metrics["llm_limiter"] = self._limiter.metrics()
+        if self._reparse is not None:
+            metrics["reparse"] = self._reparse.metrics()
+        if self._revalidator is not None:
+            metrics["revalidate"] = self._revalidator.metrics()
+        if self._idempotency is not None:
+            metrics["idempotency"] = self._idempotency.metrics()
+        if self._router is not None:
+            metrics["model_tiers"] = self._router.metrics()
+        rule_parser = self._current_rule_parser()
+        if rule_parser is not None:
+            metrics["speculation"] = {
+                **self._speculation,
+                "threshold": self._speculation_threshold,
+                "agreement": self._agreement.snapshot(),
+            }
+            classifier = rule_parser.classifier
+            if classifier is not None:
+                metrics["speculation"]["classifier"] = {
+                    key: classifier.metadata.get(key) for key in ("trained_at", "examples", "holdout")
+                }
+        if self._artifacts is not None:
+            metrics["artifacts"] = self._artifacts.status()
+        db_pools = self._repository.pool_metrics()
+        if db_pools:
+            metrics["db_pools"] = db_pools
+        return metrics
+
+    def get_cache_stats(self, top_k: int = 10) -> dict:
+        """Hit rate por camada, economia estimada e queries mais quentes"""
+        stats = self._analytics.snapshot(top_k) if self._analytics is not None else {}
+        if self._cache is not None:
+            stats["l1"] = {
+                "entries": len(self._cache),
+                "max_entries": self._cache.max_entries,
+                "ttl_seconds": self._cache.ttl_seconds,
+                # ocupação por organização ("default" = sem organização)
+                "tenants": {
+                    ("default" if tenant is None else str(tenant)): size
+                    for tenant, size in self._cache.tenant_sizes().items()
+                },
+            }
+        if self._templates is not None:
+            stats["templates"] = {
+                "entries": len(self._templates),
+                "hits": self._templates.hits,
+                "misses": self._templates.misses,
+            }
+        return stats
+
+    def get_artifacts_status(self) -> Optional[dict]:
+        """Versão em uso, anterior e último candidato dos artefatos locais (None = retreino desabilitado)"""
+        return self._artifacts.status() if self._artifacts is not None else None
+
+    async def refresh_artifacts(self) -> Optional[dict]:
+        """Retreina e valida agora, trocando se o candidato for aceito"""
+        return await self._artifacts.refresh() if self._artifacts is not None else None
+
+    async def rollback_artifacts(self) -> Optional[bool]:
+        """Volta os artefatos locais à versão anterior (False se não houver)"""
+        return await self._artifacts.rollback() if self._artifacts is not None else None
+
+    def _remember(
+        self, query_text: str, query_id: str, filters: dict, tenant: Optional[int] = None
+    ) -> None:
+        """
+        Popula o cache L1 e o template cache (se configurados). O L1 vale no
+        máximo o TTL soft: depois dele o hit passa pelo cache SQL (revalidação).
+        """
+        if self._cache is not None:
+            self._cache.set(
+                query_text, {"id": query_id, "filters": filters}, ttl_seconds=self._soft_ttl, tenant=tenant
+            )
+        if self._templates is not None:
+            self._templates.learn(query_text, filters, tenant=tenant)
+
+    def _serve_cached(self, query_text: str, cached: dict, tenant: Optional[int] = None) -> None:
+        """
+        Hit no cache SQL: popula o L1 só pelo que resta do TTL soft. Se o
+        registro já passou dele, é servido assim mesmo e a revalidação é
+        agendada (o request não espera).
+        """
+        age = cached.get('age_seconds')
+        age = float(age) if isinstance(age, (int, float)) else 0.0
+        remaining = self._soft_ttl - age
+        if self._templates is not None:
+            self._templates.learn(query_text, cached['filters'], tenant=tenant)
+        if self._cache is not None:
+            self._cache.set(
+                query_text,
+                {"id": cached['id'], "filters": cached['filters']},
+                ttl_seconds=remaining if remaining > 0 else STALE_L1_TTL_SECONDS,
+                tenant=tenant,
+            )
+        if remaining > 0:
+            return
+
+        mark("stale")
+        if self._revalidator is not None:
+            scheduled = self._revalidator.schedule(
+                self._job_key(query_text, tenant),
+                lambda: self._reparse_query(query_text, cached['id'], tenant),
+            )
+            if scheduled:
+                logger.info("Cache stale (%.0fs), revalidando em background: %s", age, cached['id'])
+
+    def _remember_failure(
+        self, query_text: str, query_id: str, filters: dict, tenant: Optional[int] = None
+    ) -> None:
+        """
+        Fallback vai só para o cache negativo (TTL curto), nunca para o L1,
+        e agenda o re-parse que promove o registro quando o LLM voltar.
+        """
+        if self._negative_cache is not None:
+            self._negative_cache.set(query_text, {"id": query_id, "filters": filters}, tenant=tenant)
+        if self._reparse is not None:
+            self._reparse.schedule(
+                self._job_key(query_text, tenant),
+                lambda: self._reparse_query(query_text, query_id, tenant),
+            )
+
+    @staticmethod
+    def _job_key(query_text: str, tenant: Optional[int]) -> str:
+        """Chave de deduplicação dos jobs em background (por organização)"""
+        key = normalize_query(query_text)
+        return key if tenant is None else f"{tenant}:{key}"
+
+    async def _reparse_query(
+        self, query_text: str, query_id: str, tenant: Optional[int] = None
+    ) -> bool:
+        """
+        Job de re-parse/revalidação: True se o LLM devolveu filtros válidos e
+        o registro foi atualizado (promovido a "processed", idade zerada)
+        """
+        filtros, provenance = await self._invoke_llm(query_text)
+        if filtros is None or not self.validate_filters(filtros):
+            return False
+        filters_dict = filtros.model_dump()
+        await self._repository.update_query_filters(
+            query_id, filters_dict, status="processed", provenance=provenance
+        )
+        if self._negative_cache is not None:
+            self._negative_cache.discard(query_text, tenant=tenant)
+        self._remember(query_text, query_id, filters_dict, tenant)
+        return True
 
     async def _parse_query(self, query_text: str) -> FiltrosBusca:
         """
         Lógica privada de parsing com fallback
         S de SOLID: Responsabilidade única - parsing
         """
+        filtros, _ = await self._invoke_llm(query_text)
+        return filtros if filtros is not None else self._fallback(query_text)
+
+    @staticmethod
+    def _fallback(query_text: str) -> FiltrosBusca:
+        """Fallback seguro: a query inteira vira termo de busca"""
+        return FiltrosBusca(search_term=query_text)
+
+    async def _invoke_llm(self, query_text: str) -> Tuple[Optional[FiltrosBusca], Dict[str, Any]]:
+        """
+        Chama o LLM; filtros são None (e marca `fallback`) se falhar ou for descartado.
+        Retorna também a proveniência do parse (modelo, prompt, latência e tokens).
+        """
         prompt = self._build_prompt(query_text)
+        tier = self._router.route(query_text) if self._router is not None else None
+        provenance: Dict[str, Any] = {
+            "source": "llm",
+            "llm_model": tier.model_name if tier is not None else self._model_name,
+            "prompt_version": PROMPT_VERSION,
+        }
 
         try:
-            logger.debug(f"Enviando para LLM: {prompt}")
-            structured_llm = self._structured_llm_provider()
-            response = await structured_llm.ainvoke(prompt)
+            logger.debug("Enviando para LLM: %s", prompt)
+            if tier is not None:
+                structured_llm, limiter, timeout = tier.structured_llm, tier.limiter, tier.timeout_seconds
+            else:
+                structured_llm, limiter, timeout = self._structured_llm_provider(), self._limiter, None
+            with timed_stage("llm"):
+                if limiter is not None:
+                    async with limiter.acquire():
+                        response = await self._timed_ainvoke(structured_llm, prompt, provenance, timeout)
+                else:
+                    response = await self._timed_ainvoke(structured_llm, prompt, provenance, timeout)
+            response = self._unwrap_response(response, provenance)
             logger.info("LLM retornou resposta com sucesso")
-            return response
+            if tier is not None:
+                tier.record(provenance, ok=True)
+            return response, provenance
+        except LoadShedError as e:
+            logger.warning("LLM sobrecarregado, aplicando fallback: %s", e)
+            mark("fallback")
+            if tier is not None:
+                tier.record(provenance, ok=False)
+            return None, provenance
         except Exception as e:
-            logger.warning(f"Erro no LLM, aplicando fallback: {str(e)}")
-            # Fallback seguro
-            return FiltrosBusca(search_term=query_text)
+            logger.warning("Erro no LLM, aplicando fallback: %s", e)
+            mark("fallback")
+            if tier is not None:
+                tier.record(provenance, ok=False, timed_out=isinstance(e, asyncio.TimeoutError))
+            return None, provenance
+
+    @staticmethod
+    async def _timed_ainvoke(
+        structured_llm, prompt: str, provenance: Dict[str, Any], timeout: Optional[float] = None
+    ):
+        """ainvoke medindo só a chamada ao provedor (sem a espera no limiter), com timeout opcional"""
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(structured_llm.ainvoke(prompt), timeout)
+        finally:
+            provenance["llm_latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    @staticmethod
+    def _unwrap_response(response, provenance: Dict[str, Any]) -> FiltrosBusca:
+        """
+        `with_structured_output(..., include_raw=True)` devolve
+        {"raw": AIMessage, "parsed": FiltrosBusca, "parsing_error": ...}: extrai
+        os tokens de `usage_metadata`. Sem include_raw, a resposta já são os filtros.
+        """
+        if not isinstance(response, dict):
+            return response
+        usage = getattr(response.get("raw"), "usage_metadata", None) or {}
+        provenance["input_tokens"] = usage.get("input_tokens")
+        provenance["output_tokens"] = usage.get("output_tokens")
+        if response.get("parsed") is None:
+            raise ValueError(f"Resposta do LLM sem filtros: {response.get('parsing_error')}")
+        return response["parsed"]
 
     @staticmethod
     def _build_prompt(query_text: str) -> str:
@@ -114,6 +747,11 @@ price_max: "até X" ou "menos de X"
 price_min: "a partir de X" ou "mais de X"""
 
 
+    @staticmethod
+    def _estimate_tokens(query_text: str) -> int:
+        """Estimativa de tokens de uma chamada ao LLM (~4 caracteres por token)"""
+        return len(QueryService._build_prompt(query_text)) // 4 + ESTIMATED_OUTPUT_TOKENS
+
     def validate_filters(self, filtros: FiltrosBusca) -> bool:
         """
         Valida filtros extraídos
@@ -126,7 +764,7 @@ price_min: "a partir de X" ou "mais de X"""
             and filtros.price_min > filtros.price_max
         ):
             logger.warning(
-                f"Filtro inválido: price_min ({filtros.price_min}) > price_max ({filtros.price_max})"
+                "Filtro inválido: price_min (%s) > price_max (%s)", filtros.price_min, filtros.price_max
             )
             return False
 
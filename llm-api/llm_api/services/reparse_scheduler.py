@@ -0,0 +1,82 @@
+"""
+Reparse scheduler - Refaz em background o parse de queries que caíram no fallback
+
+Quando o LLM falha, a query é salva como "fallback" e fica só no cache
+negativo (TTL curto). Este agendador tenta de novo depois de `delay_seconds`
+(com backoff exponencial entre tentativas); o job do QueryService promove o
+registro para "processed" quando o LLM responder.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ReparseScheduler:
+    """
+    Uma tarefa pendente por chave (query normalizada), no máximo `max_pending`.
+
+    Attributes:
+        delay_seconds: Espera antes da primeira tentativa
+        max_attempts: Tentativas por chave antes de desistir
+        max_pending: Limite de chaves pendentes (o excedente é descartado)
+    """
+
+    def __init__(self, delay_seconds: float = 30, max_attempts: int = 3, max_pending: int = 100):
+        self.delay_seconds = delay_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.max_pending = max(1, max_pending)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.upgraded = 0
+        self.gave_up = 0
+        self.dropped = 0
+
+    def schedule(self, key: str, job: Callable[[], Awaitable[bool]]) -> bool:
+        """
+        Agenda `job` (retorna True quando o re-parse deu certo).
+        Retorna False se a chave já está pendente ou a fila está cheia.
+        """
+        if key in self._tasks:
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self.dropped += 1
+            logger.warning("Re-parse descartado (fila cheia): %s", key)
+            return False
+        task = asyncio.create_task(self._run(key, job))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return True
+
+    async def _run(self, key: str, job: Callable[[], Awaitable[bool]]) -> None:
+        delay = self.delay_seconds
+        for attempt in range(1, self.max_attempts + 1):
+            await asyncio.sleep(delay)
+            try:
+                if await job():
+                    self.upgraded += 1
+                    logger.info("Re-parse concluído na tentativa %s: %s", attempt, key)
+                    return
+            except Exception as e:
+                logger.warning("Re-parse falhou (tentativa %s): %s", attempt, e)
+            delay *= 2
+        self.gave_up += 1
+        logger.warning("Re-parse abandonado após %s tentativas: %s", self.max_attempts, key)
+
+    def is_pending(self, key: str) -> bool:
+        return key in self._tasks
+
+    async def stop(self) -> None:
+        """Cancela as tarefas pendentes (shutdown)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def metrics(self) -> dict:
+        return {
+            "pending": len(self._tasks),
+            "upgraded": self.upgraded,
+            "gave_up": self.gave_up,
+            "dropped": self.dropped,
+        }
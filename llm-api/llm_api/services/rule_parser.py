@@ -0,0 +1,246 @@
+"""
+Rule parser - Extração local de filtros, sem LLM, com um grau de confiança
+
+Reaproveita a normalização do cache: as faixas de preço já saem canônicas
+da chave ("doces <=50"), a categoria vem de um léxico de palavras por
+categoria e o search_term são os termos restantes na ordem da query.
+
+A confiança diz o quanto a regra tende a concordar com o LLM. O
+`AgreementStats` mede essa concordância por faixa de confiança para
+calibrar o limiar de uso da regra no lugar do LLM.
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from llm_api.normalization import BINDERS, FILLERS, STOPWORDS, _fold, normalize_query, template_key
+from llm_api.schemas import FiltrosBusca
+from llm_api.services.category_classifier import CategoryClassifier
+
+# Categorias do prompt do LLM -> palavras (sem acento, no singular) que as indicam
+DEFAULT_LEXICON: Dict[str, Tuple[str, ...]] = {
+    "Doces": (
+        "doce", "brownie", "bolo", "torta", "brigadeiro", "chocolate", "bombom", "bala",
+        "biscoito", "cookie", "pudim", "trufa", "sobremesa", "cupcake", "pave", "beijinho",
+    ),
+    "Bebidas": (
+        "bebida", "suco", "refrigerante", "refri", "cafe", "cha", "agua", "cerveja",
+        "vinho", "energetico", "achocolatado", "isotonico",
+    ),
+    "Artesanato": (
+        "artesanato", "artesanal", "croche", "trico", "bordado", "ceramica", "macrame",
+        "pulseira", "colar", "brinco", "tapete", "vela", "quadro", "enfeite",
+    ),
+    "Limpeza": (
+        "limpeza", "detergente", "sabao", "desinfetante", "amaciante", "alvejante",
+        "agua sanitaria", "vassoura", "rodo", "esponja", "multiuso", "lustra",
+    ),
+    "Alimentos": (
+        "alimento", "comida", "arroz", "feijao", "macarrao", "oleo", "farinha",
+        "acucar", "sal", "leite", "cafe da manha", "enlatado", "cesta basica", "mantimento",
+    ),
+}
+
+# Nomes das próprias categorias: indicam a categoria mas não viram search_term
+CATEGORY_WORDS = frozenset({"doce", "bebida", "artesanato", "limpeza", "alimento", "comida"})
+
+_WORDS = re.compile(r"[^\W\d_]+|\d+(?:[.,]\d+)?")
+
+
+def learn_lexicon(
+    examples: Iterable[Tuple[str, Dict[str, Any]]], min_count: int = 5, min_purity: float = 0.95
+) -> Dict[str, Tuple[str, ...]]:
+    """
+    Léxico aprendido do histórico do LLM: termos (da chave normalizada) vistos
+    ao menos `min_count` vezes e associados à mesma categoria em pelo menos
+    `min_purity` das queries (sem categoria conta contra)
+    """
+    counts: Dict[str, Counter] = {}
+    for query_text, filters in examples:
+        template, _ = template_key(normalize_query(query_text))
+        for term in set(template.split()):
+            if term in BINDERS or any(ch.isdigit() or ch == "#" for ch in term):
+                continue
+            counts.setdefault(term, Counter())[filters.get("category")] += 1
+
+    lexicon: Dict[str, List[str]] = {}
+    for term, by_category in counts.items():
+        category, n = by_category.most_common(1)[0]
+        if category and n >= min_count and n / sum(by_category.values()) >= min_purity:
+            lexicon.setdefault(category, []).append(term)
+    return {category: tuple(sorted(words)) for category, words in sorted(lexicon.items())}
+
+
+def merge_lexicon(
+    learned: Dict[str, Iterable[str]], base: Dict[str, Iterable[str]] = DEFAULT_LEXICON
+) -> Dict[str, Tuple[str, ...]]:
+    """Léxico base mais os termos aprendidos que ele ainda não tem (a base prevalece)"""
+    known = {_fold(word) for words in base.values() for word in words}
+    merged = {category: tuple(words) for category, words in base.items()}
+    for category, words in learned.items():
+        extra = tuple(word for word in words if _fold(word) not in known)
+        if extra:
+            merged[category] = merged.get(category, ()) + extra
+    return merged
+
+
+class RuleParser:
+    """
+    Parser por regras.
+
+    Confiança:
+    - 0.0: nada extraído (nem categoria, nem preço)
+    - 0.2: mais de uma categoria no léxico (ambíguo)
+    - 0.3: termos sem nenhuma categoria conhecida (o LLM pode inferir uma)
+    - 0.75: uma categoria, mas com termos fora do léxico
+    - 0.85: termos fora do léxico, com a categoria dada (ou confirmada) pelo
+      classificador treinado no histórico do LLM
+    - 0.9: uma categoria e só termos do léxico, ou só faixas de preço
+
+    Com classificador, o léxico e o classificador discordando cai para 0.2,
+    e preço provável sem faixa extraída ("baratinho") fica em no máximo 0.3.
+    """
+
+    def __init__(
+        self,
+        lexicon: Optional[Dict[str, Iterable[str]]] = None,
+        classifier: Optional[CategoryClassifier] = None,
+        classifier_threshold: float = 0.9,
+    ):
+        self._words: Dict[str, str] = {}
+        self._phrases: List[Tuple[str, str]] = []
+        for category, words in (lexicon or DEFAULT_LEXICON).items():
+            for word in words:
+                word = _fold(word)
+                if " " in word:
+                    self._phrases.append((word, category))
+                else:
+                    self._words[word] = category
+        # Classificador local (opcional): só vale a previsão com probabilidade >= limiar
+        self.classifier = classifier
+        self.classifier_threshold = classifier_threshold
+
+    def parse(self, query_text: str) -> Tuple[FiltrosBusca, float]:
+        """Filtros extraídos e a confiança (0 a 1) de que o LLM concordaria"""
+        template, slots = template_key(normalize_query(query_text))
+        price_min = max((value for op, value in slots if op == ">="), default=None)
+        price_max = min((value for op, value in slots if op == "<="), default=None)
+        terms = {word for word in template.split() if "#" not in word}
+
+        # "água sanitária" é Limpeza, não "água" (Bebidas) + termo desconhecido
+        folded = _fold(query_text)
+        matched = [(phrase, category) for phrase, category in self._phrases if phrase in folded]
+        categories = {category for _, category in matched}
+        covered = {word for phrase, _ in matched for word in phrase.split()}
+        unknown = 0
+        for term in terms - covered:
+            category = self._category(term)
+            if category is not None:
+                categories.add(category)
+            elif term not in BINDERS:
+                unknown += 1
+
+        category = next(iter(categories)) if len(categories) == 1 else None
+        if len(categories) > 1:
+            confidence = 0.2
+        elif not categories:
+            confidence = 0.3 if unknown else (0.9 if slots else 0.0)
+        else:
+            confidence = 0.75 if unknown else 0.9
+        if self.classifier is not None and confidence > 0.2:
+            category, confidence = self._with_classifier(query_text, category, confidence, bool(slots), unknown)
+
+        filtros = FiltrosBusca(
+            search_term=self._search_term(query_text, terms),
+            category=category,
+            price_min=price_min,
+            price_max=price_max,
+        )
+        return filtros, confidence
+
+    def _with_classifier(
+        self, query_text: str, category: Optional[str], confidence: float, has_price: bool, unknown: int
+    ) -> Tuple[Optional[str], float]:
+        """Histórico do LLM como prior da regra (ver docstring da classe)"""
+        prediction = self.classifier.predict(query_text)
+        if not has_price and prediction.price_probability >= self.classifier_threshold:
+            return category, min(confidence, 0.3)
+        if not unknown or prediction.category_probability < self.classifier_threshold:
+            return category, confidence
+        if category is None or prediction.category == category:
+            return prediction.category, 0.85
+        return category, 0.2
+
+    def _category(self, term: str) -> Optional[str]:
+        for candidate in (term, term[:-1] if term.endswith("s") else None, term[:-2] if term.endswith("es") else None):
+            if candidate and candidate in self._words:
+                return self._words[candidate]
+        return None
+
+    def _search_term(self, query_text: str, terms: set) -> Optional[str]:
+        """
+        Termos restantes na ordem original (sem nomes de categoria); uma
+        stopword só fica quando liga dois termos ("brownie de chocolate")
+        """
+        tokens = _WORDS.findall(query_text)
+        keep = [
+            _fold(token) in terms and self._singular(_fold(token)) not in CATEGORY_WORDS
+            for token in tokens
+        ]
+        out: List[str] = []
+        for i, token in enumerate(tokens):
+            if keep[i]:
+                out.append(token)
+            elif (
+                out and _fold(token) in STOPWORDS | FILLERS and out[-1] == tokens[i - 1]
+                and i + 1 < len(tokens) and keep[i + 1]
+            ):
+                out.append(token)
+        return " ".join(out) or None
+
+    @staticmethod
+    def _singular(word: str) -> str:
+        return word[:-1] if word.endswith("s") else word
+
+
+class AgreementStats:
+    """
+    Concordância regra x LLM por faixa de confiança (arredondada para baixo
+    a 0.1). Só conta quando os dois caminhos terminaram.
+    """
+
+    FIELDS = ("search_term", "category", "price_min", "price_max")
+
+    def __init__(self):
+        # faixa -> {compared, agreed, <campo>: concordâncias}
+        self._buckets: Dict[float, Dict[str, int]] = {}
+
+    def record(self, confidence: float, rule: FiltrosBusca, llm: FiltrosBusca) -> bool:
+        """Registra a comparação; True se os filtros concordam em todos os campos"""
+        bucket = self._buckets.setdefault(
+            int(confidence * 10) / 10, {"compared": 0, "agreed": 0, **{field: 0 for field in self.FIELDS}}
+        )
+        matches = {field: self._same(field, getattr(rule, field), getattr(llm, field)) for field in self.FIELDS}
+        bucket["compared"] += 1
+        for field, same in matches.items():
+            bucket[field] += same
+        agreed = all(matches.values())
+        bucket["agreed"] += agreed
+        return agreed
+
+    @staticmethod
+    def _same(field: str, rule_value, llm_value) -> bool:
+        if field == "search_term":
+            return normalize_query(rule_value or "") == normalize_query(llm_value or "")
+        return rule_value == llm_value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Taxa de concordância total e por campo em cada faixa de confiança"""
+        return {
+            f"{confidence:.1f}": {
+                "compared": bucket["compared"],
+                "agreement": round(bucket["agreed"] / bucket["compared"], 4),
+                **{field: round(bucket[field] / bucket["compared"], 4) for field in self.FIELDS},
+            }
+            for confidence, bucket in sorted(self._buckets.items())
+        }
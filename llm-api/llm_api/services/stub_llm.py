@@ -0,0 +1,54 @@
+"""
+Stub LLM - Provedor local sem rede para desenvolvimento, testes e benchmarks
+
+Imita a interface usada do ChatGoogleGenerativeAI: `with_structured_output`
+devolve um objeto com `ainvoke`/`astream`. Responde com o `RuleParser`
+depois de `latency_seconds`, com tokens estimados em `usage_metadata`
+(como o Gemini com include_raw). Selecionado com `LLM_PROVIDER=stub`.
+"""
+import asyncio
+import re
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage
+
+from llm_api.services.rule_parser import RuleParser
+
+# Query entre aspas na primeira linha do prompt (`QueryService._build_prompt`)
+_PROMPT_QUERY = re.compile(r'"(.*)"')
+
+OUTPUT_TOKENS = 40
+
+
+class StubChatModel:
+    """Substituto do chat model: só o que o QueryService usa"""
+
+    def __init__(self, model: str = "stub", latency_seconds: float = 0.0, parser: Optional[RuleParser] = None):
+        self.model = model
+        self.latency_seconds = latency_seconds
+        self._parser = parser or RuleParser()
+
+    def with_structured_output(self, schema: Any, include_raw: bool = False) -> "StubStructuredLLM":
+        return StubStructuredLLM(self, include_raw)
+
+
+class StubStructuredLLM:
+    def __init__(self, chat: StubChatModel, include_raw: bool):
+        self._chat = chat
+        self._include_raw = include_raw
+
+    async def ainvoke(self, prompt: str):
+        await asyncio.sleep(self._chat.latency_seconds)
+        match = _PROMPT_QUERY.search(prompt)
+        filtros, _ = self._chat._parser.parse(match.group(1) if match else prompt)
+        if not self._include_raw:
+            return filtros
+        raw = AIMessage(content="", usage_metadata={
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": OUTPUT_TOKENS,
+            "total_tokens": len(prompt) // 4 + OUTPUT_TOKENS,
+        })
+        return {"raw": raw, "parsed": filtros, "parsing_error": None}
+
+    async def astream(self, prompt: str):
+        yield await self.ainvoke(prompt)
@@ -0,0 +1,68 @@
+"""
+Timing por etapa do request (cache, llm, validation, persistence)
+
+As etapas são acumuladas em um ContextVar por request e publicadas pelo
+`ServerTimingMiddleware` no header `Server-Timing` e em uma linha de log.
+Fora de um request (ex.: testes unitários do service) as medições são ignoradas.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Optional
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> Token:
+    """Abre um novo registro de timings para o request atual"""
+    return _timings.set({})
+
+
+def end_request(token: Token) -> None:
+    """Restaura o contexto anterior ao request"""
+    _timings.reset(token)
+
+
+def record(stage: str, duration_ms: float) -> None:
+    """Soma a duração (ms) à etapa do request atual"""
+    timings = _timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + duration_ms
+
+
+def mark(event: str) -> None:
+    """Marca um evento sem duração (ex.: `fallback`) no Server-Timing"""
+    record(event, 0.0)
+
+
+# Prefixo da marca de quem respondeu o request (uma por resposta do /parse-query)
+TIER_PREFIX = "tier-"
+
+
+def mark_tier(tier: str) -> None:
+    """
+    Marca a camada que respondeu: `tier-l1`, `tier-sql`, `tier-negative`,
+    `tier-template`, `tier-rule`, `tier-llm` ou `tier-fallback`.
+    As etapas (`cache`, `llm`) são medidas sempre e não dizem quem respondeu.
+    """
+    mark(f"{TIER_PREFIX}{tier}")
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """Mede o bloco e registra como etapa do request atual"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, (time.perf_counter() - started) * 1000)
+
+
+def get_timings() -> Dict[str, float]:
+    """Cópia dos timings do request atual (vazio fora de um request)"""
+    return dict(_timings.get() or {})
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Formata os timings no padrão do header Server-Timing (`nome;dur=ms`)"""
+    return ", ".join(f"{stage};dur={duration:.2f}" for stage, duration in timings.items())
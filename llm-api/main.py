@@ -4,73 +4,183 @@ Arquitetura em camadas com Dependency Injection
 Inicializa pool de conexões PostgreSQL para QueryRepository
 """
 import os
+import json
 import logging
 import asyncpg
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
 from contextlib import asynccontextmanager
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 
 # Camadas
-from llm_api.repositories import QueryRepository
+from llm_api.repositories import DatabaseReconnector, FailoverQueryRepository
 from llm_api.repositories.schema import CREATE_QUERIES_TABLE
-from llm_api.services import QueryService
-from llm_api.controllers import QueryController, create_router
+from llm_api.services import (
+    QueryService, AdaptiveConcurrencyLimiter, ArtifactRefresher, CategoryClassifier, IdempotencyStore, ModelRouter,
+    ReparseScheduler, RuleParser, StubChatModel,
+)
+from llm_api.services.rule_parser import merge_lexicon
+from llm_api.controllers import QueryController, ServerTimingMiddleware, create_router
 from llm_api.schemas import FiltrosBusca
-
-# Setup logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from llm_api.cache import QueryCache, CacheWarmup, CacheAnalytics, TemplateCache
+from llm_api.logging_config import setup_logging_from_env
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
-if not os.getenv("GOOGLE_API_KEY"):
+# Setup logging (JSON, formatação em thread dedicada, amostragem por rota)
+setup_logging_from_env()
+logger = logging.getLogger(__name__)
+
+# "gemini" (padrão) ou "stub" (local, sem rede: respostas do RuleParser com latência simulada)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+
+if LLM_PROVIDER == "gemini" and not os.getenv("GOOGLE_API_KEY"):
     raise EnvironmentError("Variável de ambiente GOOGLE_API_KEY não definida.")
 
 # Variáveis globais
 db_pool = None
+# Pool da réplica de leitura (None = leituras no primário)
+db_read_pool = None
+# Repository compartilhado (PostgreSQL ou buffer in-memory) e loop de reconexão
+query_repository = None
+db_reconnector = None
 # Exposto para testes (permite patch("main.structured_llm"))
 structured_llm = None
+# Cache L1 compartilhado entre requests e warmup de startup
+query_cache = None
+cache_warmup = None
+# Re-parse em background de fallbacks e revalidação de cache stale (cancelados no shutdown)
+reparse_scheduler = None
+cache_revalidator = None
+# Retreino periódico do léxico/classificador locais (cancelado no shutdown)
+artifact_refresher = None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+def _optional_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def _chat_model(model_name: str, stub_latency_seconds: float = 0.0):
+    """Chat model do provedor configurado em LLM_PROVIDER"""
+    if LLM_PROVIDER == "stub":
+        return StubChatModel(model=model_name, latency_seconds=stub_latency_seconds)
+    return ChatGoogleGenerativeAI(model=model_name)
+
+
+def load_classifier(path: Optional[str]) -> Optional[CategoryClassifier]:
+    """Artefato do classificador local; sem arquivo (ou inválido) a regra segue só com o léxico"""
+    if not path:
+        return None
+    try:
+        classifier = CategoryClassifier.load(path)
+    except (OSError, ValueError) as e:
+        logger.warning("⚠️ Classificador local indisponível (%s): %s", path, e)
+        return None
+    logger.info(
+        "✓ Classificador local carregado: %s exemplos, treinado em %s",
+        classifier.metadata.get("examples"), classifier.metadata.get("trained_at"),
+    )
+    return classifier
+
+
+async def connect_db() -> Tuple[asyncpg.Pool, Optional[asyncpg.Pool]]:
     """
-    Gerencia o ciclo de vida da aplicação:
-    - Cria pool de conexões ao iniciar
-    - Cria schema do banco se necessário
-    - Fecha pool ao desligar
+    Abre os pools e garante o schema (usado no startup e na reconexão).
+
+    Primário: DB_WRITE_DSN, ou DB_HOST/DB_PORT/... se não definido.
+    Réplica: DB_READ_DSN (opcional); se não conectar, as leituras ficam no primário.
     """
-    global db_pool
-    
-    # STARTUP
-    logger.info("📦 Inicializando pool de conexões PostgreSQL...")
-    db_config = {
+    write_dsn = os.getenv("DB_WRITE_DSN")
+    db_config = {} if write_dsn else {
         "host": os.getenv("DB_HOST", "db"),
         "port": int(os.getenv("DB_PORT", 5432)),
         "database": os.getenv("DB_NAME", "ong_db"),
         "user": os.getenv("DB_USER", "user"),
         "password": os.getenv("DB_PASSWORD", "password"),
     }
-    
+    pool = await asyncpg.create_pool(
+        dsn=write_dsn, **db_config, min_size=1, max_size=int(os.getenv("DB_WRITE_POOL_MAX", 10))
+    )
     try:
-        db_pool = await asyncpg.create_pool(**db_config, min_size=1, max_size=10)
-        logger.info("✅ Pool de conexões criado")
-        
-        # Cria schema se necessário
-        async with db_pool.acquire() as conn:
+        async with pool.acquire() as conn:
             await conn.execute(CREATE_QUERIES_TABLE)
-        logger.info("✅ Schema do banco verificado/criado")
+    except Exception:
+        await pool.close()
+        raise
+
+    read_pool = None
+    read_dsn = os.getenv("DB_READ_DSN")
+    if read_dsn:
+        try:
+            read_pool = await asyncpg.create_pool(
+                dsn=read_dsn, min_size=1, max_size=int(os.getenv("DB_READ_POOL_MAX", 10))
+            )
+            logger.info("✅ Pool da réplica de leitura criado")
+        except Exception as e:
+            logger.warning("⚠️ Réplica de leitura indisponível, leituras no primário: %s", e)
+    return pool, read_pool
+
+
+def on_db_connected(
+    pool: asyncpg.Pool, read_pool: Optional[asyncpg.Pool] = None, at_startup: bool = False
+) -> None:
+    """Pools disponíveis (startup ou reconexão): publica e dispara o warmup"""
+    global db_pool, db_read_pool
+    db_pool = pool
+    db_read_pool = read_pool
+    # Warmup do cache em background, só na primeira conexão. No startup segura a
+    # readiness em /health; numa reconexão a app já atende e continua pronta
+    if (
+        cache_warmup is not None
+        and cache_warmup.state == "idle"
+        and os.getenv("CACHE_WARMUP_ENABLED", "true").lower() == "true"
+    ):
+        cache_warmup.start(query_repository, block_readiness=at_startup)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Gerencia o ciclo de vida da aplicação:
+    - Cria pool de conexões ao iniciar (ou reconecta em background)
+    - Cria schema do banco se necessário
+    - Fecha pool ao desligar
+    """
+    # STARTUP
+    logger.info("📦 Inicializando pool de conexões PostgreSQL...")
+    try:
+        pool, read_pool = await connect_db()
+        logger.info("✅ Pool de conexões criado e schema verificado/criado")
+        query_repository.attach_pool(
+            pool, read_pool, max_replica_lag_seconds=db_reconnector.max_replica_lag_seconds
+        )
+        on_db_connected(pool, read_pool, at_startup=True)
     except Exception as e:
-        logger.warning(f"⚠️ Falha ao conectar ao PostgreSQL: {e}")
-        logger.info("⚙️ Usando modo in-memory para testes (sem persistência)")
-        db_pool = None
+        logger.warning("⚠️ Falha ao conectar ao PostgreSQL: %s", e)
+        logger.info("⚙️ Buffer in-memory até o PostgreSQL voltar (reconexão em background)")
+        db_reconnector.start()
+    if artifact_refresher is not None:
+        artifact_refresher.start()
     
     yield  # Aplicação roda aqui
     
     # SHUTDOWN
     logger.info("🛑 Aplicação finalizada")
+    if db_reconnector is not None:
+        await db_reconnector.stop()
+    if cache_warmup is not None:
+        await cache_warmup.stop()
+    if reparse_scheduler is not None:
+        await reparse_scheduler.stop()
+    if cache_revalidator is not None:
+        await cache_revalidator.stop()
+    if artifact_refresher is not None:
+        await artifact_refresher.stop()
+    if db_read_pool:
+        await db_read_pool.close()
     if db_pool:
         await db_pool.close()
         logger.info("✅ Pool de conexões fechado")
@@ -90,18 +200,131 @@ def create_app() -> FastAPI:
     # ========== SETUP DEPENDÊNCIAS ==========
 
     # 1. LLM Model (Dependency)
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash-lite")
+    llm_model_name = os.getenv("LLM_MODEL", "gemini-2.5-flash-lite")
+    llm = _chat_model(llm_model_name, float(os.getenv("STUB_LLM_LATENCY_SECONDS", 0)))
     logger.info("✓ LLM Model inicializado")
     global structured_llm
-    structured_llm = llm.with_structured_output(FiltrosBusca)
+    # include_raw: a resposta traz usage_metadata (tokens gravados por query)
+    structured_llm = llm.with_structured_output(FiltrosBusca, include_raw=True)
+
+    # Tiers por complexidade da query (LLM_TIERS vazio = só o modelo acima)
+    llm_tiers = os.getenv("LLM_TIERS")
+    model_router = ModelRouter.from_config(
+        json.loads(llm_tiers),
+        lambda tier: _chat_model(tier["model"], tier.get("stub_latency_seconds", 0.0)).with_structured_output(
+            FiltrosBusca, include_raw=True
+        ),
+    ) if llm_tiers else None
+
+    # 2. Cache L1 + warmup (Dependency)
+    global query_cache, cache_warmup
+    query_cache = QueryCache(
+        max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 1000)),
+        ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", 24 * 3600)),
+    )
+    cache_warmup = CacheWarmup(
+        query_cache,
+        top_n=int(os.getenv("CACHE_WARMUP_TOP_N", 200)),
+        window_hours=int(os.getenv("CACHE_WARMUP_WINDOW_HOURS", 24)),
+        budget_seconds=float(os.getenv("CACHE_WARMUP_BUDGET_SECONDS", 5)),
+        include_search_metrics=os.getenv("CACHE_WARMUP_USE_SEARCH_METRICS", "false").lower() == "true",
+        soft_ttl_seconds=float(os.getenv("CACHE_SOFT_TTL_SECONDS", 24 * 3600)),
+    )
+
+    template_cache = TemplateCache(
+        max_entries=int(os.getenv("TEMPLATE_CACHE_MAX_ENTRIES", 1000)),
+        ttl_seconds=float(os.getenv("TEMPLATE_CACHE_TTL_SECONDS", 24 * 3600)),
+    )
+    cache_analytics = CacheAnalytics(
+        window_seconds=float(os.getenv("CACHE_ANALYTICS_WINDOW_SECONDS", 300)),
+        top_k_capacity=int(os.getenv("CACHE_ANALYTICS_TOP_K_CAPACITY", 200)),
+        max_tenants=int(os.getenv("CACHE_ANALYTICS_MAX_TENANTS", 1000)),
+    )
+
+    # Falhas do LLM: cache negativo de TTL curto + re-parse em background
+    global reparse_scheduler
+    negative_cache = QueryCache(
+        max_entries=int(os.getenv("NEGATIVE_CACHE_MAX_ENTRIES", 1000)),
+        ttl_seconds=float(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", 30)),
+    )
+    reparse_scheduler = ReparseScheduler(
+        delay_seconds=float(os.getenv("REPARSE_DELAY_SECONDS", 30)),
+        max_attempts=int(os.getenv("REPARSE_MAX_ATTEMPTS", 3)),
+        max_pending=int(os.getenv("REPARSE_MAX_PENDING", 100)),
+    )
+
+    # Stale-while-revalidate do cache SQL: uma revalidação imediata por query
+    global cache_revalidator
+    cache_revalidator = ReparseScheduler(
+        delay_seconds=0,
+        max_attempts=1,
+        max_pending=int(os.getenv("CACHE_REVALIDATE_MAX_PENDING", 50)),
+    )
+
+    # Idempotency-Key do /parse-query: retries do backend não reprocessam
+    idempotency_store = IdempotencyStore(
+        max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000)),
+        ttl_seconds=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600)),
+    )
+
+    # Regra local em paralelo com o LLM (responde sozinha acima do limiar de confiança),
+    # com o classificador treinado no histórico (benchmarks/train_classifier.py) como prior
+    # O artefato gravado pelo retreino também traz o léxico aprendido
+    rule_parser = None
+    if os.getenv("SPECULATIVE_RULES_ENABLED", "false").lower() == "true":
+        classifier = load_classifier(os.getenv("CATEGORY_CLASSIFIER_PATH"))
+        rule_parser = RuleParser(
+            merge_lexicon(classifier.metadata.get("lexicon", {})) if classifier is not None else None,
+            classifier=classifier,
+            classifier_threshold=float(os.getenv("CATEGORY_CLASSIFIER_THRESHOLD", 0.9)),
+        )
+
+    # 3. Limiter adaptativo de chamadas ao LLM (compartilhado entre requests)
+    llm_limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=int(os.getenv("LLM_CONCURRENCY_INITIAL", 10)),
+        min_limit=int(os.getenv("LLM_CONCURRENCY_MIN", 1)),
+        max_limit=int(os.getenv("LLM_CONCURRENCY_MAX", 50)),
+        max_queue=int(os.getenv("LLM_QUEUE_MAX", 100)),
+        queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", 1.5)),
+        latency_target=float(os.getenv("LLM_LATENCY_TARGET_SECONDS", 1.0)),
+    )
+
+    # 4. Repository (Dependency) - único, recebe o pool quando o banco conectar
+    # (controller é criado agora, antes do lifespan; a troca acontece dentro dele)
+    global query_repository, db_reconnector
+    query_repository = FailoverQueryRepository(
+        buffer_max_entries=int(os.getenv("DB_BUFFER_MAX_ENTRIES", 10000)),
+    )
+    db_reconnector = DatabaseReconnector(
+        query_repository,
+        connect=connect_db,
+        on_connected=on_db_connected,
+        initial_delay=float(os.getenv("DB_RECONNECT_INITIAL_DELAY_SECONDS", 1)),
+        max_delay=float(os.getenv("DB_RECONNECT_MAX_DELAY_SECONDS", 60)),
+        max_replica_lag_seconds=_optional_float("DB_REPLICA_MAX_LAG_SECONDS"),
+    )
+
+    # Retreino da regra com o histórico recente, validado e trocado a quente
+    # (só com a regra ligada); a versão aceita é gravada em CATEGORY_CLASSIFIER_PATH
+    global artifact_refresher
+    if rule_parser is not None and os.getenv("ARTIFACT_REFRESH_ENABLED", "false").lower() == "true":
+        artifact_refresher = ArtifactRefresher(
+            query_repository,
+            initial=rule_parser,
+            interval_seconds=float(os.getenv("ARTIFACT_REFRESH_INTERVAL_SECONDS", 24 * 3600)),
+            window_hours=int(os.getenv("ARTIFACT_REFRESH_WINDOW_HOURS", 30 * 24)),
+            min_examples=int(os.getenv("ARTIFACT_REFRESH_MIN_EXAMPLES", 500)),
+            confidence_threshold=float(os.getenv("SPECULATIVE_CONFIDENCE_THRESHOLD", 0.85)),
+            min_precision=float(os.getenv("ARTIFACT_MIN_PRECISION", 0.9)),
+            max_regression=float(os.getenv("ARTIFACT_MAX_REGRESSION", 0.02)),
+            artifact_path=os.getenv("CATEGORY_CLASSIFIER_PATH") or None,
+        )
 
-    # 2. Repository (Dependency) - Será recriado com pool na startup
-    # Usar um placeholder que será substituído
     def get_repository():
-        """Factory para obter repository com pool atual (ou in-memory em testes)"""
-        return QueryRepository(db_pool=db_pool)
+        """Factory para obter o repository compartilhado (PostgreSQL ou buffer in-memory)"""
+        return query_repository
     
-    # 3. Service (Dependency)
+    # 5. Service (Dependency)
     def get_service():
         repository = get_repository()
         # Provider aponta para variável de módulo para permitir patch dinâmico nos testes
@@ -109,18 +332,38 @@ def create_app() -> FastAPI:
             llm_model=llm,
             repository=repository,
             structured_llm_provider=lambda: structured_llm,
+            cache=query_cache,
+            limiter=llm_limiter,
+            analytics=cache_analytics,
+            negative_cache=negative_cache,
+            reparse=reparse_scheduler,
+            revalidator=cache_revalidator,
+            soft_ttl_seconds=float(os.getenv("CACHE_SOFT_TTL_SECONDS", 24 * 3600)),
+            hard_ttl_seconds=float(os.getenv("CACHE_HARD_TTL_SECONDS", 72 * 3600)),
+            template_cache=template_cache,
+            model_name=llm_model_name,
+            idempotency=idempotency_store,
+            rule_parser=rule_parser,
+            speculation_threshold=float(os.getenv("SPECULATIVE_CONFIDENCE_THRESHOLD", 0.85)),
+            speculation_cancel_llm=os.getenv("SPECULATIVE_CANCEL_LLM", "false").lower() == "true",
+            llm_deadline_seconds=_optional_float("LLM_DEADLINE_SECONDS"),
+            model_router=model_router,
+            artifacts=artifact_refresher,
         )
     
-    # 4. Controller (Dependency)
+    # 6. Controller (Dependency)
     def get_controller():
         service = get_service()
         return QueryController(service=service)
 
+    # Server-Timing por etapa (cache, llm, validation, persistence)
+    app.add_middleware(ServerTimingMiddleware)
+
     # ========== REGISTRAR ROTAS (imediato para suportar testes sem DB) ==========
     controller = get_controller()
-    router = create_router(controller)
+    router = create_router(controller, admin_token=os.getenv("ADMIN_TOKEN") or None)
     app.include_router(router)
-    logger.info("✓ Rotas registradas (in-memory quando DB indisponível)")
+    logger.info("✓ Rotas registradas (buffer in-memory enquanto o DB estiver indisponível)")
 
     return app
 
@@ -129,6 +372,13 @@ def create_app() -> FastAPI:
 app = create_app()
 
 # Health root (compatível com testes que usam /health sem prefixo)
+# Readiness: 503 enquanto o warmup do cache estiver em execução
 @app.get("/health")
-async def root_health():
+async def root_health(response: Response):
+    if cache_warmup is not None and not cache_warmup.is_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "warming_up", "warmup": cache_warmup.status()}
+    if db_reconnector is not None and db_reconnector.state in ("reconnecting", "flushing"):
+        # Continua atendendo (buffer in-memory), mas sinaliza a degradação
+        return {"status": "degraded", "database": db_reconnector.status()}
     return {"status": "ok"}
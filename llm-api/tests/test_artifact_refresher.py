@@ -0,0 +1,270 @@
+"""
+Testes do retreino periódico e da troca a quente dos artefatos locais
+"""
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llm_api.controllers import QueryController, create_router
+from llm_api.repositories import QueryRepository
+from llm_api.services import ArtifactRefresher, CategoryClassifier, QueryService, RuleParser
+from llm_api.services.rule_parser import learn_lexicon, merge_lexicon
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+PRODUCTS = {
+    "Roupas": ["camiseta", "calça jeans", "jaqueta", "vestido", "meias", "bermuda"],
+    "Brinquedos": ["boneca", "carrinho", "quebra cabeça", "pelúcia", "patinete", "pião"],
+}
+PRICES = ["", " até 30", " até 50", " a partir de 20", " até 80"]
+
+
+def _history(noisy: bool = False):
+    """Histórico rotulado pelo LLM; `noisy` alterna a categoria ao acaso (LLM inconsistente)"""
+    rows = []
+    for round_ in range(4):
+        for category, products in PRODUCTS.items():
+            for i, product in enumerate(products):
+                for j, price in enumerate(PRICES):
+                    text = f"{product} modelo{round_}{j}{price}"
+                    label = category
+                    if noisy and (i + j + round_) % 2:
+                        label = "Roupas" if category == "Brinquedos" else "Brinquedos"
+                    filters = {"search_term": text, "category": label}
+                    if "até" in price:
+                        filters["price_max"] = float(price.split()[-1])
+                    elif price:
+                        filters["price_min"] = float(price.split()[-1])
+                    rows.append((text, filters))
+    return rows
+
+
+async def _repository(rows) -> QueryRepository:
+    repo = QueryRepository()
+    for text, filters in rows:
+        await repo.save_query(text, filters, provenance={"source": "llm"})
+    return repo
+
+
+def _refresher(repo, **kwargs) -> ArtifactRefresher:
+    kwargs.setdefault("min_examples", 50)
+    return ArtifactRefresher(repo, initial=RuleParser(), **kwargs)
+
+
+class TestLearnedLexicon:
+    """Léxico aprendido do histórico"""
+
+    @pytest.mark.unit
+    def test_frequent_pure_terms_only(self):
+        """Termo raro ou dividido entre categorias não entra"""
+        rows = (
+            [("camiseta", {"category": "Roupas"})] * 5
+            + [("kit camiseta", {"category": "Roupas"})]
+            + [("kit boneca", {"category": "Brinquedos"})] * 5
+            + [("raro", {"category": "Roupas"})]
+        )
+
+        lexicon = learn_lexicon(rows, min_count=5)
+
+        assert lexicon == {"Brinquedos": ("boneca",), "Roupas": ("camiseta",)}
+
+    @pytest.mark.unit
+    def test_merge_keeps_base(self):
+        """Termo que o léxico base já tem não muda de categoria"""
+        merged = merge_lexicon({"Bebidas": ("brownie", "mate")})
+
+        assert "brownie" not in merged["Bebidas"]
+        assert "mate" in merged["Bebidas"]
+        assert "brownie" in merged["Doces"]
+
+
+class TestArtifactRefresher:
+    """Ciclo de retreino, validação, troca e rollback"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_swaps_validated_candidate_into_running_service(self):
+        """Candidato melhor entra sem recriar o service; a versão antiga fica para rollback"""
+        refresher = _refresher(await _repository(_history()))
+
+        async def slow_llm(_prompt):
+            await asyncio.sleep(1)
+
+        structured = MagicMock(ainvoke=AsyncMock(side_effect=slow_llm))
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+            rule_parser=RuleParser(),
+            speculation_cancel_llm=True,
+            artifacts=refresher,
+        )
+
+        status = await refresher.refresh()
+        filtros, _ = await asyncio.wait_for(
+            service.parse_and_save_query(QueryInput(query="pelúcia até 40")), timeout=0.5
+        )
+
+        assert status["state"] == "swapped"
+        assert status["current"]["version"] == 2
+        validation = status["current"]["validation"]
+        assert validation["candidate"]["precision"] >= 0.9
+        assert validation["candidate"]["coverage"] > validation["current"]["coverage"]
+        assert filtros == FiltrosBusca(search_term="pelúcia", category="Brinquedos", price_max=40.0)
+        assert service.get_metrics()["artifacts"]["previous"]["version"] == 1
+
+        assert await refresher.rollback()
+        assert refresher.current.version == 1
+        assert RuleParser().parse("pelúcia até 40") == service._current_rule_parser().parse("pelúcia até 40")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_rejects_candidate_below_precision(self):
+        """LLM inconsistente no histórico: candidato rejeitado, versão atual mantida"""
+        refresher = _refresher(await _repository(_history(noisy=True)))
+        initial = refresher.rule_parser
+
+        status = await refresher.refresh()
+
+        assert status["state"] == "rejected"
+        assert status["last_candidate"]["validation"]["candidate"]["precision"] < 0.9
+        assert status["last_candidate"]["version"] is None
+        assert refresher.rule_parser is initial
+        assert not await refresher.rollback()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_skips_without_enough_examples(self):
+        refresher = _refresher(await _repository(_history()[:10]))
+
+        assert (await refresher.refresh())["state"] == "skipped"
+        assert refresher.current.version == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_categories_outside_catalog_are_dropped(self):
+        """Só categorias da tabela categories são aprendidas (e os nomes viram termos)"""
+        repo = await _repository(_history())
+        repo.get_categories = AsyncMock(return_value=["Roupas"])
+        refresher = _refresher(repo)
+
+        await refresher.refresh()
+
+        classifier = refresher.rule_parser.classifier
+        assert classifier.categories == ["Roupas"]
+        assert "Brinquedos" not in classifier.metadata["lexicon"]
+        assert "roupas" in classifier.metadata["lexicon"]["Roupas"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_accepted_version_is_persisted_for_restart(self, tmp_path):
+        """Artefato gravado traz classificador e léxico aprendido"""
+        path = str(tmp_path / "classifier.json.gz")
+        refresher = _refresher(await _repository(_history()), artifact_path=path)
+
+        await refresher.refresh()
+        loaded = CategoryClassifier.load(path)
+        parser = RuleParser(merge_lexicon(loaded.metadata["lexicon"]), classifier=loaded)
+
+        assert parser.parse("pelúcia até 40") == refresher.rule_parser.parse("pelúcia até 40")
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_save_runs_off_the_event_loop(self, tmp_path):
+        """Gravar o artefato (gzip/JSON) não bloqueia o event loop"""
+        refresher = _refresher(await _repository(_history()), artifact_path=str(tmp_path / "c.json.gz"))
+        threads = []
+        save = CategoryClassifier.save
+
+        def recording_save(classifier, path):
+            threads.append(threading.get_ident())
+            save(classifier, path)
+
+        with patch.object(CategoryClassifier, "save", recording_save):
+            await refresher.refresh()
+
+        assert refresher.state == "swapped"
+        assert threads and threads[0] != threading.get_ident()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_rollback_to_startup_without_artifact_is_durable(self, tmp_path):
+        """Rollback para a versão sem classificador: o restart não recarrega a versão descartada"""
+        path = tmp_path / "classifier.json.gz"
+        refresher = _refresher(await _repository(_history()), artifact_path=str(path))
+
+        await refresher.refresh()
+        assert path.exists()
+        assert await refresher.rollback()
+
+        assert not path.exists()
+        assert (tmp_path / "classifier.json.gz.rolled_back").exists()
+        with pytest.raises(OSError):
+            CategoryClassifier.load(str(path))
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_read_failure_keeps_current(self):
+        repo = QueryRepository()
+        repo.get_training_examples = AsyncMock(side_effect=RuntimeError("banco fora"))
+        refresher = _refresher(repo)
+
+        status = await refresher.refresh()
+
+        assert status["state"] == "failed"
+        assert status["last_error"] == "banco fora"
+        assert status["current"]["version"] == 1
+
+
+class TestArtifactEndpoints:
+    """GET/POST /api/v1/admin/artifacts"""
+
+    def _client(self, refresher=None, admin_token="segredo") -> TestClient:
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: None,
+            rule_parser=RuleParser(),
+            artifacts=refresher,
+        )
+        app = FastAPI()
+        app.include_router(create_router(QueryController(service=service), admin_token=admin_token))
+        return TestClient(app, headers={"X-Admin-Token": "segredo"})
+
+    @pytest.mark.unit
+    def test_disabled_returns_404(self):
+        client = self._client()
+
+        assert client.get("/api/v1/admin/artifacts").status_code == 404
+        assert client.post("/api/v1/admin/artifacts/refresh").status_code == 404
+        assert client.post("/api/v1/admin/artifacts/rollback").status_code == 404
+
+    @pytest.mark.unit
+    def test_requires_admin_token(self):
+        """Sem ADMIN_TOKEN as rotas admin não existem; com ele, token errado é 401"""
+        repo = asyncio.run(_repository(_history()))
+        client = self._client(_refresher(repo))
+        disabled = self._client(_refresher(repo), admin_token=None)
+
+        assert client.post("/api/v1/admin/artifacts/refresh", headers={"X-Admin-Token": "x"}).status_code == 401
+        assert client.get("/api/v1/admin/cache", headers={"X-Admin-Token": ""}).status_code == 401
+        assert disabled.post("/api/v1/admin/artifacts/refresh").status_code == 404
+        assert disabled.get("/api/v1/admin/cache").status_code == 404
+        assert client.get("/api/v1/admin/artifacts").json()["data"]["state"] == "idle"
+
+    @pytest.mark.unit
+    def test_refresh_then_rollback(self):
+        repo = asyncio.run(_repository(_history()))
+        client = self._client(_refresher(repo))
+
+        assert client.post("/api/v1/admin/artifacts/rollback").status_code == 409
+        refreshed = client.post("/api/v1/admin/artifacts/refresh").json()["data"]
+        rolled_back = client.post("/api/v1/admin/artifacts/rollback").json()["data"]
+
+        assert refreshed["current"]["version"] == 2
+        assert rolled_back["current"]["version"] == 1
+        assert rolled_back["previous"]["version"] == 2
+        assert client.get("/api/v1/admin/artifacts").json()["data"]["current"]["version"] == 1
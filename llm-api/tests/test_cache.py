@@ -0,0 +1,165 @@
+"""
+Testes unitários para o cache L1 e o warmup de startup
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.cache import QueryCache, CacheWarmup
+from llm_api.repositories import QueryRepository, MockQueryRepository, IQueryRepository
+from llm_api.services import QueryService
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+
+class FakeClock:
+    """Relógio controlável para testar expiração"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestQueryCache:
+    """Testes do cache LRU + TTL"""
+
+    @pytest.mark.unit
+    def test_get_uses_normalized_key(self):
+        """Variações de caixa/espaço devem bater na mesma entrada"""
+        cache = QueryCache()
+        cache.set("Doces  até 50", {"id": "a", "filters": {"category": "Doces"}})
+
+        assert cache.get("doces até 50")["id"] == "a"
+        assert cache.hits == 1
+
+    @pytest.mark.unit
+    def test_entry_expires_after_ttl(self):
+        """Entrada expirada deve ser tratada como miss e removida"""
+        clock = FakeClock()
+        cache = QueryCache(ttl_seconds=10, clock=clock)
+        cache.set("doces", {"id": "a", "filters": {}})
+
+        clock.now = 11
+        assert cache.get("doces") is None
+        assert len(cache) == 0
+        assert cache.misses == 1
+
+    @pytest.mark.unit
+    def test_evicts_least_recently_used(self):
+        """Deve remover a entrada menos usada ao exceder a capacidade"""
+        cache = QueryCache(max_entries=2)
+        cache.set("a", {"id": "a", "filters": {}})
+        cache.set("b", {"id": "b", "filters": {}})
+        cache.get("a")
+        cache.set("c", {"id": "c", "filters": {}})
+
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+
+class TestQueryServiceWithCache:
+    """Integração do cache L1 com o QueryService"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_l1_hit_skips_repository_and_llm(self):
+        """Hit no L1 não deve consultar o banco nem o LLM"""
+        cache = QueryCache()
+        cache.set("doces até 50", {"id": "q-1", "filters": {"category": "Doces", "price_max": 50.0}})
+        mock_repo = AsyncMock(spec=IQueryRepository)
+        structured = AsyncMock()
+
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=mock_repo,
+            structured_llm_provider=lambda: structured,
+            cache=cache,
+        )
+        filtros, query_id = await service.parse_and_save_query(QueryInput(query="Doces até 50"))
+
+        assert query_id == "q-1"
+        assert filtros.category == "Doces"
+        mock_repo.find_cached_query.assert_not_called()
+        structured.ainvoke.assert_not_called()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_llm_result_populates_l1(self):
+        """Resultado do LLM deve ser guardado no L1"""
+        cache = QueryCache()
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Bebidas")))
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+            cache=cache,
+        )
+
+        _, query_id = await service.parse_and_save_query(QueryInput(query="bebidas"))
+
+        assert cache.get("bebidas") == {"id": query_id, "filters": FiltrosBusca(category="Bebidas").model_dump()}
+
+
+class TestCacheWarmup:
+    """Testes do warmup de startup"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_warmup_preloads_top_queries(self):
+        """Deve carregar as queries mais frequentes no cache"""
+        repo = QueryRepository()
+        for text in ["doces até 50", "Doces até 50", "bebidas"]:
+            await repo.save_query(text, {"search_term": text})
+
+        cache = QueryCache()
+        warmup = CacheWarmup(cache, top_n=1)
+        await warmup.run(repo)
+
+        assert warmup.state == "completed"
+        assert warmup.loaded == 1
+        assert "doces até 50" in cache
+        assert "bebidas" not in cache
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_warmup_respects_time_budget(self):
+        """Warmup lento deve ser interrompido pelo orçamento de tempo"""
+
+        async def slow_top_queries(**kwargs):
+            await asyncio.sleep(1)
+            return []
+
+        repo = MockQueryRepository()
+        repo.get_top_queries = slow_top_queries
+        warmup = CacheWarmup(QueryCache(), budget_seconds=0.01)
+
+        await warmup.run(repo)
+
+        assert warmup.state == "timeout"
+        assert warmup.is_ready
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_not_ready_while_running(self):
+        """Readiness deve ser falsa enquanto o warmup roda"""
+        warmup = CacheWarmup(QueryCache())
+        task = warmup.start(MockQueryRepository())
+
+        assert warmup.is_ready is False
+        await task
+        assert warmup.is_ready is True
+        assert warmup.status()["loaded"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_background_warmup_keeps_readiness(self):
+        """Warmup após reconexão (app já atendendo) não derruba a readiness"""
+        warmup = CacheWarmup(QueryCache())
+        task = warmup.start(MockQueryRepository(), block_readiness=False)
+
+        assert warmup.state == "running"
+        assert warmup.is_ready is True
+        await task
+        assert warmup.state == "completed"
@@ -0,0 +1,142 @@
+"""
+Testes unitários para o analytics do cache (janela deslizante + top-K)
+"""
+import random
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llm_api.cache import CacheAnalytics, QueryCache, SpaceSaving
+from llm_api.cache.analytics import RollingCounter
+from llm_api.controllers import QueryController, create_router
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService
+from llm_api.schemas import FiltrosBusca
+
+
+class FakeClock:
+    """Relógio controlável para testar a janela"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSpaceSaving:
+    """Testes do sketch de heavy hitters"""
+
+    @pytest.mark.unit
+    def test_keeps_heavy_hitters_with_bounded_memory(self):
+        """Chaves frequentes devem sobreviver a uma cauda longa de chaves raras"""
+        rng = random.Random(1)
+        sketch = SpaceSaving(capacity=20)
+        for i in range(5000):
+            sketch.add("doces" if i % 3 == 0 else "bebidas" if i % 5 == 0 else f"rara-{rng.random()}")
+
+        top = sketch.top(2)
+        assert [item["query"] for item in top] == ["doces", "bebidas"]
+        assert top[0]["count"] - top[0]["error"] <= 1667 <= top[0]["count"]
+        assert len(sketch) == 20
+
+    @pytest.mark.unit
+    def test_new_key_inherits_min_count_as_error(self):
+        """Substituição deve herdar a menor contagem como erro"""
+        sketch = SpaceSaving(capacity=2)
+        sketch.add("a", 3)
+        sketch.add("b", 1)
+        sketch.add("c")
+
+        assert sketch.top(2) == [
+            {"query": "a", "count": 3, "error": 0},
+            {"query": "c", "count": 2, "error": 1},
+        ]
+
+
+class TestRollingCounter:
+    """Testes da janela deslizante"""
+
+    @pytest.mark.unit
+    def test_old_buckets_leave_the_window(self):
+        """Eventos mais antigos que a janela não devem ser somados"""
+        clock = FakeClock()
+        counter = RollingCounter(window_seconds=60, buckets=6, clock=clock)
+        counter.add("l1")
+        clock.now = 30
+        counter.add("miss")
+
+        assert counter.totals() == {"l1": 1, "miss": 1}
+        clock.now = 65
+        assert counter.totals() == {"miss": 1}
+
+
+class TestTenantUsage:
+    """Uso por tenant com memória limitada"""
+
+    @pytest.mark.unit
+    def test_least_recent_tenant_is_evicted(self):
+        """organization_id arbitrário não cresce o dict sem limite"""
+        analytics = CacheAnalytics(max_tenants=2)
+
+        analytics.record("doces", "miss", tenant=1)
+        analytics.record("doces", "miss", tenant=2)
+        analytics.record("doces", "l1", tenant=1)
+        analytics.record("doces", "miss", tenant=3)
+
+        snapshot = analytics.snapshot()
+        assert set(snapshot["tenants"]) == {"1", "3"}
+        assert snapshot["tenants"]["1"]["requests"] == 2
+        assert snapshot["totals"]["tenants_evicted"] == 1
+        assert snapshot["totals"]["requests"] == 4
+
+
+class TestCacheAnalyticsEndpoint:
+    """Integração com QueryService e GET /api/v1/admin/cache"""
+
+    @pytest.mark.unit
+    def test_reports_tiers_savings_and_top_queries(self):
+        """Deve separar hits de L1 e SQL e listar as queries normalizadas"""
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Doces")))
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+            cache=QueryCache(),
+            analytics=CacheAnalytics(),
+        )
+        app = FastAPI()
+        app.include_router(create_router(QueryController(service=service), admin_token="segredo"))
+        client = TestClient(app)
+
+        for query in ("Doces", "doces", "doces ", "bebidas"):
+            client.post("/api/v1/parse-query", json={"query": query})
+        data = client.get("/api/v1/admin/cache?top_k=1", headers={"X-Admin-Token": "segredo"}).json()["data"]
+
+        assert data["totals"]["misses"] == 2
+        assert data["totals"]["l1_hits"] == 2
+        assert data["totals"]["llm_calls_saved"] == 2
+        assert data["totals"]["tokens_saved_estimate"] > 0
+        assert data["window"]["tiers"]["l1"] == {"lookups": 4, "hits": 2, "hit_rate": 0.5}
+        assert data["top_queries"] == [{"query": "doces", "count": 3, "error": 0}]
+        assert data["l1"]["entries"] == 2
+
+    @pytest.mark.unit
+    def test_requires_admin_token(self):
+        """Sem ADMIN_TOKEN a rota não existe; com ele, token ausente ou errado é 401"""
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: None,
+            analytics=CacheAnalytics(),
+        )
+        disabled, protected = FastAPI(), FastAPI()
+        disabled.include_router(create_router(QueryController(service=service)))
+        protected.include_router(create_router(QueryController(service=service), admin_token="segredo"))
+
+        assert TestClient(disabled).get("/api/v1/admin/cache").status_code == 404
+        assert TestClient(protected).get("/api/v1/admin/cache").status_code == 401
+        assert TestClient(protected).get(
+            "/api/v1/admin/cache", headers={"X-Admin-Token": "outro"}
+        ).status_code == 401
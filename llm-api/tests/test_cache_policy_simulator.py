@@ -0,0 +1,145 @@
+"""
+Testes do simulador offline de políticas de cache (benchmarks/simulate_cache_policy.py)
+
+Traces pequenos montados à mão, com os hits de cada política contados no
+comentário, e o LRU conferido contra um `QueryCache` real.
+"""
+import json
+import random
+import sys
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from llm_api.cache import QueryCache
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "benchmarks"))
+
+simulator = pytest.importorskip("simulate_cache_policy")
+
+INF = float("inf")
+
+
+def _trace(ids, times=None):
+    return array("I", ids), array("d", times if times is not None else range(len(ids)))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _query_cache_hits(ids, times, size, ttl) -> int:
+    """Referência: o mesmo trace num QueryCache de verdade (get; em miss, set)"""
+    clock = FakeClock()
+    cache = QueryCache(max_entries=size, ttl_seconds=ttl, normalizer=lambda text: text, clock=clock)
+    hits = 0
+    for key, now in zip(ids, times):
+        clock.now = now
+        if cache.get(str(key)) is not None:
+            hits += 1
+        else:
+            cache.set(str(key), {"id": str(key), "filters": {}})
+    return hits
+
+
+class TestLru:
+    """LRU + TTL em uma passada para todas as capacidades"""
+
+    @pytest.mark.unit
+    def test_hits_per_capacity(self):
+        # capacidade 2: o ciclo 0,1,2 sempre expulsa a próxima chave -> 0 hits
+        # capacidade 3: 0 e 1 batem duas vezes cada (3 entra no lugar de 2) -> 4 hits
+        ids, times = _trace([0, 1, 2, 0, 1, 3, 0, 1, 2])
+
+        assert simulator.simulate_lru(ids, times, [2, 3], INF) == [0, 4]
+
+    @pytest.mark.unit
+    def test_ttl_counts_from_insertion(self):
+        # TTL 3.5: 0@3 e 1@4 batem (idade 3); em 6 e 7 já passaram de 3.5 -> 2 hits
+        # TTL 2.5: tudo expira antes de voltar -> 0 hits
+        ids, times = _trace([0, 1, 2, 0, 1, 3, 0, 1, 2])
+
+        assert simulator.simulate_lru(ids, times, [3], 3.5) == [2]
+        assert simulator.simulate_lru(ids, times, [3], 2.5) == [0]
+
+    @pytest.mark.unit
+    def test_matches_query_cache(self):
+        """Uma passada (distância de pilha) = QueryCache por capacidade, com e sem TTL"""
+        rng = random.Random(5)
+        ids = [min(int(rng.paretovariate(1.2)), 60) for _ in range(3000)]
+        times = [i * 0.5 for i in range(len(ids))]
+        sizes = [4, 10, 25, 50]
+        trace = _trace(ids, times)
+
+        for ttl in (INF, 40.0):
+            expected = [_query_cache_hits(ids, times, size, ttl) for size in sizes]
+            assert simulator.simulate_lru(*trace, sizes, ttl) == expected
+
+
+class TestOtherPolicies:
+    """LFU, TinyLFU e cache SQL sem limite"""
+
+    @pytest.mark.unit
+    def test_lfu_keeps_frequent_key(self):
+        # LRU(2): 0m 0h 1m 2m(sai 0) 0m(sai 1) 2h 2h 1m -> 3 hits
+        # LFU(2): 2 expulsa 1 (freq 1) e 0 (freq 2) fica: 0h 0h 2h 2h -> 4 hits
+        ids, times = _trace([0, 0, 1, 2, 0, 2, 2, 1])
+
+        assert simulator.simulate_lru(ids, times, [2], INF) == [3]
+        assert simulator.simulate_lfu(ids, times, 2, INF) == 4
+
+    @pytest.mark.unit
+    def test_tinylfu_resists_scan(self):
+        # 0,1 quentes (8 hits), varredura de chaves únicas, 0,1 de novo:
+        # LRU perde as duas na varredura; TinyLFU não admite as chaves de uma vez só
+        ids, times = _trace([0, 1] * 5 + list(range(2, 10)) + [0, 1])
+
+        assert simulator.simulate_lru(ids, times, [2], INF) == [8]
+        assert simulator.simulate_tinylfu(ids, times, 2, INF) == 10
+
+    @pytest.mark.unit
+    def test_unbounded_ttl_from_last_miss(self):
+        # 0@0 miss, 0@10 hit, 0@30 miss (idade 30 > 20), 0@45 hit (idade 15 desde o miss)
+        ids, times = _trace([0, 0, 0, 0], [0, 10, 30, 45])
+
+        assert simulator.simulate_unbounded(ids, times, 20) == 2
+        assert simulator.simulate_unbounded(ids, times, INF) == 3
+
+
+class TestRun:
+    """CLI: normalizador, curvas e taxas impressas"""
+
+    @pytest.mark.unit
+    def test_normalizer_merges_keys(self):
+        queries = ["Doces", "  doces", "DOCES até 50"]
+
+        assert list(simulator.intern_keys(queries, simulator.NORMALIZERS["raw"])[0]) == [0, 1, 2]
+        assert list(simulator.intern_keys(queries, simulator.NORMALIZERS["default"])[0]) == [0, 0, 1]
+
+    @pytest.mark.unit
+    def test_rows_reproduce_hit_rates(self, tmp_path):
+        path = tmp_path / "trace.ndjson"
+        queries = ["a", "b", "c", "a", "b", "d", "a", "b", "c"]
+        path.write_text(
+            "".join(json.dumps({"query": q, "offset_s": float(i)}) + "\n" for i, q in enumerate(queries))
+        )
+        args = simulator.parse_args([
+            "--trace", str(path), "--policies", "lru,sql", "--sizes", "2,3",
+            "--ttls", "inf", "--normalizers", "raw", "--jobs", "1",
+        ])
+
+        with patch.object(simulator, "ProcessPoolExecutor", ThreadPoolExecutor):
+            rows = simulator.run(args)
+
+        by_size = {(row["policy"], row["size"]): row for row in rows}
+        assert by_size[("lru", 2)]["hit_rate"] == 0.0
+        assert by_size[("lru", 3)]["llm_calls_saved"] == 4
+        assert by_size[("lru", 3)]["hit_rate"] == round(4 / 9, 4)
+        assert by_size[("sql", "unbounded")]["llm_calls"] == 4
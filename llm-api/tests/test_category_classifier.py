@@ -0,0 +1,159 @@
+"""
+Testes do classificador local treinado no histórico do LLM
+"""
+import gzip
+import json
+
+import pytest
+from unittest.mock import AsyncMock
+
+from llm_api.repositories import QueryRepository
+from llm_api.services import CategoryClassifier, QueryService, RuleParser
+from llm_api.services.category_classifier import evaluate, split_examples, train_with_holdout
+
+# Histórico sintético: termos fora do léxico do RuleParser
+HISTORY = [
+    ("camiseta azul", {"search_term": "camiseta azul", "category": "Roupas"}),
+    ("camiseta branca", {"search_term": "camiseta branca", "category": "Roupas"}),
+    ("calça jeans", {"search_term": "calça jeans", "category": "Roupas"}),
+    ("calça jeans até 80", {"search_term": "calça jeans", "category": "Roupas", "price_max": 80.0}),
+    ("jaqueta de couro", {"search_term": "jaqueta de couro", "category": "Roupas"}),
+    ("boneca de pano", {"search_term": "boneca de pano", "category": "Brinquedos"}),
+    ("carrinho de controle", {"search_term": "carrinho de controle", "category": "Brinquedos"}),
+    ("boneca até 30", {"search_term": "boneca", "category": "Brinquedos", "price_max": 30.0}),
+    ("quebra cabeça", {"search_term": "quebra cabeça", "category": "Brinquedos"}),
+    ("carrinho barato", {"search_term": "carrinho", "category": "Brinquedos", "price_max": 20.0}),
+    ("boneca barata", {"search_term": "boneca", "category": "Brinquedos", "price_max": 20.0}),
+    ("serra circular", {"search_term": "serra circular", "category": None}),
+] * 5
+
+
+@pytest.fixture(scope="module")
+def classifier() -> CategoryClassifier:
+    return CategoryClassifier.train(HISTORY)
+
+
+class TestCategoryClassifier:
+    """Treino, inferência e artefato"""
+
+    @pytest.mark.unit
+    def test_predicts_category_and_price(self, classifier):
+        """Categoria e preço vêm do que o LLM respondeu no histórico"""
+        prediction = classifier.predict("camisetas azuis")
+
+        assert prediction.category == "Roupas"
+        assert prediction.category_probability > 0.9
+        assert classifier.predict("boneca até 50").price_probability > 0.9
+        assert classifier.predict("jaqueta").price_probability < 0.5
+        assert classifier.predict("serra circular").category is None
+        assert set(classifier.categories) == {"Roupas", "Brinquedos"}
+
+    @pytest.mark.unit
+    def test_predict_many_matches_predict(self, classifier):
+        texts = ["calça jeans", "boneca barata", "xyz"]
+
+        assert classifier.predict_many(texts) == [classifier.predict(text) for text in texts]
+
+    @pytest.mark.unit
+    def test_artifact_roundtrip(self, classifier, tmp_path):
+        """Artefato gzip reproduz as mesmas previsões"""
+        path = str(tmp_path / "classifier.json.gz")
+        classifier.save(path)
+        loaded = CategoryClassifier.load(path)
+
+        assert loaded.predict("boneca barata") == pytest.approx(classifier.predict("boneca barata"), abs=1e-3)
+        assert loaded.metadata["examples"] == len(HISTORY)
+
+    @pytest.mark.unit
+    def test_load_rejects_other_version(self, tmp_path):
+        path = tmp_path / "old.json.gz"
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump({"artifact_version": 0}, f)
+
+        with pytest.raises(ValueError):
+            CategoryClassifier.load(str(path))
+
+    @pytest.mark.unit
+    def test_train_requires_examples(self):
+        with pytest.raises(ValueError):
+            CategoryClassifier.train([])
+
+    @pytest.mark.unit
+    def test_split_keeps_variants_together(self):
+        """Variações da mesma query normalizada ficam do mesmo lado"""
+        examples = [(f"Boneca de pano {i}", {}) for i in range(50)] + [("boneca pano", {}), ("BONECA DE PANO", {})]
+        train, holdout = split_examples(examples, 0.5)
+        side = "train" if ("boneca pano", {}) in train else "holdout"
+
+        assert (("BONECA DE PANO", {}) in train) == (side == "train")
+        assert len(train) + len(holdout) == len(examples)
+
+    @pytest.mark.unit
+    def test_offline_report(self):
+        """Relatório traz acurácias, cobertura por limiar e latência"""
+        classifier, report = train_with_holdout(HISTORY, 0.3)
+
+        assert classifier.metadata["holdout"]["examples"] == report["examples"]
+        assert 0 <= report["category_accuracy"] <= 1
+        assert set(report["coverage"]) == {"0.5", "0.8", "0.9", "0.95"}
+        assert report["latency_us"]["p50"] > 0
+        assert evaluate(classifier, []) == {"examples": 0}
+
+
+class TestRuleParserWithClassifier:
+    """Classificador como prior da regra"""
+
+    @pytest.mark.unit
+    def test_classifier_gives_category_to_unknown_terms(self, classifier):
+        """Sem o classificador "camiseta azul" fica em 0.3; com ele, Roupas em 0.85"""
+        filtros, confidence = RuleParser(classifier=classifier).parse("camiseta azul")
+
+        assert filtros.category == "Roupas"
+        assert confidence == 0.85
+        assert RuleParser().parse("camiseta azul")[1] == 0.3
+
+    @pytest.mark.unit
+    def test_likely_price_without_range_waits_for_llm(self, classifier):
+        """"carrinho barato": o histórico tem preço que as regras não extraem"""
+        filtros, confidence = RuleParser(classifier=classifier, classifier_threshold=0.7).parse("carrinho barato")
+
+        assert filtros.price_max is None
+        assert confidence == 0.3
+
+    @pytest.mark.unit
+    def test_lexicon_only_queries_unchanged(self, classifier):
+        """Query coberta pelo léxico não depende do classificador"""
+        parser = RuleParser(classifier=classifier)
+
+        assert parser.parse("brownie de chocolate até 25") == RuleParser().parse("brownie de chocolate até 25")
+
+    @pytest.mark.unit
+    def test_metrics_expose_classifier(self, classifier):
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: None,
+            rule_parser=RuleParser(classifier=classifier),
+        )
+
+        assert service.get_metrics()["speculation"]["classifier"]["examples"] == len(HISTORY)
+
+
+class TestTrainingExamples:
+    """Exemplos de treino do repositório"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_only_llm_labels(self):
+        """Fallback, template e regra não entram no treino"""
+        repo = QueryRepository()
+        await repo.save_query("doces até 50", {"category": "Doces"}, provenance={"source": "llm"})
+        await repo.save_query("bolo", {"category": "Doces"})
+        await repo.save_query("doces até 30", {"category": "Doces"}, provenance={"source": "template"})
+        await repo.save_query("camiseta", {"search_term": "camiseta"}, status="fallback", provenance={"source": "fallback"})
+        await repo.save_query("brownie", {"category": "Doces"}, provenance={"source": "rule"})
+
+        examples = await repo.get_training_examples()
+
+        assert [example["query_text"] for example in examples] == ["bolo", "doces até 50"]
+        assert await repo.get_training_examples(limit=1) == [{"query_text": "bolo", "filters": {"category": "Doces"}}]
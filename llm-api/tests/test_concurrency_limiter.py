@@ -0,0 +1,158 @@
+"""
+Testes unitários para o limiter adaptativo de chamadas ao LLM
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.repositories import MockQueryRepository
+from llm_api.services import QueryService, AdaptiveConcurrencyLimiter, LoadShedError
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Testes do algoritmo AIMD e do load shedding"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_fast_calls_increase_limit(self):
+        """Latência abaixo do alvo deve aumentar o limite (aditivo)"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, latency_target=10)
+
+        for _ in range(4):
+            async with limiter.acquire():
+                pass
+
+        assert limiter.limit > 2
+        assert limiter.accepted == 4
+        assert limiter.in_flight == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_errors_decrease_limit(self):
+        """Falhas devem reduzir o limite (multiplicativo)"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10, backoff=0.5)
+
+        with pytest.raises(RuntimeError):
+            async with limiter.acquire():
+                raise RuntimeError("quota")
+
+        assert limiter.limit == 5
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cancelled_call_keeps_limit(self):
+        """LLM especulativo cancelado devolve o slot sem reduzir o limite"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=1, backoff=0.5)
+        waiting = asyncio.Event()
+
+        async def call():
+            async with limiter.acquire():
+                waiting.set()
+                await asyncio.sleep(1)
+
+        for _ in range(3):
+            waiting.clear()
+            task = asyncio.create_task(call())
+            await waiting.wait()
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        assert limiter.limit == 4
+        assert limiter.avg_latency is None
+        assert limiter.in_flight == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sheds_when_queue_full(self):
+        """Fila cheia deve descartar imediatamente"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_queue=0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.acquire():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        with pytest.raises(LoadShedError):
+            async with limiter.acquire():
+                pass
+
+        release.set()
+        await holder
+        assert limiter.metrics()["shed_count"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_waiter_gets_slot_when_released(self):
+        """Request na fila deve receber o slot liberado (FIFO)"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, queue_timeout=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.acquire():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        async def waiter():
+            async with limiter.acquire():
+                return "ok"
+
+        waiting = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+
+        release.set()
+        assert await waiting == "ok"
+        await holder
+        assert limiter.queue_depth == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_sheds_when_wait_exceeds_deadline(self):
+        """Espera maior que o prazo deve descartar o request"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, queue_timeout=0.01)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.acquire():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+
+        with pytest.raises(LoadShedError):
+            async with limiter.acquire():
+                pass
+
+        assert limiter.queue_depth == 0
+        release.set()
+        await holder
+
+
+class TestQueryServiceLoadShedding:
+    """Integração do limiter com o QueryService"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_shed_request_returns_fallback(self):
+        """Request descartado deve ir direto para o fallback sem chamar o LLM"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_queue=0)
+        limiter.in_flight = 1  # simula LLM saturado
+        structured = MagicMock(ainvoke=AsyncMock())
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=MockQueryRepository(),
+            structured_llm_provider=lambda: structured,
+            limiter=limiter,
+        )
+
+        result = await service.parse_query_only("doces até 50")
+
+        assert result.search_term == "doces até 50"
+        structured.ainvoke.assert_not_called()
+        assert service.get_metrics()["llm_limiter"]["shed_count"] == 1
@@ -0,0 +1,101 @@
+"""
+Testes unitários para o buffer in-memory e a reconexão ao PostgreSQL
+"""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.repositories import DatabaseReconnector, FailoverQueryRepository, QueryRepository
+
+
+class TestFailoverQueryRepository:
+    """Buffer enquanto o banco está fora, backfill ao conectar"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_buffer_is_bounded(self):
+        """Buffer cheio deve descartar as queries mais antigas"""
+        repo = FailoverQueryRepository(buffer_max_entries=2)
+
+        first = await repo.save_query("doces", {})
+        await repo.save_query("bebidas", {})
+        await repo.save_query("pizzas", {})
+
+        assert repo.is_degraded
+        assert repo.status() == {"connected": False, "buffered": 2, "dropped": 1}
+        assert await repo.get_query_by_id(first) is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_flush_failure_keeps_buffer(self, monkeypatch):
+        """Backfill com erro deve devolver os registros ao buffer"""
+        repo = FailoverQueryRepository()
+        await repo.save_query("doces", {"category": "Doces"})
+        monkeypatch.setattr(QueryRepository, "bulk_insert", AsyncMock(side_effect=OSError("down")))
+        repo.attach_pool(MagicMock())
+
+        with pytest.raises(OSError):
+            await repo.flush_buffer()
+
+        assert repo.buffered == 1
+
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_buffered_ids_visible_until_flushed(self, monkeypatch):
+        """Durante o backfill o buffer continua servindo; update no meio vai no próximo lote"""
+        repo = FailoverQueryRepository()
+        query_id = await repo.save_query("doces", {"search_term": "doces"}, status="fallback")
+        sent = []
+        release = asyncio.Event()
+
+        async def bulk_insert(_self, records):
+            sent.append([(r["id"], r["status"]) for r in records])
+            await release.wait()
+            return len(records)
+
+        monkeypatch.setattr(QueryRepository, "bulk_insert", bulk_insert)
+        repo.attach_pool(MagicMock())
+        flush = asyncio.create_task(repo.flush_buffer())
+        await asyncio.sleep(0)
+
+        assert repo.is_degraded
+        assert (await repo.get_query_by_id(query_id))["status"] == "fallback"
+        assert await repo.update_query_filters(query_id, {"category": "Doces"}, provenance={"source": "llm"})
+        release.set()
+
+        assert await flush == 1
+        assert sent == [[(query_id, "fallback")], [(query_id, "processed")]]
+        assert not repo.is_degraded
+        assert repo.buffered == 0
+
+
+class TestDatabaseReconnector:
+    """Loop de reconexão com backoff"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reconnects_and_backfills(self, monkeypatch):
+        """Após falhas, pluga o pool e envia o buffer em lote com ids e provenance"""
+        repo = FailoverQueryRepository()
+        query_id = await repo.save_query("doces", {"category": "Doces"}, provenance={"source": "llm"})
+        bulk_insert = AsyncMock(side_effect=lambda records: len(records))
+        monkeypatch.setattr(QueryRepository, "bulk_insert", bulk_insert)
+        pool = MagicMock()
+        connect = AsyncMock(side_effect=[OSError("refused"), OSError("refused"), (pool, None)])
+        connected = MagicMock()
+        reconnector = DatabaseReconnector(
+            repo, connect=connect, on_connected=connected, initial_delay=0, max_delay=0
+        )
+
+        await reconnector.start()
+
+        assert reconnector.state == "connected"
+        assert connect.await_count == 3
+        connected.assert_called_once_with(pool, None)
+        (records,), _ = bulk_insert.await_args
+        assert [(r["id"], r["source"]) for r in records] == [(query_id, "llm")]
+        assert not repo.is_degraded
+        assert repo.buffered == 0
+        assert reconnector.status()["backfilled"] == 1
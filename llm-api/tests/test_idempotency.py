@@ -0,0 +1,124 @@
+"""
+Testes unitários para o Idempotency-Key do /parse-query
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.controllers import QueryController
+from llm_api.repositories import QueryRepository
+from llm_api.services import IdempotencyConflictError, IdempotencyStore, QueryService
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+
+def _service(repository, structured, store):
+    return QueryService(
+        llm_model=AsyncMock(),
+        repository=repository,
+        structured_llm_provider=lambda: structured,
+        idempotency=store,
+    )
+
+
+class TestIdempotentParse:
+    """Retries com a mesma chave não repetem LLM nem INSERT"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrent_retry_joins_in_flight_request(self):
+        """Retry enquanto o primeiro ainda roda deve esperar o mesmo resultado"""
+        release = asyncio.Event()
+
+        async def slow_llm(_prompt):
+            await release.wait()
+            return FiltrosBusca(category="Doces", price_max=30.0)
+
+        structured = MagicMock(ainvoke=AsyncMock(side_effect=slow_llm))
+        repo = QueryRepository()
+        store = IdempotencyStore()
+        service = _service(repo, structured, store)
+
+        first = asyncio.create_task(service.parse_and_save_query(QueryInput(query="doces até 30"), "k1"))
+        await asyncio.sleep(0)
+        retry = asyncio.create_task(service.parse_and_save_query(QueryInput(query="doces até 30"), "k1"))
+        await asyncio.sleep(0)
+        release.set()
+
+        (filtros_a, id_a), (filtros_b, id_b) = await asyncio.gather(first, retry)
+
+        assert id_a == id_b
+        assert filtros_a == filtros_b
+        assert structured.ainvoke.await_count == 1
+        assert repo.memory_size == 1
+        assert store.metrics()["joined"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_completed_key_replays_stored_result(self):
+        """Retry depois de concluído deve reler o registro gravado"""
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Doces")))
+        repo = QueryRepository()
+        service = _service(repo, structured, IdempotencyStore())
+
+        _, first_id = await service.parse_and_save_query(QueryInput(query="doces"), "k1")
+        filtros, retry_id = await service.parse_and_save_query(QueryInput(query="doces"), "k1")
+
+        assert retry_id == first_id
+        assert filtros.category == "Doces"
+        assert structured.ainvoke.await_count == 1
+        assert repo.memory_size == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_key_is_recognized_from_queries_table(self):
+        """Outra réplica (store vazio) deve achar a chave gravada em queries"""
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Doces")))
+        repo = QueryRepository()
+
+        _, first_id = await _service(repo, structured, IdempotencyStore()).parse_and_save_query(
+            QueryInput(query="doces", organization_id=1), "k1"
+        )
+        _, retry_id = await _service(repo, structured, IdempotencyStore()).parse_and_save_query(
+            QueryInput(query="doces", organization_id=1), "k1"
+        )
+
+        assert retry_id == first_id
+        assert structured.ainvoke.await_count == 1
+        assert await repo.find_by_idempotency_key("k1", organization_id=2) is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_key_reused_with_other_query_conflicts(self):
+        """Mesma chave com outra query deve ser rejeitada (422 no controller)"""
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Doces")))
+        repo = QueryRepository()
+        service = _service(repo, structured, IdempotencyStore())
+        await service.parse_and_save_query(QueryInput(query="doces"), "k1")
+
+        with pytest.raises(IdempotencyConflictError):
+            await service.parse_and_save_query(QueryInput(query="bebidas"), "k1")
+        with pytest.raises(IdempotencyConflictError):
+            await _service(repo, structured, IdempotencyStore()).parse_and_save_query(
+                QueryInput(query="bebidas"), "k1"
+            )
+
+        with pytest.raises(HTTPException) as exc:
+            await QueryController(service).parse_query(QueryInput(query="bebidas"), "k1")
+        assert exc.value.status_code == 422
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failure_is_not_remembered(self):
+        """Se o primeiro request falhar, o retry deve executar de novo"""
+        store = IdempotencyStore()
+        execute = AsyncMock(side_effect=[RuntimeError("db"), ("ok", "id-1")])
+        replay = AsyncMock(return_value=None)
+
+        with pytest.raises(RuntimeError):
+            await store.run("k1", "doces", execute, replay, lambda result: result[1])
+        result = await store.run("k1", "doces", execute, replay, lambda result: result[1])
+
+        assert result == ("ok", "id-1")
+        assert store.metrics() == {"in_flight": 0, "completed": 1, "joined": 0, "replayed": 0}
@@ -207,6 +207,7 @@ class TestQueryService:
 
         # Mock do Repository
         mock_repo = AsyncMock(spec=IQueryRepository)
+        mock_repo.find_cached_query = AsyncMock(return_value=None)
         mock_repo.save_query = AsyncMock(return_value="query-id-123")
         mock_repo.update_query_status = AsyncMock(return_value=True)
 
@@ -223,6 +224,25 @@ class TestQueryService:
         assert mock_repo.save_query.called
         assert mock_repo.update_query_status.called
 
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_parse_and_save_query_cache_hit(self):
+        """Hit no cache SQL devolve o registro sem chamar o LLM nem salvar"""
+        mock_llm = AsyncMock()
+        mock_repo = AsyncMock(spec=IQueryRepository)
+        mock_repo.find_cached_query = AsyncMock(return_value={
+            "id": "query-id-123",
+            "filters": {"category": "Doces", "price_max": 50.0},
+            "age_seconds": 60.0,
+        })
+
+        service = QueryService(llm_model=mock_llm, repository=mock_repo)
+        filtros, query_id = await service.parse_and_save_query(QueryInput(query="doces até 50"))
+
+        assert query_id == "query-id-123"
+        assert filtros.price_max == 50.0
+        assert not mock_repo.save_query.called
+
     @pytest.mark.unit
     def test_validate_filters_valid(self):
         """Deve validar filtros válidos"""
@@ -0,0 +1,124 @@
+"""
+Testes da pipeline de logging estruturado
+"""
+import io
+import json
+import logging
+import queue
+import random
+import sys
+import pytest
+
+from llm_api.logging_config import (
+    JsonFormatter,
+    RouteSampler,
+    current_route,
+    parse_sample_rates,
+    setup_logging,
+    shutdown_logging,
+    _DeferredQueueHandler,
+)
+
+
+def _record(level=logging.INFO, msg="query: %s", args=("doces",), **extra):
+    record = logging.LogRecord("llm_api.test", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestJsonFormatter:
+    """Testes do formatter JSON"""
+
+    @pytest.mark.unit
+    def test_formats_message_and_extra_fields(self):
+        """Deve interpolar a mensagem e incluir campos de `extra`"""
+        payload = json.loads(JsonFormatter().format(_record(event="parse", latency_ms=12.5)))
+
+        assert payload["message"] == "query: doces"
+        assert payload["level"] == "INFO"
+        assert payload["event"] == "parse"
+        assert payload["latency_ms"] == 12.5
+
+
+class TestRouteSampler:
+    """Testes da amostragem por rota"""
+
+    @pytest.mark.unit
+    def test_samples_info_on_configured_route(self):
+        """INFO em rota amostrada deve passar só na fração configurada"""
+        sampler = RouteSampler({"/api/v1/parse-query": 0.0}, rng=random.Random(1))
+        token = current_route.set("/api/v1/parse-query")
+        try:
+            assert sampler.filter(_record()) is False
+            assert sampler.filter(_record(level=logging.WARNING)) is True
+        finally:
+            current_route.reset(token)
+
+    @pytest.mark.unit
+    def test_request_timing_is_never_sampled(self):
+        """A linha única por request (request_timing) passa mesmo com taxa 0"""
+        sampler = RouteSampler({"/api/v1/parse-query": 0.0}, rng=random.Random(1))
+        record = _record()
+        record.event = "request_timing"
+        token = current_route.set("/api/v1/parse-query")
+        try:
+            assert sampler.filter(record) is True
+        finally:
+            current_route.reset(token)
+
+    @pytest.mark.unit
+    def test_keeps_records_outside_requests(self):
+        """Sem rota (startup, background) nada é descartado"""
+        sampler = RouteSampler({"/api/v1/parse-query": 0.0})
+        assert sampler.filter(_record()) is True
+
+    @pytest.mark.unit
+    def test_parse_sample_rates(self):
+        """Deve converter a variável de ambiente em dicionário"""
+        assert parse_sample_rates("/a=0.1, /b=1") == {"/a": 0.1, "/b": 1.0}
+        assert parse_sample_rates("") == {}
+
+
+class TestQueuePipeline:
+    """Testes do QueueHandler/QueueListener"""
+
+    @pytest.mark.unit
+    def test_prepare_freezes_message_and_traceback(self):
+        """Args mutados depois do log não mudam a linha; o traceback vai como texto"""
+        filters = {"category": "Doces"}
+        try:
+            raise ValueError("filtro inválido")
+        except ValueError:
+            record = _record(level=logging.ERROR, msg="filtros: %s", args=(filters,))
+            record.exc_info = sys.exc_info()
+
+        prepared = _DeferredQueueHandler(queue.SimpleQueue()).prepare(record)
+        filters["category"] = "Bebidas"
+
+        assert prepared.msg == "filtros: {'category': 'Doces'}" and prepared.args is None
+        assert prepared.exc_info is None
+        assert "ValueError: filtro inválido" in prepared.exc_text
+        payload = json.loads(JsonFormatter().format(prepared))
+        assert payload["message"] == "filtros: {'category': 'Doces'}"
+        assert "ValueError: filtro inválido" in payload["exc_info"]
+
+    @pytest.mark.unit
+    def test_records_are_written_by_listener(self):
+        """Registros devem chegar ao stream formatados em JSON"""
+        stream = io.StringIO()
+        root = logging.getLogger()
+        previous_handlers, previous_level = list(root.handlers), root.level
+        try:
+            setup_logging(level="INFO", stream=stream)
+            logging.getLogger("llm_api.test").info("query: %s", "bebidas", extra={"event": "x"})
+            shutdown_logging()  # esvazia a fila
+
+            payload = json.loads(stream.getvalue().strip().splitlines()[-1])
+            assert payload["message"] == "query: bebidas"
+            assert payload["event"] == "x"
+        finally:
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in previous_handlers:
+                root.addHandler(handler)
+            root.setLevel(previous_level)
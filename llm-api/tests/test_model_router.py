@@ -0,0 +1,123 @@
+"""
+Testes do roteamento por tier de modelo (com o provedor stub)
+"""
+import pytest
+from unittest.mock import AsyncMock
+
+from llm_api.repositories import QueryRepository
+from llm_api.services import ModelRouter, ModelTier, QueryService, StubChatModel, query_complexity
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+SIMPLE = "doces até 50"
+COMPLEX = "brownie de chocolate sem glúten barato para festa infantil até 30"
+
+
+def _router(fast_latency=0.01, large_latency=0.05, fast_timeout=None) -> ModelRouter:
+    config = [
+        {"name": "large", "model": "stub-large", "stub_latency_seconds": large_latency,
+         "max_concurrency": 2, "input_cost_per_1k": 0.003, "output_cost_per_1k": 0.01},
+        {"name": "fast", "model": "stub-fast", "max_complexity": 2.5, "stub_latency_seconds": fast_latency,
+         "timeout_seconds": fast_timeout, "input_cost_per_1k": 0.0001, "output_cost_per_1k": 0.0004},
+    ]
+    return ModelRouter.from_config(
+        config,
+        lambda tier: StubChatModel(tier["model"], tier["stub_latency_seconds"]).with_structured_output(
+            FiltrosBusca, include_raw=True
+        ),
+    )
+
+
+def _service(router: ModelRouter) -> QueryService:
+    return QueryService(
+        llm_model=AsyncMock(),
+        repository=QueryRepository(),
+        structured_llm_provider=lambda: pytest.fail("sem router não deveria ser usado"),
+        model_router=router,
+    )
+
+
+class TestQueryComplexity:
+    """Pontuação de complexidade"""
+
+    @pytest.mark.unit
+    def test_constraints_and_vague_price_raise_score(self):
+        """Query curta com um preço é simples; vaga e com restrições é complexa"""
+        assert query_complexity(SIMPLE) == 1.25
+        assert query_complexity(COMPLEX) > 5
+        assert query_complexity("bolo para 20 pessoas") > query_complexity("bolo para festa")
+
+
+class TestModelRouter:
+    """Escolha do tier e métricas por tier"""
+
+    @pytest.mark.unit
+    def test_tiers_ordered_by_complexity(self):
+        """O tier mais barato atende até o limite; o resto vai para o último"""
+        router = _router()
+
+        assert [tier.name for tier in router.tiers] == ["fast", "large"]
+        assert router.route(SIMPLE).name == "fast"
+        assert router.route(COMPLEX).name == "large"
+
+    @pytest.mark.unit
+    def test_router_requires_tiers(self):
+        with pytest.raises(ValueError):
+            ModelRouter([])
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_service_reports_latency_and_cost_per_tier(self):
+        """Cada query vai ao modelo do seu tier, gravado na proveniência"""
+        router = _router()
+        repo = QueryRepository()
+        service = QueryService(
+            llm_model=AsyncMock(), repository=repo, structured_llm_provider=lambda: None, model_router=router,
+        )
+
+        _, simple_id = await service.parse_and_save_query(QueryInput(query=SIMPLE))
+        await service.parse_and_save_query(QueryInput(query=COMPLEX))
+
+        assert (await repo.get_query_by_id(simple_id))["llm_model"] == "stub-fast"
+        tiers = service.get_metrics()["model_tiers"]
+        assert tiers["fast"]["requests"] == tiers["large"]["requests"] == 1
+        assert tiers["fast"]["latency_ms"]["p50"] < tiers["large"]["latency_ms"]["p50"]
+        assert 0 < tiers["fast"]["cost_usd"] < tiers["large"]["cost_usd"]
+        assert tiers["large"]["limit"] == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_tier_timeout_falls_back(self):
+        """Timeout do tier aplica o fallback e conta como timeout"""
+        service = _service(_router(fast_latency=1, fast_timeout=0.05))
+
+        filtros, _ = await service.parse_and_save_query(QueryInput(query=SIMPLE))
+
+        assert filtros == FiltrosBusca(search_term=SIMPLE)
+        fast = service.get_metrics()["model_tiers"]["fast"]
+        assert fast["timeouts"] == fast["errors"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_uses_routed_tier(self):
+        """O parse em streaming passa pelo mesmo tier, timeout e métricas"""
+        service = _service(_router())
+        slow = _service(_router(fast_latency=1, fast_timeout=0.05))
+
+        events = [event async for event in service.stream_parse_query(COMPLEX)]
+        timed_out = [event async for event in slow.stream_parse_query(SIMPLE)]
+
+        assert events[-1][0] == "final"
+        tiers = service.get_metrics()["model_tiers"]
+        assert tiers["large"]["requests"] == 1 and tiers["fast"]["requests"] == 0
+        assert tiers["large"]["cost_usd"] > 0
+        assert timed_out == [("final", FiltrosBusca(search_term=SIMPLE))]
+        assert slow.get_metrics()["model_tiers"]["fast"]["timeouts"] == 1
+
+    @pytest.mark.unit
+    def test_tier_without_usage_costs_nothing(self):
+        """Sem tokens na resposta (mock sem include_raw), o custo fica zerado"""
+        tier = ModelTier("fast", "m", structured_llm=None, input_cost_per_1k=1.0)
+        tier.record({"llm_latency_ms": 10.0}, ok=True)
+
+        assert tier.metrics()["cost_usd"] == 0
+        assert tier.metrics()["latency_ms"]["avg"] == 10.0
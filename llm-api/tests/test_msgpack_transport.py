@@ -0,0 +1,78 @@
+"""
+Testes da variante MessagePack do /parse-query
+"""
+import msgpack
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llm_api.controllers import QueryController, create_router
+from llm_api.controllers.transport import MSGPACK_MEDIA_TYPE
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService
+from llm_api.schemas import FiltrosBusca
+
+URL = "/api/v1/parse-query/msgpack"
+
+
+@pytest.fixture
+def client():
+    """App mínima com LLM mockado"""
+    structured = MagicMock(ainvoke=AsyncMock(
+        return_value=FiltrosBusca(search_term="brownie", category="Doces", price_max=25.0)
+    ))
+    service = QueryService(
+        llm_model=AsyncMock(),
+        repository=QueryRepository(),
+        structured_llm_provider=lambda: structured,
+    )
+    app = FastAPI()
+    app.include_router(create_router(QueryController(service=service)))
+    return TestClient(app)
+
+
+class TestMsgpackParseQuery:
+    """Negociação pelo Content-Type e mesmos campos do /parse-query"""
+
+    @pytest.mark.unit
+    def test_msgpack_round_trip(self, client):
+        """Request em MessagePack deve receber MessagePack com os filtros"""
+        response = client.post(
+            URL,
+            content=msgpack.packb({"query": "brownie até 25 reais"}),
+            headers={"Content-Type": MSGPACK_MEDIA_TYPE},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+        assert msgpack.unpackb(response.content) == {
+            "search_term": "brownie",
+            "category": "Doces",
+            "price_min": None,
+            "price_max": 25.0,
+        }
+
+    @pytest.mark.unit
+    def test_json_content_type_gets_json_back(self, client):
+        """Com Content-Type JSON a resposta deve ser igual à do /parse-query"""
+        payload = {"query": "brownie até 25 reais"}
+        packed = client.post(URL, json=payload)
+        plain = client.post("/api/v1/parse-query", json=payload)
+
+        assert packed.status_code == 200
+        assert packed.headers["content-type"].startswith("application/json")
+        assert packed.json() == plain.json()
+
+    @pytest.mark.unit
+    def test_invalid_body_and_media_type(self, client):
+        """Corpo inválido = 400; Content-Type desconhecido = 415"""
+        garbage = client.post(URL, content=b"\xc1", headers={"Content-Type": MSGPACK_MEDIA_TYPE})
+        missing_query = client.post(
+            URL, content=msgpack.packb({"organization_id": 1}), headers={"Content-Type": MSGPACK_MEDIA_TYPE}
+        )
+        text = client.post(URL, content=b"doces", headers={"Content-Type": "text/plain"})
+
+        assert garbage.status_code == 400
+        assert missing_query.status_code == 400
+        assert text.status_code == 415
@@ -0,0 +1,99 @@
+"""
+Testes unitários para o isolamento por organização (RQ-05) no cache e no histórico
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.cache import CacheAnalytics, QueryCache
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+
+class TestTenantQueryCache:
+    """Cache L1 separado e justo entre tenants"""
+
+    @pytest.mark.unit
+    def test_same_query_is_isolated_per_tenant(self):
+        """A mesma query em outra organização não deve bater no cache"""
+        cache = QueryCache()
+        cache.set("doces", {"id": "a", "filters": {}}, tenant=1)
+
+        assert cache.get("doces", tenant=1)["id"] == "a"
+        assert cache.get("doces", tenant=2) is None
+        assert cache.get("doces") is None
+
+    @pytest.mark.unit
+    def test_noisy_tenant_evicts_its_own_entries(self):
+        """Tenant que enche o cache deve reciclar as próprias entradas"""
+        cache = QueryCache(max_entries=4)
+        cache.set("bolos", {"id": "b", "filters": {}}, tenant=2)
+        for i in range(10):
+            cache.set(f"query {i}", {"id": str(i), "filters": {}}, tenant=1)
+
+        assert cache.get("bolos", tenant=2)["id"] == "b"
+        assert cache.tenant_sizes() == {2: 1, 1: 3}
+        assert len(cache) == 4
+
+    @pytest.mark.unit
+    def test_isolation_holds_with_many_tenants(self):
+        """Com milhares de organizações o tenant barulhento ainda só recicla as próprias entradas"""
+        cache = QueryCache(max_entries=2000)
+        for tenant in range(1500):
+            cache.set("doces", {"id": str(tenant), "filters": {}}, tenant=tenant)
+        for i in range(5000):
+            cache.set(f"query {i}", {"id": f"n{i}", "filters": {}}, tenant="noisy")
+        cache.discard("doces", tenant=7)
+        cache.set("bolos", {"id": "b", "filters": {}}, tenant=7)
+
+        assert all(cache.get("doces", tenant=t)["id"] == str(t) for t in range(1500) if t != 7)
+        assert cache.get("bolos", tenant=7)["id"] == "b"
+        assert cache.tenant_sizes()["noisy"] == 500
+        assert cache.get("query 4999", tenant="noisy")["id"] == "n4999"
+        assert len(cache) == 2000
+
+
+class TestTenantRepository:
+    """Cache SQL e histórico por organização (modo in-memory)"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cache_and_history_filtered_by_organization(self):
+        """find_cached_query e histórico só devem ver a própria organização"""
+        repo = QueryRepository()
+        await repo.save_query("doces", {"category": "Doces"}, organization_id=1)
+        await repo.save_query("bebidas", {"category": "Bebidas"}, organization_id=2)
+
+        assert (await repo.find_cached_query("doces", organization_id=1))["filters"]["category"] == "Doces"
+        assert await repo.find_cached_query("doces", organization_id=2) is None
+        assert await repo.find_cached_query("doces") is None
+        history = await repo.get_query_history(10, organization_id=2)
+        assert [h["query_text"] for h in history] == ["bebidas"]
+        assert len(await repo.get_query_history(10)) == 2
+
+
+class TestTenantService:
+    """Integração com o QueryService"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_tenants_do_not_share_cache_and_report_usage(self):
+        """Cada organização paga o próprio parse; analytics separa hit rate e LLM"""
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Doces")))
+        analytics = CacheAnalytics()
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+            cache=QueryCache(),
+            analytics=analytics,
+        )
+
+        await service.parse_and_save_query(QueryInput(query="doces", organization_id=1))
+        await service.parse_and_save_query(QueryInput(query="doces", organization_id=1))
+        await service.parse_and_save_query(QueryInput(query="doces", organization_id=2))
+
+        assert structured.ainvoke.await_count == 2
+        tenants = analytics.snapshot()["tenants"]
+        assert tenants["1"]["requests"] == 2 and tenants["1"]["hit_rate"] == 0.5
+        assert tenants["2"]["llm_calls"] == 1
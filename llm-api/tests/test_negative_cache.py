@@ -0,0 +1,95 @@
+"""
+Testes unitários para o cache negativo de falhas do LLM e o re-parse em background
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.cache import QueryCache
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService, ReparseScheduler
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+
+def _service(structured, repository, reparse=None):
+    return QueryService(
+        llm_model=AsyncMock(),
+        repository=repository,
+        structured_llm_provider=lambda: structured,
+        cache=QueryCache(),
+        negative_cache=QueryCache(ttl_seconds=30),
+        reparse=reparse,
+    )
+
+
+class TestNegativeCache:
+    """Fallbacks não podem virar cache de qualidade total"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failure_is_saved_as_fallback_and_not_cached(self):
+        """Falha do LLM deve ser salva como 'fallback' e ficar fora do L1 e do cache SQL"""
+        repo = QueryRepository()
+        structured = MagicMock(ainvoke=AsyncMock(side_effect=RuntimeError("503")))
+        service = _service(structured, repo)
+
+        filtros, query_id = await service.parse_and_save_query(QueryInput(query="doces"))
+
+        assert filtros.search_term == "doces"
+        assert (await repo.get_query_by_id(query_id))["status"] == "fallback"
+        assert await repo.find_cached_query("doces") is None
+        assert "doces" not in service._cache
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_repeated_failure_does_not_retry_llm(self):
+        """Dentro do TTL negativo, a mesma query não deve chamar o LLM de novo"""
+        structured = MagicMock(ainvoke=AsyncMock(side_effect=RuntimeError("503")))
+        service = _service(structured, QueryRepository())
+
+        _, first_id = await service.parse_and_save_query(QueryInput(query="doces"))
+        _, second_id = await service.parse_and_save_query(QueryInput(query="Doces "))
+
+        assert second_id == first_id
+        assert structured.ainvoke.await_count == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reparse_upgrades_entry(self):
+        """Re-parse bem-sucedido deve promover o registro e popular o L1"""
+        repo = QueryRepository()
+        structured = MagicMock(
+            ainvoke=AsyncMock(side_effect=[RuntimeError("503"), FiltrosBusca(category="Doces")])
+        )
+        reparse = ReparseScheduler(delay_seconds=0)
+        service = _service(structured, repo, reparse)
+
+        _, query_id = await service.parse_and_save_query(QueryInput(query="doces"))
+        while reparse.metrics()["pending"]:
+            await asyncio.sleep(0)
+
+        record = await repo.get_query_by_id(query_id)
+        assert record["status"] == "processed"
+        assert record["filters"]["category"] == "Doces"
+        assert service._cache.get("doces")["id"] == query_id
+        assert "doces" not in service._negative_cache
+        assert reparse.metrics()["upgraded"] == 1
+
+
+class TestReparseScheduler:
+    """Testes do agendador de re-parse"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_deduplicates_and_gives_up(self):
+        """Uma tarefa por chave; desiste após max_attempts"""
+        scheduler = ReparseScheduler(delay_seconds=0, max_attempts=2)
+        job = AsyncMock(return_value=False)
+
+        assert scheduler.schedule("doces", job) is True
+        assert scheduler.schedule("doces", job) is False
+        while scheduler.is_pending("doces"):
+            await asyncio.sleep(0)
+
+        assert job.await_count == 2
+        assert scheduler.metrics()["gave_up"] == 1
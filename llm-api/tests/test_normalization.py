@@ -0,0 +1,53 @@
+"""
+Testes unitários para a normalização de queries (chave de cache)
+"""
+import pytest
+
+from llm_api.normalization import normalize_query
+from llm_api.repositories import QueryRepository
+
+
+class TestNormalizeQuery:
+    """Variações da mesma intenção devem gerar a mesma chave"""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("query", [
+        "Doces até 50 reais",
+        "doces ate R$ 50,00",
+        "Doces até R$50",
+        "doces até cinquenta reais",
+        "quero doces por favor, até 50",
+        "doces no máximo 50",
+    ])
+    def test_price_and_currency_variants(self, query):
+        """Moeda, decimais, número por extenso e palavras de preenchimento"""
+        assert normalize_query(query) == "doces <=50"
+
+    @pytest.mark.unit
+    def test_price_ranges(self):
+        """Faixas viram operadores canônicos"""
+        assert normalize_query("bebidas a partir de 10") == "bebidas >=10"
+        assert normalize_query("bebidas pelo menos 10 reais") == "bebidas >=10"
+        assert normalize_query("artesanato entre 10 e 50 reais") == normalize_query("artesanato de 10 a 50")
+
+    @pytest.mark.unit
+    def test_term_order_and_negation(self):
+        """Ordem dos termos não importa, mas a negação fica presa ao termo"""
+        assert normalize_query("brownie de chocolate") == normalize_query("Chocolate brownie")
+        assert normalize_query("suco sem açúcar") != normalize_query("açúcar sem suco")
+
+    @pytest.mark.unit
+    def test_number_words_only_in_price_context(self):
+        """'um bolo' não deve virar '1 bolo'"""
+        assert normalize_query("um bolo de cenoura") == "bolo cenoura"
+        assert normalize_query("cesta até mil e quinhentos reais") == "cesta <=1500"
+
+    @pytest.mark.unit
+    def test_only_fillers_falls_back_to_simple_rule(self):
+        """Query só com stopwords não pode gerar chave vazia"""
+        assert normalize_query("quero uns") == "quero uns"
+
+    @pytest.mark.unit
+    def test_repository_uses_same_key(self):
+        """Repository e caches devem compartilhar a mesma regra"""
+        assert QueryRepository._normalize_query("Doces até R$50") == normalize_query("doces até 50")
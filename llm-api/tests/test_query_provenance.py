@@ -0,0 +1,80 @@
+"""
+Testes unitários para a proveniência e o custo gravados com cada query
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.cache import TemplateCache
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService
+from llm_api.services.query_service import PROMPT_VERSION
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+
+def _service(structured, repository, **kwargs):
+    return QueryService(
+        llm_model=AsyncMock(),
+        repository=repository,
+        structured_llm_provider=lambda: structured,
+        model_name="gemini-test",
+        **kwargs,
+    )
+
+
+class TestQueryProvenance:
+    """save_query recebe origem, modelo, prompt, latência e tokens"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_llm_parse_records_tokens_and_latency(self):
+        """Resposta com include_raw deve gravar tokens de usage_metadata"""
+        repo = QueryRepository()
+        raw = MagicMock(usage_metadata={"input_tokens": 52, "output_tokens": 18})
+        structured = MagicMock(ainvoke=AsyncMock(return_value={
+            "raw": raw, "parsed": FiltrosBusca(category="Doces"), "parsing_error": None,
+        }))
+
+        filtros, query_id = await _service(structured, repo).parse_and_save_query(QueryInput(query="doces"))
+
+        record = await repo.get_query_by_id(query_id)
+        assert filtros.category == "Doces"
+        assert record["source"] == "llm"
+        assert record["llm_model"] == "gemini-test"
+        assert record["prompt_version"] == PROMPT_VERSION
+        assert (record["input_tokens"], record["output_tokens"]) == (52, 18)
+        assert record["llm_latency_ms"] >= 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unparsed_response_is_fallback(self):
+        """Resposta sem filtros parseados vira fallback, mantendo o custo da chamada"""
+        repo = QueryRepository()
+        raw = MagicMock(usage_metadata={"input_tokens": 52, "output_tokens": 3})
+        structured = MagicMock(ainvoke=AsyncMock(return_value={
+            "raw": raw, "parsed": None, "parsing_error": "json inválido",
+        }))
+
+        _, query_id = await _service(structured, repo).parse_and_save_query(QueryInput(query="doces"))
+
+        record = await repo.get_query_by_id(query_id)
+        assert record["status"] == "fallback"
+        assert record["source"] == "fallback"
+        assert record["output_tokens"] == 3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_template_hit_records_source(self):
+        """Parse montado pelo template cache não tem custo de LLM"""
+        repo = QueryRepository()
+        structured = MagicMock(
+            ainvoke=AsyncMock(return_value=FiltrosBusca(search_term="doces", price_max=30))
+        )
+        service = _service(structured, repo, template_cache=TemplateCache())
+
+        await service.parse_and_save_query(QueryInput(query="doces até 30"))
+        _, query_id = await service.parse_and_save_query(QueryInput(query="doces até 50"))
+
+        record = await repo.get_query_by_id(query_id)
+        assert record["source"] == "template"
+        assert record["llm_model"] is None
+        assert record["input_tokens"] is None
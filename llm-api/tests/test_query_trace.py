@@ -0,0 +1,82 @@
+"""
+Testes do gerador de traces de queries da raiz do repositório (generate_query_trace.py)
+
+O script fica fora de llm-api; sem ele (imagem Docker de testes) o módulo é pulado.
+"""
+import random
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+trace = pytest.importorskip("generate_query_trace")
+
+
+def _price_phrases(phrases, value):
+    """Todas as escritas possíveis do preço com as frases dadas (minúsculas)"""
+    return {
+        phrase.format(p=fmt.format(v=int(value))).lower()
+        for phrase in phrases
+        for fmt in trace.PRICE_FORMATS
+    }
+
+
+class TestGenerateTrace:
+    """Determinismo e distribuição do trace"""
+
+    @pytest.mark.unit
+    def test_same_seed_same_trace(self):
+        """Mesmo seed reproduz o trace inteiro; outro seed muda"""
+        first = list(trace.generate_trace(300, universe_size=200, seed=7))
+        again = list(trace.generate_trace(300, universe_size=200, seed=7))
+        other = list(trace.generate_trace(300, universe_size=200, seed=8))
+
+        assert first == again
+        assert first != other
+        assert all(a["offset_s"] < b["offset_s"] for a, b in zip(first, first[1:]))
+
+    @pytest.mark.unit
+    def test_zipf_ranks_skewed_toward_zero(self):
+        sampler = trace.ZipfSampler(100, 1.1, random.Random(1))
+        counts = [0] * 100
+        for _ in range(20000):
+            counts[sampler.sample()] += 1
+
+        assert counts[0] > counts[1] > counts[9] > counts[99]
+        assert sum(counts[:10]) > sum(counts[10:])
+
+
+class TestRender:
+    """Texto gerado a partir da intenção"""
+
+    @pytest.mark.unit
+    def test_price_phrase_matches_expected_without_noise(self):
+        """Sem typos nem acentos removidos, a frase de preço é a dos filtros esperados"""
+        rng = random.Random(3)
+        universe = trace.build_universe(500, random.Random(2))
+
+        for intent in universe:
+            text = trace.render(intent, rng, typo_rate=0, accent_rate=0).strip().lower()
+            expected = intent.expected()
+            subject = (expected["search_term"] or expected["category"]).lower()
+            if not text.startswith(subject):
+                # categoria sem "produtos" no nome pode ganhar o prefixo
+                assert expected["search_term"] is None, text
+                text = text.removeprefix("produtos de ")
+            assert text.startswith(subject), text
+            price = text[len(subject):].strip()
+
+            if expected["price_min"] is not None and expected["price_max"] is not None:
+                match = re.fullmatch(r"entre (.+) e (.+)", price)
+                assert match, text
+                assert match.group(1) in _price_phrases(["{p}"], expected["price_min"])
+                assert match.group(2) in _price_phrases(["{p}"], expected["price_max"])
+            elif expected["price_max"] is not None:
+                assert price in _price_phrases(trace.PRICE_MAX_PHRASES, expected["price_max"]), text
+            elif expected["price_min"] is not None:
+                assert price in _price_phrases(trace.PRICE_MIN_PHRASES, expected["price_min"]), text
+            else:
+                assert price == "", text
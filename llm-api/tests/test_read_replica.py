@@ -0,0 +1,115 @@
+"""
+Testes unitários para o split de pools leitura (réplica) / escrita (primário)
+"""
+import asyncpg
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.repositories import QueryRepository
+
+
+class FakePool:
+    """Pool mínimo: registra quantas conexões foram adquiridas"""
+
+    def __init__(self, lag=0.0, row=None):
+        self.conn = MagicMock(
+            execute=AsyncMock(return_value="INSERT 0 1"),
+            fetch=AsyncMock(return_value=[]),
+            fetchrow=AsyncMock(return_value=row),
+            fetchval=AsyncMock(return_value=lag),
+        )
+        self.acquired = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        self.acquired += 1
+        yield self.conn
+
+    def get_size(self):
+        return 2
+
+    def get_idle_size(self):
+        return 1
+
+    def get_max_size(self):
+        return 10
+
+
+class TestReadReplica:
+    """Roteamento das leituras"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reads_go_to_replica_and_writes_to_primary(self):
+        """Histórico e cache na réplica; save_query no primário"""
+        primary, replica = FakePool(), FakePool()
+        repo = QueryRepository(db_pool=primary, read_pool=replica)
+
+        await repo.save_query("doces", {})
+        await repo.get_query_history(5)
+        await repo.find_cached_query("doces")
+
+        assert primary.acquired == 1
+        assert replica.acquired == 2
+        assert repo.pool_metrics()["reads"] == {"replica": 2, "primary": 0, "replica_fallbacks": 0}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_lagging_replica_falls_back_to_primary(self):
+        """Réplica acima do atraso aceito não deve servir leituras"""
+        primary, replica = FakePool(), FakePool(lag=30.0)
+        repo = QueryRepository(db_pool=primary, read_pool=replica, max_replica_lag_seconds=5)
+
+        await repo.get_query_history(5)
+        await repo.get_query_history(5)
+
+        # só a medição de atraso (uma vez por intervalo) usa a réplica
+        assert replica.conn.fetchval.await_count == 1
+        assert replica.conn.fetch.await_count == 0
+        assert primary.conn.fetch.await_count == 2
+        assert repo.pool_metrics()["replica_lag_seconds"] == 30.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_get_by_id_missing_on_replica_checks_primary(self):
+        """Query recém-gravada e ainda não replicada deve ser lida do primário"""
+        row = {
+            "id": "abc", "query_text": "doces", "filters": "{}", "status": "processed",
+            "created_at": None, "source": "llm", "llm_model": None, "prompt_version": 1,
+            "llm_latency_ms": None, "input_tokens": None, "output_tokens": None,
+            "organization_id": None,
+        }
+        primary, replica = FakePool(row=row), FakePool(row=None)
+        repo = QueryRepository(db_pool=primary, read_pool=replica)
+
+        record = await repo.get_query_by_id("abc")
+
+        assert record["id"] == "abc"
+        assert replica.acquired == 1 and primary.acquired == 1
+        assert repo.pool_metrics()["reads"] == {"replica": 1, "primary": 1, "replica_fallbacks": 0}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_replica_error_retries_on_primary(self):
+        """Réplica caída não derruba a leitura: repete no primário e sai da rotação"""
+        primary, replica = FakePool(), FakePool()
+        replica.conn.fetch.side_effect = asyncpg.CannotConnectNowError("réplica fora")
+        repo = QueryRepository(db_pool=primary, read_pool=replica, max_replica_lag_seconds=5)
+
+        assert await repo.get_query_history(5) == []
+        assert await repo.find_cached_query("doces") is None
+        await repo.get_training_examples()
+
+        assert primary.conn.fetch.await_count == 2
+        assert primary.conn.fetchrow.await_count == 1
+        assert replica.conn.fetch.await_count == 1
+        assert repo.pool_metrics()["reads"] == {"replica": 0, "primary": 3, "replica_fallbacks": 1}
+
+    @pytest.mark.unit
+    def test_pool_metrics_per_role(self):
+        """Métricas separadas por papel; sem réplica, só o primário"""
+        metrics = QueryRepository(db_pool=FakePool()).pool_metrics()
+
+        assert metrics["primary"] == {"size": 2, "idle": 1, "max": 10}
+        assert "replica" not in metrics
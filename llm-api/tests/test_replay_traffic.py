@@ -0,0 +1,101 @@
+"""
+Testes do replay de tráfego da raiz do repositório (replay_traffic.py)
+
+O script fica fora de llm-api; sem ele (imagem Docker de testes) o módulo é pulado.
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+replay_traffic = pytest.importorskip("replay_traffic")
+
+URL = "http://llm-api/api/v1/parse-query"
+DOCES = {"search_term": None, "category": "Doces", "price_min": None, "price_max": 50.0}
+
+
+def _response(tier, body=None, status_code=200):
+    headers = {"server-timing": f"cache;dur=0.40, tier-{tier}" if tier else "cache;dur=0.40"}
+    return httpx.Response(status_code, json=body or {}, headers=headers)
+
+
+class TestParseServerTiming:
+    """Header Server-Timing da llm-api"""
+
+    @pytest.mark.unit
+    def test_stages_and_tier_marks(self):
+        stages = replay_traffic.parse_server_timing("cache;dur=1.2, llm;dur=300, tier-llm")
+
+        assert stages == {"cache": 1.2, "llm": 300.0, "tier-llm": 0.0}
+
+    @pytest.mark.unit
+    def test_malformed_values_do_not_break_the_replay(self):
+        """dur inválido ou vazio vale 0; partes vazias são ignoradas"""
+        stages = replay_traffic.parse_server_timing("cache;dur=abc, , llm;dur=, tier-sql;desc=x")
+
+        assert stages == {"cache": 0.0, "llm": 0.0, "tier-sql": 0.0}
+        assert replay_traffic.parse_server_timing(None) == {}
+
+
+class TestReplayStats:
+    """Origem das respostas e acurácia dos filtros"""
+
+    @pytest.mark.unit
+    def test_summary_tier_ratios_and_accuracy(self):
+        stats = replay_traffic.ReplayStats()
+        for tier in ("l1", "l1", "sql", "template", "rule", "llm", "llm", "negative", "fallback", None):
+            stats.add(10.0, _response(tier, DOCES), None)
+        stats.add(10.0, _response("llm", dict(DOCES, category=" doces ")), DOCES)
+        stats.add(10.0, _response("llm", dict(DOCES, price_max=30.0)), DOCES)
+        stats.add(10.0, _response("fallback", status_code=503), DOCES)
+
+        summary = stats.summary(elapsed_s=1.0)
+
+        assert summary["requests"] == 13
+        assert summary["tiers"]["unknown"] == 1
+        assert summary["cache_hit_rate"] == round(3 / 13, 4)
+        assert summary["template_hit_rate"] == round(1 / 13, 4)
+        assert summary["rule_served_rate"] == round(1 / 13, 4)
+        assert summary["llm_calls"] == 4
+        assert summary["fallback_rate"] == round(3 / 13, 4)
+        # só respostas 200 com filtros esperados contam; texto compara sem caixa/espaços
+        assert summary["filter_accuracy"] == 0.5
+        assert summary["status"] == {200: 12, 503: 1}
+
+
+class TestReplay:
+    """Replay contra um transporte simulado"""
+
+    @pytest.mark.unit
+    def test_replay_as_fast_as_possible(self):
+        """speed=0 ignora os offsets; cada query recebe a resposta do mock"""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            query = json.loads(request.content)["query"]
+            seen.append(query)
+            if query == "quebra":
+                raise httpx.ConnectError("recusado", request=request)
+            tier = "l1" if query in seen[:-1] else "llm"
+            return _response(tier, DOCES)
+
+        events = [
+            {"query": "doces até 50", "offset_s": 3600.0, "expected": DOCES},
+            {"query": "doces até 50", "offset_s": 7200.0, "expected": DOCES},
+            {"query": "quebra", "offset_s": 7300.0},
+        ]
+        summary = asyncio.run(replay_traffic.replay(
+            iter(events), URL, speed=0, max_in_flight=1, timeout=1.0,
+            transport=httpx.MockTransport(handler),
+        ))
+
+        assert seen == ["doces até 50", "doces até 50", "quebra"]
+        assert summary["requests"] == 2 and summary["errors"] == 1
+        assert summary["tiers"] == {"llm": 1, "l1": 1}
+        assert summary["filter_accuracy"] == 1.0
+        assert summary["elapsed_s"] < 60
@@ -0,0 +1,98 @@
+"""
+Testes das ferramentas de seed da raiz do repositório (generate_seed.py, load_seed.py)
+
+Os scripts ficam fora de llm-api; sem eles (imagem Docker de testes) o módulo é pulado.
+"""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+generate_seed = pytest.importorskip("generate_seed")
+load_seed = pytest.importorskip("load_seed")
+
+
+class TestSeedCounts:
+    """Validação das contagens por tabela"""
+
+    @pytest.mark.unit
+    def test_child_rows_require_parent_rows(self):
+        """Filho com linhas e pai vazio vira erro de uso, não ZeroDivisionError"""
+        counts = dict(generate_seed.DEFAULT_COUNTS, categories=0)
+
+        with pytest.raises(ValueError, match="--categories"):
+            generate_seed.validate_counts(counts)
+        with pytest.raises(SystemExit):
+            generate_seed.parse_args(["--products", "0"])
+
+    @pytest.mark.unit
+    def test_empty_children_are_skipped(self):
+        """Pai e filhos zerados: blocos vazios, demais tabelas normais"""
+        counts = dict(generate_seed.DEFAULT_COUNTS, products=0, order_items=0, search_clicks=0)
+        generate_seed.validate_counts(counts)
+
+        ctx = generate_seed.SeedContext(counts)
+        sql = "".join(generate_seed.generate_sql(ctx, fmt="copy"))
+
+        products_block = sql.split("COPY products", 1)[1].split("\\.", 1)[0]
+        assert products_block.count("\n") == 1
+        assert "-- Insert orders (40 linhas)" in sql
+
+    @pytest.mark.unit
+    def test_negative_count(self):
+        with pytest.raises(ValueError, match="negativo"):
+            generate_seed.validate_counts(dict(generate_seed.DEFAULT_COUNTS, queries=-1))
+
+
+class _FakeConnection:
+    """Conexão asyncpg falsa: consome os records do COPY e devolve o status do banco"""
+
+    def __init__(self, copied, rejected):
+        self._copied = copied
+        self._rejected = rejected
+        self.execute = AsyncMock()
+        self.fetch = AsyncMock(return_value=[])
+        self.close = AsyncMock()
+
+    async def copy_records_to_table(self, table_name, records, columns):
+        rows = list(records)
+        assert all(len(row) == len(columns) for row in rows)
+        self._copied.append((table_name, len(rows)))
+        return f"COPY {len(rows) - self._rejected.get(table_name, 0)}"
+
+
+class TestLoadSeed:
+    """Carga com copy_records_to_table simulado (processos trocados por threads)"""
+
+    def _load(self, argv, rejected=None):
+        copied = []
+        connect = AsyncMock(side_effect=lambda **_: _FakeConnection(copied, rejected or {}))
+        with patch.object(load_seed.asyncpg, "connect", connect), \
+                patch.object(load_seed, "ProcessPoolExecutor", ThreadPoolExecutor):
+            result = load_seed.asyncio.run(load_seed.load(load_seed.parse_args(argv)))
+        return result, copied
+
+    @pytest.mark.unit
+    def test_loads_parents_before_children(self):
+        result, copied = self._load(["--products", "25", "--order-items", "7", "--jobs", "3"])
+        order = [name for name, _ in copied]
+
+        assert result["products"] == 25
+        assert result["order_items"] == 7
+        for table in generate_seed.TABLES:
+            for dependency in table.depends_on:
+                assert order.index(dependency) < order.index(table.name)
+
+    @pytest.mark.unit
+    def test_reports_rows_from_copy_status(self, capsys):
+        """O total vem do status do COPY, não das contagens pedidas"""
+        result, _ = self._load(["--jobs", "2"], rejected={"queries": 5})
+
+        assert result["queries"] == generate_seed.DEFAULT_COUNTS["queries"] - 5
+        output = capsys.readouterr().out
+        assert "queries: 35 linhas copiadas de 40 pedidas" in output
+        assert f"Total: {sum(generate_seed.DEFAULT_COUNTS.values()) - 5:,} linhas" in output
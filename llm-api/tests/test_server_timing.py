@@ -0,0 +1,139 @@
+"""
+Testes do Server-Timing por etapa
+"""
+import json
+import logging
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from llm_api.cache import TemplateCache
+from llm_api.controllers import QueryController, ServerTimingMiddleware, create_router
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService
+from llm_api.schemas import FiltrosBusca
+from llm_api.logging_config import JsonFormatter
+from llm_api.timing import format_server_timing, get_timings, timed_stage
+
+
+@pytest.fixture
+def client():
+    """App mínima com middleware de timing e LLM mockado"""
+    structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Doces")))
+    service = QueryService(
+        llm_model=AsyncMock(),
+        repository=QueryRepository(),
+        structured_llm_provider=lambda: structured,
+    )
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+    app.include_router(create_router(QueryController(service=service)))
+    return TestClient(app)
+
+
+def _stages(header: str) -> dict:
+    return {
+        part.split(";")[0].strip(): float(part.split("dur=")[1])
+        for part in header.split(",")
+    }
+
+
+class TestTimingHelpers:
+    """Testes dos utilitários de timing"""
+
+    @pytest.mark.unit
+    def test_timed_stage_outside_request_is_noop(self):
+        """Fora de um request, medições devem ser ignoradas"""
+        with timed_stage("llm"):
+            pass
+        assert get_timings() == {}
+
+    @pytest.mark.unit
+    def test_format_server_timing(self):
+        """Deve seguir o formato `nome;dur=ms`"""
+        assert format_server_timing({"cache": 1.234, "llm": 20}) == "cache;dur=1.23, llm;dur=20.00"
+
+
+class TestServerTimingMiddleware:
+    """Testes do header Server-Timing e do log por request"""
+
+    @pytest.mark.unit
+    def test_cache_miss_reports_all_stages(self, client):
+        """Cache miss deve reportar cache, llm, validation, persistence e total"""
+        response = client.post("/api/v1/parse-query", json={"query": "doces"})
+
+        stages = _stages(response.headers["server-timing"])
+        assert {"cache", "llm", "validation", "persistence", "total"} <= set(stages)
+
+    @pytest.mark.unit
+    def test_cache_hit_skips_llm_stage(self, client):
+        """Cache hit não deve ter etapa llm"""
+        client.post("/api/v1/parse-query", json={"query": "doces"})
+        response = client.post("/api/v1/parse-query", json={"query": "doces"})
+
+        stages = _stages(response.headers["server-timing"])
+        assert "cache" in stages
+        assert "llm" not in stages
+        assert "tier-sql" in stages
+
+    @pytest.mark.unit
+    def test_one_tier_mark_per_response(self):
+        """A marca tier-* diz quem respondeu (a etapa cache existe em todo request)"""
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Doces", price_max=50)))
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+            template_cache=TemplateCache(),
+        )
+        app = FastAPI()
+        app.add_middleware(ServerTimingMiddleware)
+        app.include_router(create_router(QueryController(service=service)))
+        client = TestClient(app)
+
+        miss = _stages(
+            client.post("/api/v1/parse-query", json={"query": "doces até 50"}).headers["server-timing"]
+        )
+        template = _stages(
+            client.post("/api/v1/parse-query", json={"query": "doces até 30"}).headers["server-timing"]
+        )
+
+        assert [name for name in miss if name.startswith("tier-")] == ["tier-llm"]
+        assert "cache" in template
+        assert [name for name in template if name.startswith("tier-")] == ["tier-template"]
+
+    @pytest.mark.unit
+    def test_llm_error_marks_fallback(self):
+        """Erro no LLM deve aparecer como marca `fallback` no header"""
+        structured = MagicMock(ainvoke=AsyncMock(side_effect=RuntimeError("timeout")))
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+        )
+        app = FastAPI()
+        app.add_middleware(ServerTimingMiddleware)
+        app.include_router(create_router(QueryController(service=service)))
+
+        response = TestClient(app).post("/api/v1/parse-query", json={"query": "doces"})
+
+        stages = _stages(response.headers["server-timing"])
+        assert stages["fallback"] == 0.0
+        assert "llm" in stages
+        assert "tier-fallback" in stages
+        assert "tier-llm" not in stages
+
+    @pytest.mark.unit
+    def test_emits_one_structured_log_line(self, client, caplog):
+        """Deve emitir uma linha JSON por request com as etapas"""
+        with caplog.at_level(logging.INFO, logger="llm_api.controllers.timing_middleware"):
+            client.post("/api/v1/parse-query", json={"query": "bebidas"})
+
+        records = [r for r in caplog.records if r.name == "llm_api.controllers.timing_middleware"]
+        assert len(records) == 1
+        payload = json.loads(JsonFormatter().format(records[0]))
+        assert payload["event"] == "request_timing"
+        assert payload["route"] == "/api/v1/parse-query"
+        assert payload["status"] == 200
+        assert "llm" in payload["stages"]
@@ -0,0 +1,193 @@
+"""
+Testes da regra local e da execução especulativa regra x LLM
+"""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.repositories import QueryRepository
+from llm_api.services import AgreementStats, QueryService, RuleParser
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+
+def _slow_llm(result: FiltrosBusca, delay: float = 0.05):
+    async def ainvoke(_prompt):
+        await asyncio.sleep(delay)
+        return result
+
+    return MagicMock(ainvoke=AsyncMock(side_effect=ainvoke))
+
+
+def _service(structured, repo=None, **kwargs) -> QueryService:
+    return QueryService(
+        llm_model=AsyncMock(),
+        repository=repo or QueryRepository(),
+        structured_llm_provider=lambda: structured,
+        rule_parser=RuleParser(),
+        **kwargs,
+    )
+
+
+async def _drain(service: QueryService) -> None:
+    while service._background:
+        await asyncio.gather(*service._background)
+
+
+class TestRuleParser:
+    """Extração por regras e confiança"""
+
+    @pytest.mark.unit
+    def test_category_price_and_search_term(self):
+        """Léxico define a categoria; faixas saem da normalização"""
+        filtros, confidence = RuleParser().parse("brownie de chocolate até 25 reais")
+
+        assert filtros == FiltrosBusca(search_term="brownie de chocolate", category="Doces", price_max=25.0)
+        assert confidence == 0.9
+
+    @pytest.mark.unit
+    def test_category_name_is_not_search_term(self):
+        """"doces entre 5 e 10" não tem termo além da categoria"""
+        filtros, _ = RuleParser().parse("doces entre 5 e 10 reais")
+
+        assert filtros == FiltrosBusca(category="Doces", price_min=5.0, price_max=10.0)
+
+    @pytest.mark.unit
+    def test_low_confidence_when_ambiguous_or_unknown(self):
+        """Duas categorias ou termos desconhecidos não devem passar do limiar"""
+        parser = RuleParser()
+
+        assert parser.parse("café e bolo")[1] == 0.2
+        assert parser.parse("camiseta azul")[1] == 0.3
+        assert parser.parse("água sanitária")[0].category == "Limpeza"
+
+
+class TestSpeculativeParse:
+    """QueryService com regra e LLM em paralelo"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_confident_rule_answers_and_llm_confirms_in_background(self):
+        """Regra confiante responde na hora; LLM concordante só alimenta as estatísticas"""
+        llm_result = FiltrosBusca(search_term="brownie de chocolate", category="Doces", price_max=25.0)
+        service = _service(_slow_llm(llm_result, delay=1))
+
+        filtros, _ = await asyncio.wait_for(
+            service.parse_and_save_query(QueryInput(query="brownie de chocolate até 25")), timeout=0.5
+        )
+        await _drain(service)
+
+        assert filtros == llm_result
+        speculation = service.get_metrics()["speculation"]
+        assert speculation["rule_served"] == 1
+        assert speculation["llm_overruled"] == 0
+        assert speculation["agreement"]["0.9"]["agreement"] == 1.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_llm_disagreement_corrects_record_and_cache(self):
+        """LLM discordando da regra deve atualizar o registro gravado"""
+        llm_result = FiltrosBusca(search_term="brownie", category="Doces", price_max=25.0)
+        repo = QueryRepository()
+        service = _service(_slow_llm(llm_result), repo=repo)
+
+        filtros, query_id = await service.parse_and_save_query(QueryInput(query="brownie de chocolate até 25"))
+        await _drain(service)
+
+        assert filtros.search_term == "brownie de chocolate"
+        record = await repo.get_query_by_id(query_id)
+        assert record["filters"]["search_term"] == "brownie"
+        assert record["source"] == "llm"
+        assert service.get_metrics()["speculation"]["llm_overruled"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_llm_confirmation_enters_training_examples(self):
+        """Regra confirmada pelo LLM vira exemplo rotulado pelo LLM"""
+        llm_result = FiltrosBusca(search_term="brownie de chocolate", category="Doces", price_max=25.0)
+        repo = QueryRepository()
+        service = _service(_slow_llm(llm_result), repo=repo)
+
+        _, query_id = await service.parse_and_save_query(QueryInput(query="brownie de chocolate até 25"))
+        await _drain(service)
+
+        record = await repo.get_query_by_id(query_id)
+        assert record["source"] == "llm"
+        assert service.get_metrics()["speculation"]["llm_overruled"] == 0
+        assert await repo.get_training_examples() == [
+            {"query_text": "brownie de chocolate até 25", "filters": llm_result.model_dump()}
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cancel_mode_drops_llm(self):
+        """Com cancelamento, o LLM não termina nem grava nada depois"""
+        structured = _slow_llm(FiltrosBusca(category="Bebidas"))
+        service = _service(structured, speculation_cancel_llm=True)
+
+        filtros, _ = await service.parse_and_save_query(QueryInput(query="doces até 50"))
+        await asyncio.sleep(0.1)
+
+        assert filtros.category == "Doces"
+        assert service.get_metrics()["speculation"]["llm_cancelled"] == 1
+        assert service.get_metrics()["speculation"]["agreement"] == {}
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_persistence_failure_cancels_background_llm(self):
+        """Erro ao gravar: a task do LLM especulativo não fica órfã"""
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def ainvoke(_prompt):
+            started.set()
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def save_query(*_args, **_kwargs):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("banco fora")
+
+        repo = QueryRepository()
+        repo.save_query = AsyncMock(side_effect=save_query)
+        service = _service(MagicMock(ainvoke=AsyncMock(side_effect=ainvoke)), repo=repo)
+
+        with pytest.raises(RuntimeError, match="banco fora"):
+            await service.parse_and_save_query(QueryInput(query="doces até 50"))
+        await asyncio.wait_for(cancelled.wait(), timeout=0.5)
+
+        assert started.is_set()
+        assert not service._background
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_low_confidence_waits_llm_until_deadline(self):
+        """Abaixo do limiar usa o LLM; se estourar o prazo, serve a regra"""
+        llm_result = FiltrosBusca(search_term="camiseta azul", category="Artesanato")
+        waited = _service(_slow_llm(llm_result, delay=0.01), llm_deadline_seconds=1)
+        late = _service(_slow_llm(llm_result, delay=1), llm_deadline_seconds=0.05)
+
+        filtros, _ = await waited.parse_and_save_query(QueryInput(query="camiseta azul"))
+        late_filtros, _ = await late.parse_and_save_query(QueryInput(query="camiseta azul"))
+        for task in late._background:
+            task.cancel()
+
+        assert filtros == llm_result
+        assert waited.get_metrics()["speculation"]["agreement"]["0.3"]["category"] == 0.0
+        assert late_filtros == FiltrosBusca(search_term="camiseta azul")
+        assert late.get_metrics()["speculation"]["deadline_expired"] == 1
+
+
+class TestAgreementStats:
+    """Concordância por faixa de confiança"""
+
+    @pytest.mark.unit
+    def test_search_term_compared_by_normalized_key(self):
+        """"Brownie de chocolate" e "chocolate brownie" concordam"""
+        stats = AgreementStats()
+
+        assert stats.record(0.95, FiltrosBusca(search_term="Brownie de chocolate"), FiltrosBusca(search_term="chocolate brownie"))
+        assert not stats.record(0.95, FiltrosBusca(category="Doces"), FiltrosBusca(category="Bebidas"))
+        assert stats.snapshot()["0.9"]["agreement"] == 0.5
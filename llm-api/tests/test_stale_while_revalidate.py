@@ -0,0 +1,140 @@
+"""
+Testes unitários para stale-while-revalidate do cache SQL
+"""
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.cache import CacheWarmup, QueryCache
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService, ReparseScheduler
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+HOUR = 3600
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def _saved(repo: QueryRepository, query: str, age_hours: float) -> str:
+    """Salva uma query processada com `age_hours` de idade"""
+    query_id = await repo.save_query(query, {"category": "Bebidas"})
+    created = datetime.now(timezone.utc) - timedelta(hours=age_hours)
+    repo._mem_store[query_id]["created_at"] = created.isoformat()
+    return query_id
+
+
+def _service(repo, structured, revalidator):
+    return QueryService(
+        llm_model=AsyncMock(),
+        repository=repo,
+        structured_llm_provider=lambda: structured,
+        cache=QueryCache(),
+        revalidator=revalidator,
+        soft_ttl_seconds=24 * HOUR,
+        hard_ttl_seconds=72 * HOUR,
+    )
+
+
+class TestStaleWhileRevalidate:
+    """Entre o TTL soft e o hard: serve na hora e revalida em background"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_and_refreshed(self):
+        """Registro com 30h deve ser servido sem esperar o LLM e depois atualizado"""
+        repo = QueryRepository()
+        query_id = await _saved(repo, "sucos", age_hours=30)
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Bebidas", price_max=10.0)))
+        revalidator = ReparseScheduler(delay_seconds=0, max_attempts=1)
+        service = _service(repo, structured, revalidator)
+
+        filtros, served_id = await service.parse_and_save_query(QueryInput(query="sucos"))
+
+        assert served_id == query_id
+        assert filtros.price_max is None
+        structured.ainvoke.assert_not_called()
+
+        while revalidator.metrics()["pending"]:
+            await asyncio.sleep(0)
+        refreshed = await repo.find_cached_query("sucos")
+        assert refreshed["filters"]["price_max"] == 10.0
+        assert refreshed["age_seconds"] < 60
+        assert service._cache.get("sucos")["filters"]["price_max"] == 10.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_fresh_entry_not_revalidated(self):
+        """Dentro do TTL soft não há revalidação"""
+        repo = QueryRepository()
+        await _saved(repo, "sucos", age_hours=1)
+        revalidator = ReparseScheduler(delay_seconds=0, max_attempts=1)
+        service = _service(repo, AsyncMock(), revalidator)
+
+        await service.parse_and_save_query(QueryInput(query="sucos"))
+
+        assert revalidator.metrics()["pending"] == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_entry_past_hard_ttl_not_served(self):
+        """Após o TTL hard o registro não é mais servido (vai ao LLM)"""
+        repo = QueryRepository()
+        old_id = await _saved(repo, "sucos", age_hours=80)
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Bebidas")))
+        service = _service(repo, structured, ReparseScheduler(delay_seconds=0, max_attempts=1))
+
+        _, query_id = await service.parse_and_save_query(QueryInput(query="sucos"))
+
+        assert query_id != old_id
+        structured.ainvoke.assert_awaited_once()
+
+
+class TestL1RespectsSoftTtl:
+    """O L1 nunca guarda uma entrada além do TTL soft do registro"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_warmup_uses_remaining_soft_ttl(self):
+        """Warmup: 20h de idade vale 4h no L1; além do TTL soft fica de fora"""
+        repo = QueryRepository()
+        await _saved(repo, "sucos", age_hours=20)
+        await _saved(repo, "chás", age_hours=30)
+        clock = FakeClock()
+        cache = QueryCache(clock=clock)
+        warmup = CacheWarmup(cache, window_hours=96, soft_ttl_seconds=24 * HOUR)
+
+        await warmup.run(repo)
+
+        assert warmup.loaded == 1
+        assert warmup.status()["skipped_stale"] == 1
+        assert "chás" not in cache
+        clock.now = 3.9 * HOUR
+        assert cache.get("sucos") is not None
+        clock.now = 4.1 * HOUR
+        assert cache.get("sucos") is None
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_llm_result_capped_at_soft_ttl(self):
+        """TTL soft menor que o do L1: hot key volta ao cache SQL (e à revalidação)"""
+        clock = FakeClock()
+        structured = MagicMock(ainvoke=AsyncMock(return_value=FiltrosBusca(category="Bebidas")))
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+            cache=QueryCache(ttl_seconds=24 * HOUR, clock=clock),
+            soft_ttl_seconds=HOUR,
+        )
+
+        await service.parse_and_save_query(QueryInput(query="sucos"))
+
+        clock.now = HOUR + 1
+        assert service._cache.get("sucos") is None
@@ -0,0 +1,131 @@
+"""
+Testes do parse em streaming (filtros parciais via SSE)
+"""
+import asyncio
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk
+
+from llm_api.controllers import QueryController, create_router
+from llm_api.repositories import QueryRepository
+from llm_api.services import AdaptiveConcurrencyLimiter, QueryService
+from llm_api.schemas import FiltrosBusca
+
+FINAL = FiltrosBusca(search_term="brownie", category="Doces", price_max=25.0)
+
+
+def _raw(args: str) -> dict:
+    """Chunk do include_raw com um pedaço dos argumentos da tool call"""
+    return {"raw": AIMessageChunk(
+        content="", tool_call_chunks=[{"name": "FiltrosBusca", "args": args, "id": "1", "index": 0}]
+    )}
+
+
+def _streaming_llm(*chunks, error: Exception = None):
+    async def astream(_prompt):
+        for chunk in chunks:
+            yield chunk
+        if error is not None:
+            raise error
+
+    return MagicMock(astream=astream)
+
+
+def _service(structured) -> QueryService:
+    return QueryService(
+        llm_model=AsyncMock(),
+        repository=QueryRepository(),
+        structured_llm_provider=lambda: structured,
+    )
+
+
+async def _collect(service, query="brownie até 25"):
+    return [(event, filtros) async for event, filtros in service.stream_parse_query(query)]
+
+
+STREAM = (
+    _raw('{"category": "Do'),
+    _raw('ces", "price_max": 2'),
+    _raw('5, "search_term": "brow'),
+    _raw('nie"}'),
+    {"parsed": FINAL},
+)
+
+
+class TestStreamParseQuery:
+    """Service: parciais só com campos concluídos, final validado"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_partials_only_publish_complete_fields(self):
+        """Campo cortado ("Do", 2) não deve aparecer; o final vem do parsed"""
+        events = await _collect(_service(_streaming_llm(*STREAM)))
+
+        assert events == [
+            ("partial", FiltrosBusca(category="Doces")),
+            ("partial", FiltrosBusca(category="Doces", price_max=25.0)),
+            ("final", FINAL),
+        ]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_error_ends_with_fallback(self):
+        """Falha no meio do stream: parciais já enviados e final = fallback"""
+        service = _service(_streaming_llm(*STREAM[:2], error=RuntimeError("timeout")))
+
+        events = await _collect(service)
+
+        assert events[-1] == ("final", FiltrosBusca(search_term="brownie até 25"))
+        assert [event for event, _ in events[:-1]] == ["partial"]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_invalid_final_falls_back(self):
+        """Filtros finais inválidos (min > max) devem virar fallback"""
+        invalid = FiltrosBusca(price_min=50.0, price_max=10.0)
+        events = await _collect(_service(_streaming_llm({"parsed": invalid})))
+
+        assert events == [("final", FiltrosBusca(search_term="brownie até 25"))]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_slow_consumer_does_not_hold_limiter(self):
+        """O slot volta ao limiter quando o provedor termina, não quando o cliente lê tudo"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: _streaming_llm(*STREAM),
+            limiter=limiter,
+        )
+        stream = service.stream_parse_query("brownie até 25")
+
+        assert (await stream.__anext__())[0] == "partial"
+        await asyncio.sleep(0.2)  # cliente lento
+
+        assert limiter.in_flight == 0
+        assert limiter.avg_latency < 0.2
+        assert [event async for event, _ in stream] == ["partial", "final"]
+
+
+class TestStreamEndpoint:
+    """Endpoint SSE"""
+
+    @pytest.mark.unit
+    def test_sse_events(self):
+        """Deve responder text/event-stream terminando no evento final"""
+        app = FastAPI()
+        app.include_router(create_router(QueryController(service=_service(_streaming_llm(*STREAM)))))
+
+        response = TestClient(app).post("/api/v1/parse-query-only/stream", json={"query": "brownie até 25"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        blocks = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        events = [(lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))) for lines in blocks]
+        assert [event for event, _ in events] == ["partial", "partial", "final"]
+        assert events[-1][1] == FINAL.model_dump()
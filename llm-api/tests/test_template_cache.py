@@ -0,0 +1,92 @@
+"""
+Testes unitários para o template cache (mesma query, outro preço)
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from llm_api.cache import CacheAnalytics, TemplateCache
+from llm_api.normalization import normalize_query, template_key
+from llm_api.repositories import QueryRepository
+from llm_api.services import QueryService
+from llm_api.schemas import FiltrosBusca, QueryInput
+
+
+class TestTemplateKey:
+    """Mascaramento das faixas de preço"""
+
+    @pytest.mark.unit
+    def test_masks_price_slots(self):
+        """Faixas viram '#' e os valores saem em ordem"""
+        assert template_key(normalize_query("doces até R$30")) == ("doces <=#", [("<=", 30.0)])
+        assert template_key(normalize_query("doces entre 10 e 50 reais")) == (
+            "doces <=# >=#", [("<=", 50.0), (">=", 10.0)]
+        )
+
+    @pytest.mark.unit
+    def test_without_price(self):
+        """Sem faixa de preço, não há slots"""
+        assert template_key("doces") == ("doces", [])
+
+
+class TestTemplateCache:
+    """Aprendizado e reaproveitamento da estrutura"""
+
+    @pytest.mark.unit
+    def test_learn_and_lookup(self):
+        """Estrutura aprendida deve valer para outro preço"""
+        cache = TemplateCache()
+        assert cache.learn("doces até 30", {"search_term": "doces", "category": "Doces", "price_max": 30})
+
+        filters = cache.lookup("doces até R$ 55,90")
+
+        assert filters == {"search_term": "doces", "category": "Doces", "price_min": None, "price_max": 55.9}
+        assert cache.lookup("bolos até 30") is None
+
+    @pytest.mark.unit
+    def test_range_maps_each_bound(self):
+        """Faixa 'entre X e Y' deve preencher price_min e price_max"""
+        cache = TemplateCache()
+        cache.learn("doces entre 10 e 50", {"search_term": "doces", "price_min": 10, "price_max": 50})
+
+        filters = cache.lookup("doces de 20 a 80 reais")
+
+        assert (filters["price_min"], filters["price_max"]) == (20.0, 80.0)
+
+    @pytest.mark.unit
+    def test_skips_inconsistent_parse(self):
+        """Não aprende quando o LLM não usou a faixa como preço"""
+        cache = TemplateCache()
+        assert not cache.learn("doces até 30", {"search_term": "doces"})
+        assert not cache.learn("doces até 30", {"search_term": "doces", "price_min": 30})
+        assert not cache.learn("doces até 30", {"search_term": "doces 30", "price_max": 30})
+        assert not cache.learn("doces", {"search_term": "doces"})
+        assert len(cache) == 0
+
+
+class TestServiceTemplate:
+    """Integração com o QueryService"""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_second_price_skips_llm(self):
+        """'doces até 30' e depois 'doces até 50' deve chamar o LLM uma única vez"""
+        structured = MagicMock(
+            ainvoke=AsyncMock(return_value=FiltrosBusca(search_term="doces", category="Doces", price_max=30))
+        )
+        analytics = CacheAnalytics()
+        service = QueryService(
+            llm_model=AsyncMock(),
+            repository=QueryRepository(),
+            structured_llm_provider=lambda: structured,
+            analytics=analytics,
+            template_cache=TemplateCache(),
+        )
+
+        await service.parse_and_save_query(QueryInput(query="doces até 30"))
+        filtros, query_id = await service.parse_and_save_query(QueryInput(query="doces até 50"))
+
+        assert structured.ainvoke.await_count == 1
+        assert filtros.price_max == 50
+        assert filtros.category == "Doces"
+        assert query_id
+        assert analytics.snapshot()["totals"]["template_hits"] == 1
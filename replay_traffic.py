@@ -0,0 +1,239 @@
+"""
+Replay de tráfego real contra uma llm-api em execução
+
+Fontes:
+- trace NDJSON (`generate_query_trace.py` ou exportado de produção)
+- tabela `queries` (texto + created_at) direto do PostgreSQL
+
+Os requests são disparados com os intervalos originais, comprimidos por
+`--speed` (ex.: 60 = uma hora de tráfego em um minuto; 0 = o mais rápido
+possível, limitado por `--max-in-flight`). A origem de cada resposta vem da
+marca `tier-*` do header Server-Timing da llm-api (`tier-l1`/`tier-sql` =
+cache hit, `tier-template`, `tier-rule`, `tier-llm`, `tier-negative`/`tier-fallback`
+= fallback); as etapas `cache` e `llm` são medidas em todo request e não
+indicam quem respondeu.
+
+Uso:
+    python replay_traffic.py --trace trace.ndjson --speed 60
+    python replay_traffic.py --from-db --since-hours 24 --speed 0 --max-in-flight 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+from generate_query_trace import read_trace
+
+DEFAULT_URL = "http://localhost:8000/api/v1/parse-query"
+FILTER_FIELDS = ("search_term", "category", "price_min", "price_max")
+TIER_PREFIX = "tier-"
+CACHE_TIERS = ("l1", "sql")
+FALLBACK_TIERS = ("negative", "fallback")
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """
+    `cache;dur=1.2, llm;dur=300` -> {"cache": 1.2, "llm": 300.0}
+
+    Marca sem `dur` (ex.: `tier-l1`) ou com `dur` inválido vale 0.0.
+    """
+    stages: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        duration = 0.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    duration = float(value)
+                except ValueError:
+                    duration = 0.0
+        stages[name] = duration
+    return stages
+
+
+async def events_from_db(since_hours: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Queries reais da tabela `queries`, com offset relativo à primeira"""
+    import asyncpg
+
+    conn = await asyncpg.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", 5432)),
+        database=os.getenv("DB_NAME", "ong_db"),
+        user=os.getenv("DB_USER", "user"),
+        password=os.getenv("DB_PASSWORD", "password"),
+    )
+    try:
+        rows = await conn.fetch(
+            """
+            SELECT query_text, created_at
+            FROM queries
+            WHERE created_at > NOW() - make_interval(hours => $1)
+            ORDER BY created_at
+            LIMIT $2
+            """,
+            since_hours,
+            limit,
+        )
+    finally:
+        await conn.close()
+    if not rows:
+        return []
+    first = rows[0]["created_at"]
+    return [
+        {"query": row["query_text"], "offset_s": (row["created_at"] - first).total_seconds()}
+        for row in rows
+    ]
+
+
+class ReplayStats:
+    """Acumula latências e origem das respostas"""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.status: Dict[int, int] = {}
+        self.errors = 0
+        # camada que respondeu -> requests ("unknown" sem marca tier-*)
+        self.tiers: Dict[str, int] = {}
+        self.with_expected = 0
+        self.correct = 0
+        self.max_lag_ms = 0.0
+
+    def add(self, latency_ms: float, response: httpx.Response, expected: Optional[Dict[str, Any]]) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.status[response.status_code] = self.status.get(response.status_code, 0) + 1
+        stages = parse_server_timing(response.headers.get("server-timing"))
+        tier = next(
+            (name[len(TIER_PREFIX):] for name in stages if name.startswith(TIER_PREFIX)), "unknown"
+        )
+        self.tiers[tier] = self.tiers.get(tier, 0) + 1
+        if expected is not None and response.status_code == 200:
+            self.with_expected += 1
+            body = response.json()
+            if all(_same(body.get(f), expected.get(f)) for f in FILTER_FIELDS):
+                self.correct += 1
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.latencies_ms)
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        total = len(self.latencies_ms)
+        ratio = (lambda n: round(n / total, 4) if total else 0.0)
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "elapsed_s": round(elapsed_s, 2),
+            "throughput_rps": round(total / elapsed_s, 2) if elapsed_s else 0.0,
+            "latency_ms": {f"p{p}": round(self.percentile(p), 2) for p in (50, 90, 95, 99)}
+            | {"max": round(max(self.latencies_ms, default=0.0), 2)},
+            "status": self.status,
+            "tiers": self.tiers,
+            "cache_hit_rate": ratio(sum(self.tiers.get(t, 0) for t in CACHE_TIERS)),
+            "template_hit_rate": ratio(self.tiers.get("template", 0)),
+            "rule_served_rate": ratio(self.tiers.get("rule", 0)),
+            "llm_calls": self.tiers.get("llm", 0),
+            "fallback_rate": ratio(sum(self.tiers.get(t, 0) for t in FALLBACK_TIERS)),
+            "filter_accuracy": round(self.correct / self.with_expected, 4) if self.with_expected else None,
+            "max_schedule_lag_ms": round(self.max_lag_ms, 2),
+        }
+
+
+def _same(actual: Any, expected: Any) -> bool:
+    if isinstance(actual, str) and isinstance(expected, str):
+        return actual.strip().lower() == expected.strip().lower()
+    return actual == expected
+
+
+async def replay(
+    events: Iterator[Dict[str, Any]],
+    url: str,
+    speed: float,
+    max_in_flight: int,
+    timeout: float,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict[str, Any]:
+    """Dispara os eventos contra `url`; `transport` troca a rede (ex.: httpx.MockTransport)"""
+    stats = ReplayStats()
+    semaphore = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, transport=transport) as client:
+
+        async def send(event: Dict[str, Any]) -> None:
+            try:
+                started = time.perf_counter()
+                response = await client.post(url, json={"query": event["query"]})
+                stats.add((time.perf_counter() - started) * 1000, response, event.get("expected"))
+            except httpx.HTTPError:
+                stats.errors += 1
+            finally:
+                semaphore.release()
+
+        tasks = set()
+        started = time.perf_counter()
+        for event in events:
+            if speed > 0:
+                due = started + event.get("offset_s", 0.0) / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    stats.max_lag_ms = max(stats.max_lag_ms, -delay * 1000)
+            await semaphore.acquire()
+            task = asyncio.create_task(send(event))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return stats.summary(elapsed)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay de tráfego contra /api/v1/parse-query")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="arquivo NDJSON (\"-\" para stdin)")
+    source.add_argument("--from-db", action="store_true", help="lê a tabela queries (variáveis DB_*)")
+    parser.add_argument("--since-hours", type=int, default=24, help="janela lida do banco")
+    parser.add_argument("--limit", type=int, default=None, help="máximo de eventos")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--speed", type=float, default=1.0, help="fator de compressão do tempo (0 = sem espera)")
+    parser.add_argument("--max-in-flight", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=10.0, help="timeout por request (s)")
+    parser.add_argument("--report-json", help="salva o resumo em JSON")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.from_db:
+        events: Iterator[Dict[str, Any]] = iter(await events_from_db(args.since_hours, args.limit))
+    else:
+        events = read_trace(args.trace)
+        if args.limit:
+            events = itertools.islice(events, args.limit)
+    return await replay(events, args.url, args.speed, args.max_in_flight, args.timeout)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    summary = asyncio.run(run(args))
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    if args.report_json:
+        with open(args.report_json, "w", encoding="utf-8") as out:
+            json.dump(summary, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()